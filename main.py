@@ -1,12 +1,22 @@
+import sys
 from pathlib import Path
 
+from src import batch
+from src.incremental import AggregateStore
+from src.quote_providers import HttpQuoteProvider
 from src.reports import spending_by_category
+from src.result_cache import ResultCache, search_key, spending_key
+from src.search_index import SearchIndex, index_path
+from src.server import serve
 from src.services import search_transactions_by_keyword
-from src.utils import read_xlsx
+from src.utils import QUOTES, quote_provider, read_xlsx_table
 from src.views import web_page
 
 MAIN_DIR = Path(__file__).resolve().parent
 PATH_XLSX = MAIN_DIR / "data" / "operations.xlsx"
+PATH_AGGREGATES = MAIN_DIR / "data" / "operations.aggregates.json"
+PATH_RESULTS = MAIN_DIR / "data" / "operations.results.json"
+PATH_QUOTES = MAIN_DIR / "data" / "quotes.cache.json"
 
 
 def main():
@@ -21,7 +31,7 @@ def main():
 
     :return: Результат работы выбранного сервиса (JSON-словарь/Pandas Dataframe).
     """
-    data = read_xlsx(PATH_XLSX)
+    data = read_xlsx_table(PATH_XLSX, use_cache=True)
     print('Здравствуйте!')
     feature = input(
         """
@@ -31,23 +41,44 @@ def main():
 
     if feature.lower() == 'веб-страница':
         current_time = input('Введите текущие дату и время в формате ГГГГ-ММ-ДД ЧЧ:ММ:СС ')
-        result = web_page(current_time, data)
+        if isinstance(quote_provider(), HttpQuoteProvider):
+            # В офлайн-режиме котировки фикстуры не смешиваются с сохраненными котировками API
+            QUOTES.use_file(PATH_QUOTES)
+        store = AggregateStore.load(PATH_AGGREGATES)
+        # По размеру и времени изменения выгрузки хранилище понимает, что история не менялась
+        store.refresh(data, source=PATH_XLSX)
+        result = web_page(current_time, data, store=store)
         print(result)
         return result
 
     elif feature.lower() == 'поиск по транзакциям':
         key_word = input('По какому слову в описании искать транзакции? ')
-        result = search_transactions_by_keyword(data, key_word)
+        index = SearchIndex.load(index_path(PATH_XLSX))
+        if index.refresh(data, source=PATH_XLSX):
+            index.save(index_path(PATH_XLSX))
+        results = ResultCache.load(PATH_RESULTS)
+        result = results.wrap(search_transactions_by_keyword, search_key)(data, key_word, index=index)
+        results.save()
         print(result)
         return result
 
     elif feature.lower() == 'траты по категориям':
         category = input('Введите название категории ')
         date = input('По какую дату создать 3-х месячный отчет? Введите в формате ГГГГ-ММ-ДД ')
-        result = spending_by_category(data, category, date)
+        results = ResultCache.load(PATH_RESULTS)
+        result = results.wrap(spending_by_category, spending_key)(data, category, date)
+        results.save()
         print(result)
         return result
 
 
 if __name__ == '__main__':
-    main()
+    # python main.py serve [порт] — HTTP-сервер вместо диалога
+    if sys.argv[1:2] == ['serve']:
+        serve(PATH_XLSX, port=int(sys.argv[2]) if len(sys.argv) > 2 else 8000)
+    # python main.py batch <файл запросов> [-o результаты] [-w процессы] — пакет запросов
+    elif sys.argv[1:2] == ['batch']:
+        # Файл по умолчанию идет первым, чтобы --file из командной строки его переопределял
+        batch.main(['--file', str(PATH_XLSX)] + sys.argv[2:])
+    else:
+        main()
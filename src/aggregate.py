@@ -0,0 +1,233 @@
+import heapq
+import logging
+from typing import (Any, Callable, Dict, Iterable, List, Mapping, Optional,
+                    Tuple)
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from src.table import TransactionTable, parse_operation_date
+
+logger = logging.getLogger(__name__)
+
+# Именованные ключи группировки и поля транзакции, по которым они строятся
+KEY_FIELDS = {
+    "card": "last_digits",
+    "category": "category",
+    "mcc": "transaction_code",
+    "currency": "currency",
+    "month": "operation_date",
+}
+
+KeyFunc = Callable[[Mapping], Any]
+
+
+def month_of(transaction: Mapping) -> str:
+    """Месяц операции в формате ГГГГ-ММ; для неразборчивых дат — пустая строка."""
+    operation_dt = parse_operation_date(transaction.get("operation_date", ""))
+    return operation_dt.strftime("%Y-%m") if operation_dt else ""
+
+
+def _key_func(key: str | KeyFunc) -> KeyFunc:
+    """Функция, извлекающая ключ группировки из транзакции."""
+    if callable(key):
+        return key
+    if key == "month":
+        return month_of
+    field = KEY_FIELDS.get(key, key)
+    return lambda transaction: transaction.get(field, "")
+
+
+def _finish(count: int, spent: float, spent_count: int, cashback: float,
+            min_amount: float, max_amount: float, total: float) -> Dict[str, float]:
+    """Собирает итоговые показатели группы."""
+    return {
+        "count": count,
+        "spent": round(spent, 2),
+        "spent_count": spent_count,
+        "cashback": round(cashback, 2),
+        "min_amount": round(min_amount, 2),
+        "max_amount": round(max_amount, 2),
+        "avg_amount": round(total / count, 2) if count else 0.0,
+        "avg_spent": round(spent / spent_count, 2) if spent_count else 0.0,
+    }
+
+
+def _aggregate_records(data: Iterable[Mapping], key: str | KeyFunc, amount_field: str,
+                       cashback_field: str) -> Dict[Any, Dict[str, float]]:
+    """Один проход по списку (или генератору) словарей транзакций."""
+    get_key = _key_func(key)
+    # count, spent, spent_count, cashback, min, max, total
+    groups: Dict[Any, list] = {}
+    for transaction in data:
+        amount = float(transaction.get(amount_field, 0) or 0)
+        group_key = get_key(transaction)
+        group = groups.get(group_key)
+        if group is None:
+            group = groups[group_key] = [0, 0, 0, 0, amount, amount, 0]
+        group[0] += 1
+        group[3] += float(transaction.get(cashback_field, 0) or 0)
+        group[4] = min(group[4], amount)
+        group[5] = max(group[5], amount)
+        group[6] += amount
+        if amount < 0:
+            group[1] -= amount
+            group[2] += 1
+
+    return {group_key: _finish(*values) for group_key, values in groups.items()}
+
+
+def _table_keys(table: TransactionTable, key: str | KeyFunc) -> tuple:
+    """Коды групп и значения ключей для TransactionTable в порядке первого появления."""
+    if callable(key):
+        return pd.factorize(pd.Series([key(row) for row in table], dtype=object))
+    if key == "month":
+        months = np.datetime_as_string(table.operation_dt.astype("datetime64[M]"), unit="M")
+        return pd.factorize(np.where(months == "NaT", "", months).astype(object))
+    field = KEY_FIELDS.get(key, key)
+    if table.kinds[field] == "category":
+        return table.codes(field), table.categories(field)
+    return pd.factorize(table.column(field))
+
+
+def _aggregate_table(table: TransactionTable, key: str | KeyFunc, amount_field: str,
+                     cashback_field: str) -> Dict[Any, Dict[str, float]]:
+    """Векторизованная группировка TransactionTable: суммы в копейках через np.bincount."""
+    if not len(table):
+        return {}
+    codes, labels = _table_keys(table, key)
+    size = len(labels)
+    amounts = table.amounts(amount_field)
+    spends = amounts < 0
+
+    counts = np.bincount(codes, minlength=size)
+    totals = np.bincount(codes, weights=amounts, minlength=size)
+    spent = np.bincount(codes, weights=np.where(spends, -amounts, 0), minlength=size)
+    spent_counts = np.bincount(codes, weights=spends, minlength=size)
+    cashback = np.bincount(codes, weights=table.amounts(cashback_field), minlength=size)
+
+    order = np.argsort(codes, kind="stable")
+    present = np.flatnonzero(counts)
+    starts = np.concatenate(([0], np.cumsum(counts[present])[:-1]))
+    min_amounts = np.minimum.reduceat(amounts[order], starts)
+    max_amounts = np.maximum.reduceat(amounts[order], starts)
+
+    return {
+        labels[code]: _finish(
+            int(counts[code]),
+            float(spent[code]) / 100,
+            int(spent_counts[code]),
+            float(cashback[code]) / 100,
+            int(min_amounts[i]) / 100,
+            int(max_amounts[i]) / 100,
+            float(totals[code]) / 100,
+        )
+        for i, code in enumerate(present)
+    }
+
+
+def aggregate(
+    data: Iterable[Mapping] | TransactionTable | DataFrame,
+    key: str | KeyFunc = "card",
+    amount_field: str = "amount_transaction_rub",
+    cashback_field: str = "cashback",
+) -> Dict[Any, Dict[str, float]]:
+    """
+    Считает показатели по группам транзакций за один проход.
+
+    Для каждой группы возвращаются: count — число операций, spent и spent_count —
+    сумма и число трат (отрицательных операций, сумма положительная), cashback,
+    min_amount и max_amount, avg_amount — средняя сумма операции, avg_spent — средняя трата.
+
+    :param data: список или генератор словарей транзакций, TransactionTable
+        или типизированный DataFrame из read_xlsx_frame
+    :param key: ключ группировки: "card", "category", "mcc", "currency", "month",
+        имя любого поля транзакции или функция от транзакции
+    :param amount_field: поле суммы операции
+    :param cashback_field: поле кэшбэка
+    :return: словарь {значение ключа: показатели} в порядке первого появления ключа
+    """
+    if isinstance(data, DataFrame):
+        data = TransactionTable.from_frame(data)
+    if isinstance(data, TransactionTable):
+        result = _aggregate_table(data, key, amount_field, cashback_field)
+    else:
+        result = _aggregate_records(data, key, amount_field, cashback_field)
+
+    logger.info("Сгруппировано по ключу '%s': %s групп.", key, len(result))
+    return result
+
+
+TopEntry = Tuple[float, int, Mapping]
+
+
+def _top_k_records(data: Iterable[Mapping], k: int, key: Optional[str | KeyFunc],
+                   amount_field: str) -> Dict[Any, List[TopEntry]]:
+    """Ограниченные кучи по группам: сумма каждой транзакции разбирается один раз."""
+    get_key = _key_func(key) if key is not None else None
+    # В каждой куче K наименьших сумм; на вершине — худшая из них (и самая поздняя при равенстве)
+    heaps: Dict[Any, list] = {}
+    for position, transaction in enumerate(data):
+        amount = float(transaction.get(amount_field, 0))
+        heap = heaps.setdefault(get_key(transaction) if get_key else None, [])
+        if len(heap) < k:
+            heapq.heappush(heap, (-amount, -position, transaction))
+        elif amount < -heap[0][0]:
+            heapq.heapreplace(heap, (-amount, -position, transaction))
+
+    return {
+        group_key: [(-amount, -position, transaction) for amount, position, transaction in sorted(heap, reverse=True)]
+        for group_key, heap in heaps.items()
+    }
+
+
+def _top_k_table(table: TransactionTable, k: int, key: Optional[str | KeyFunc],
+                 amount_field: str) -> Dict[Any, List[TopEntry]]:
+    """Топ-K по группам для TransactionTable одной сортировкой по (группа, сумма, номер строки)."""
+    if not len(table):
+        return {}
+    amounts = table.amounts(amount_field)
+    positions = np.arange(len(table))
+    if key is None:
+        codes, labels = np.zeros(len(table), dtype=np.int64), np.array([None], dtype=object)
+    else:
+        codes, labels = _table_keys(table, key)
+
+    order = np.lexsort((positions, amounts, codes))
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    selected = order[rank < k]
+
+    # selected упорядочен по коду группы, а коды идут в порядке первого появления ключа
+    groups: Dict[Any, List[TopEntry]] = {}
+    for position in selected:
+        label = labels[codes[position]]
+        groups.setdefault(label, []).append((int(amounts[position]) / 100, int(position), table[int(position)]))
+    return groups
+
+
+def top_k(
+    data: Iterable[Mapping] | TransactionTable | DataFrame,
+    k: int = 5,
+    key: Optional[str | KeyFunc] = None,
+    amount_field: str = "amount_transaction_rub",
+) -> Dict[Any, List[TopEntry]]:
+    """
+    Находит K транзакций с наименьшей суммой (крупнейших трат) — всего или в каждой группе — за один проход.
+
+    :param data: список или генератор словарей транзакций, TransactionTable или типизированный DataFrame
+    :param k: размер топа
+    :param key: ключ группировки (как в aggregate); None — один общий топ под ключом None
+    :param amount_field: поле суммы операции
+    :return: словарь {значение ключа: [(сумма, номер строки, транзакция), ...]},
+        внутри группы — по возрастанию суммы, при равенстве — по номеру строки
+    """
+    if k < 1:
+        raise ValueError("Размер топа должен быть положительным")
+    if isinstance(data, DataFrame):
+        data = TransactionTable.from_frame(data)
+    if isinstance(data, TransactionTable):
+        return _top_k_table(data, k, key, amount_field)
+    return _top_k_records(data, k, key, amount_field)
@@ -0,0 +1,196 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.metrics import METRICS
+from src.server import Dataset, DatasetState, spending_json
+from src.views import web_page
+
+logger = logging.getLogger(__name__)
+
+# Сервис -> функция (состояние набора данных, аргументы запроса) -> JSON-строка
+SERVICES: Dict[str, Callable[..., str]] = {
+    "web_page": lambda state, current_time: web_page(current_time, state.table, store=state.store),
+    "search": lambda state, key_word: state.search(state.table, key_word, index=state.index),
+    "spending": lambda state, category, date=None: spending_json(state, category, date),
+}
+
+
+def read_queries(lines: Iterable[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Запросы из JSON Lines: {"service": "search", "args": {"key_word": "магнит"}, "id": "необязательный"}.
+
+    :param lines: строки файла
+    :return: пары (номер строки, запрос); пустые строки пропускаются
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            query = json.loads(line)
+        except json.JSONDecodeError as e:
+            query = {"error": f"Некорректный JSON: {e}"}
+        if not isinstance(query, dict):
+            query = {"error": "Запрос должен быть объектом JSON"}
+        yield number, query
+
+
+def run_query(state: DatasetState, line: int, query: Dict[str, Any], timings: bool = False) -> Dict[str, Any]:
+    """
+    Выполняет один запрос.
+
+    :param timings: добавить в результат разбивку времени по этапам ("timings")
+    :return: {"line", "id", "service", "status": "ok" | "error", "seconds", "result" | "error"[, "timings"]}
+    """
+    service = query.get("service")
+    output: Dict[str, Any] = {"line": line, "id": query.get("id"), "service": service}
+    started = time.perf_counter()
+    with METRICS.collect() as breakdown:
+        try:
+            if "error" in query:
+                raise ValueError(query["error"])
+            if service not in SERVICES:
+                raise ValueError(f"Неизвестный сервис: {service}")
+            args = query.get("args", {})
+            if not isinstance(args, dict):
+                raise ValueError("Аргументы запроса должны быть объектом JSON")
+            result = SERVICES[service](state, **args)
+            output.update(status="ok", result=json.loads(result))
+        except Exception as e:
+            output.update(status="error", error=str(e))
+    output["seconds"] = round(time.perf_counter() - started, 6)
+    if timings:
+        output["timings"] = breakdown
+    return output
+
+
+# Набор данных процесса-обработчика (загружается один раз при старте процесса)
+_worker_dataset: Optional[Dataset] = None
+
+
+def _init_worker(path: str) -> None:
+    global _worker_dataset
+    _worker_dataset = Dataset(path)
+
+
+def _run_in_worker(line: int, query: Dict[str, Any], timings: bool) -> Dict[str, Any]:
+    return run_query(_worker_dataset.current(), line, query, timings)
+
+
+def _percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def summarize(outputs: Iterable[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """Итоги пакета: число запросов, ошибки и время по сервисам (среднее, медиана, p95, максимум)."""
+    timings: Dict[str, List[float]] = {}
+    errors = 0
+    for output in outputs:
+        timings.setdefault(str(output["service"]), []).append(output["seconds"])
+        errors += output["status"] == "error"
+    count = sum(len(values) for values in timings.values())
+    return {
+        "queries": count,
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 6),
+        "queries_per_second": round(count / wall_seconds, 2) if wall_seconds else None,
+        "services": {
+            service: {
+                "count": len(values),
+                "mean": round(sum(values) / len(values), 6),
+                "p50": _percentile(values, 0.5),
+                "p95": _percentile(values, 0.95),
+                "max": max(values),
+            }
+            for service, values in timings.items()
+        },
+    }
+
+
+def run_batch(path: str | Path, queries: Iterable[str], out: IO[str], workers: int = 1,
+              timings: bool = False) -> Dict[str, Any]:
+    """
+    Выполняет пакет запросов над одним загруженным набором данных и пишет результаты потоком.
+
+    Каждый результат — отдельная строка JSON Lines с номером строки запроса и временем выполнения.
+    При workers > 1 запросы выполняются параллельно в процессах, каждый из которых загружает
+    набор данных один раз; результаты пишутся по мере готовности (порядок — по полю "line").
+
+    :param path: путь до рабочей книги
+    :param queries: строки JSON Lines с запросами
+    :param out: куда писать результаты
+    :param workers: число процессов (1 — все в текущем процессе)
+    :param timings: добавлять в результаты разбивку времени по этапам
+    :return: итоги пакета (summarize)
+    """
+    started = time.perf_counter()
+    outputs: List[Dict[str, Any]] = []
+
+    def emit(output: Dict[str, Any]) -> None:
+        METRICS.observe("query_seconds", output["seconds"], service=output["service"])
+        if workers > 1:
+            # Этапы, замеренные в процессах-обработчиках, переносятся в реестр текущего процесса
+            for entry in output.get("timings", []):
+                METRICS.observe("stage_seconds", entry["seconds"], stage=entry["stage"])
+            if not timings:
+                output.pop("timings", None)
+        summary = {key: value for key, value in output.items() if key not in ("result", "timings")}
+        outputs.append(summary)
+        out.write(json.dumps(output, ensure_ascii=False) + "\n")
+        out.flush()
+
+    if workers > 1:
+        # Процессы запускаются через spawn: fork после старта фоновых потоков логирования (src.logs)
+        # может унаследовать захваченную ими блокировку и зависнуть
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(str(path),),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(_run_in_worker, line, query, METRICS.enabled) for line, query in read_queries(queries)
+            ]
+            for future in as_completed(futures):
+                emit(future.result())
+    else:
+        state = Dataset(path).current()
+        for line, query in read_queries(queries):
+            emit(run_query(state, line, query, timings))
+
+    summary = summarize(outputs, time.perf_counter() - started)
+    logger.info("Выполнено запросов: %s, ошибок: %s, за %.3f с",
+                summary["queries"], summary["errors"], summary["wall_seconds"])
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Пакетное выполнение запросов из файла JSON Lines")
+    parser.add_argument("queries", help="файл с запросами (JSON Lines); '-' — стандартный ввод")
+    parser.add_argument("-o", "--output", help="файл для результатов (по умолчанию — стандартный вывод)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="число процессов")
+    parser.add_argument("--file", default=str(Path(__file__).resolve().parent.parent / "data" / "operations.xlsx"))
+    parser.add_argument("--timings", action="store_true", help="добавить в результаты разбивку времени по этапам")
+    parser.add_argument("--metrics", help="файл для метрик в формате Prometheus")
+    arguments = parser.parse_args(argv)
+
+    queries = sys.stdin if arguments.queries == "-" else open(arguments.queries, "r", encoding="utf-8")
+    out = open(arguments.output, "w", encoding="utf-8") if arguments.output else sys.stdout
+    try:
+        summary = run_batch(arguments.file, queries, out, arguments.workers, arguments.timings)
+    finally:
+        if queries is not sys.stdin:
+            queries.close()
+        if out is not sys.stdout:
+            out.close()
+    if arguments.metrics:
+        METRICS.write_prometheus(arguments.metrics)
+    print(json.dumps(summary, ensure_ascii=False, indent=4), file=sys.stderr)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.quote_providers import OfflineQuoteProvider
+from src.reports import spending_by_category
+from src.services import search_transactions_by_keyword
+from src.synthetic import XLSX_MAX_ROWS, write_export
+from src.utils import (count_stat_by_card, find_top_5_transactions,
+                       quote_provider, read_xlsx, read_xlsx_table,
+                       use_quote_provider)
+from src.views import web_page
+
+logger = logging.getLogger(__name__)
+
+MAIN_DIR = Path(__file__).resolve().parent.parent
+BASELINE_DIR = MAIN_DIR / "benchmarks"
+DATA_DIR = BASELINE_DIR / "data"
+FIXTURES_PATH = MAIN_DIR / "data" / "quotes.fixture.json"
+
+SCALES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# Допустимое замедление и рост пиковой памяти относительно базовой линии (доли)
+TIME_TOLERANCE = 0.5
+MEMORY_TOLERANCE = 0.25
+# Разницы меньше этих порогов не считаются регрессией (шум измерений)
+MIN_TIME_DELTA = 0.02
+MIN_MEMORY_DELTA_MB = 1.0
+
+CURRENT_TIME = "2021-12-31 12:00:00"
+
+Context = Dict[str, Any]
+
+# Имя -> (замеряемая функция, наибольшее число строк, на котором она запускается)
+BENCHMARKS: Dict[str, Tuple[Callable[[Context], Any], Optional[int]]] = {
+    "read_xlsx": (lambda context: read_xlsx(context["xlsx"]), XLSX_MAX_ROWS),
+    "read_xlsx_cached": (lambda context: read_xlsx(context["source"], use_cache=True), 1_000_000),
+    "read_xlsx_table": (lambda context: read_xlsx_table(context["source"], use_cache=True), None),
+    "count_stat_by_card": (lambda context: count_stat_by_card(context["table"]), None),
+    "find_top_5_transactions": (lambda context: find_top_5_transactions(context["table"]), None),
+    "search_transactions_by_keyword": (
+        lambda context: search_transactions_by_keyword(context["table"], "магнит"), None
+    ),
+    "spending_by_category": (
+        lambda context: spending_by_category(context["table"], "Супермаркеты", CURRENT_TIME[:10]), None
+    ),
+    "web_page": (lambda context: web_page(CURRENT_TIME, context["table"]), None),
+}
+
+
+def measure(func: Callable[[], Any], repeat: int = 3) -> Dict[str, float]:
+    """
+    Время (лучшее из repeat запусков) и пиковая память одного запуска (по tracemalloc).
+
+    :return: {"seconds": ..., "peak_mb": ...}
+    """
+    timings = []
+    # Как в timeit: сборщик мусора на время замеров отключается, чтобы не добавлять шум
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(min(timings), 6), "peak_mb": round(peak / 2 ** 20, 3)}
+
+
+def calibrate(repeat: int = 5) -> float:
+    """
+    Время эталонной нагрузки (лучшее из repeat), секунды.
+
+    Сохраняется вместе с результатами: при сравнении время базовой линии масштабируется
+    на отношение калибровок, чтобы разница в скорости машин не выглядела как регрессия.
+    """
+    def workload() -> None:
+        values = [str(i) * 3 for i in range(200_000)]
+        sorted(values, key=len)
+        sum(len(value) for value in values)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        workload()
+        timings.append(time.perf_counter() - started)
+    return round(min(timings), 6)
+
+
+def run_suite(rows: int, workdir: str | Path = DATA_DIR, repeat: int = 3, seed: int = 0,
+              names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Генерирует (или берет готовую) выгрузку на rows операций и замеряет сервисы.
+
+    Котировки для web_page берутся из офлайн-фикстуры, отчеты пишутся в workdir.
+
+    :param rows: число операций
+    :param workdir: каталог для синтетических выгрузок
+    :param repeat: сколько раз запускать каждый замер (берется лучшее время)
+    :param seed: зерно генератора
+    :param names: какие замеры выполнить (по умолчанию — все из BENCHMARKS)
+    :return: {"rows", "seed", "python", "results": {имя: {"seconds", "peak_mb"}}}
+    """
+    workdir = Path(workdir)
+    files = write_export(rows, workdir, seed=seed)
+    context: Context = {"source": files["cache"], "xlsx": files.get("xlsx")}
+    context["table"] = read_xlsx_table(context["source"], use_cache=True)
+
+    previous = quote_provider()
+    use_quote_provider(OfflineQuoteProvider.load(FIXTURES_PATH))
+    results: Dict[str, Dict[str, float]] = {}
+    try:
+        with contextlib.chdir(workdir):
+            for name in names or BENCHMARKS:
+                func, max_rows = BENCHMARKS[name]
+                if (max_rows is not None and rows > max_rows) or (name == "read_xlsx" and context["xlsx"] is None):
+                    continue
+                results[name] = measure(lambda: func(context), repeat)
+                logger.info("%s: %.4f с, %.1f МБ", name, results[name]["seconds"], results[name]["peak_mb"])
+    finally:
+        use_quote_provider(previous)
+    return {
+        "rows": rows,
+        "seed": seed,
+        "python": platform.python_version(),
+        "calibration_seconds": calibrate(),
+        "results": results,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], time_tolerance: float = TIME_TOLERANCE,
+            memory_tolerance: float = MEMORY_TOLERANCE) -> List[str]:
+    """
+    Регрессии относительно базовой линии.
+
+    :return: описания регрессий (пустой список — регрессий нет)
+    """
+    regressions = []
+    speed = 1.0
+    if baseline.get("calibration_seconds") and results.get("calibration_seconds"):
+        speed = results["calibration_seconds"] / baseline["calibration_seconds"]
+    for name, current in results["results"].items():
+        expected = baseline.get("results", {}).get(name)
+        if expected is None:
+            continue
+        seconds, base_seconds = current["seconds"], expected["seconds"] * speed
+        if seconds > base_seconds * (1 + time_tolerance) and seconds - base_seconds > MIN_TIME_DELTA:
+            regressions.append(f"{name}: время {seconds:.4f} с против {base_seconds:.4f} с в базовой линии")
+        memory, base_memory = current["peak_mb"], expected["peak_mb"]
+        if memory > base_memory * (1 + memory_tolerance) and memory - base_memory > MIN_MEMORY_DELTA_MB:
+            regressions.append(f"{name}: память {memory:.1f} МБ против {base_memory:.1f} МБ в базовой линии")
+    return regressions
+
+
+def baseline_path(scale: str, directory: str | Path = BASELINE_DIR) -> Path:
+    return Path(directory) / f"baseline_{scale}.json"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Замеры сервисов на синтетических выгрузках")
+    parser.add_argument("--scale", action="append", choices=list(SCALES),
+                        help="масштаб (можно несколько), по умолчанию 10k")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", action="append", choices=list(BENCHMARKS), help="выполнить только эти замеры")
+    parser.add_argument("--update", action="store_true", help="записать результаты как новую базовую линию")
+    parser.add_argument("--tolerance", type=float, default=TIME_TOLERANCE, help="допустимое замедление (доля)")
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    parser.add_argument("--workdir", default=str(DATA_DIR))
+    parser.add_argument("--baselines", default=str(BASELINE_DIR))
+    arguments = parser.parse_args(argv)
+
+    failed = False
+    for scale in arguments.scale or ["10k"]:
+        results = run_suite(SCALES[scale], arguments.workdir, arguments.repeat, names=arguments.only)
+        results["scale"] = scale
+        print(f"\nМасштаб {scale} ({SCALES[scale]} операций):")
+        for name, result in results["results"].items():
+            print(f"  {name:32} {result['seconds']:10.4f} с {result['peak_mb']:10.1f} МБ")
+
+        path = baseline_path(scale, arguments.baselines)
+        baseline = json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+        if arguments.update or baseline is None:
+            if baseline is not None:
+                # Замеры, которые не запускались (--only), остаются из прежней базовой линии
+                results["results"] = {**baseline["results"], **results["results"]}
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(results, ensure_ascii=False, indent=4), encoding="utf-8")
+            print(f"  Базовая линия записана в {path}")
+            continue
+
+        regressions = compare(results, baseline, arguments.tolerance, arguments.memory_tolerance)
+        for regression in regressions:
+            print(f"  РЕГРЕССИЯ {regression}")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from src.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SUFFIX = ".cache.npz"
+SNAPSHOT_VERSION = 1
+
+CACHE_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "rebuilds": 0, "purges": 0}
+
+
+def snapshot_path(file_path: str | Path) -> Path:
+    """Путь до колоночного снимка, который лежит рядом с xlsx-файлом."""
+    file_path = Path(file_path)
+    return file_path.with_name(file_path.name + SNAPSHOT_SUFFIX)
+
+
+def _file_hash(file_path: str | Path) -> str:
+    """Считает SHA-256 содержимого файла, читая его блоками."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def workbook_fingerprint(file_path: str | Path) -> Dict[str, Any]:
+    """
+    Отпечаток рабочей книги: путь, размер, время изменения и хэш содержимого.
+
+    :param file_path: путь до файла xlsx
+    :return: словарь с ключами path, size, mtime_ns, sha256
+    """
+    stat = os.stat(file_path)
+    return {
+        "path": str(Path(file_path).resolve()),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": _file_hash(file_path),
+    }
+
+
+def _read_meta(path: Path) -> Optional[Dict[str, Any]]:
+    """Читает метаданные снимка, не загружая колонки."""
+    try:
+        with np.load(path, allow_pickle=False) as snapshot:
+            return json.loads(str(snapshot["__meta__"]))
+    except Exception as e:
+        logger.warning("Не удалось прочитать снимок %s: %s", path, e)
+        return None
+
+
+def _is_fresh(meta: Dict[str, Any], file_path: str | Path) -> bool:
+    """Проверяет, что снимок построен по текущей версии рабочей книги."""
+    if meta.get("version") != SNAPSHOT_VERSION:
+        return False
+    stored = meta.get("fingerprint", {})
+    stat = os.stat(file_path)
+    if stored.get("path") != str(Path(file_path).resolve()):
+        return False
+    if stored.get("size") != stat.st_size:
+        return False
+    # Время изменения могло сдвинуться без изменения содержимого, поэтому решает хэш
+    return stored.get("sha256") == _file_hash(file_path)
+
+
+def cache_status(file_path: str | Path) -> str:
+    """
+    Состояние кэша для рабочей книги.
+
+    :param file_path: путь до файла xlsx
+    :return: "hit" — снимок актуален, "stale" — устарел, "missing" — снимка нет
+    """
+    path = snapshot_path(file_path)
+    if not path.exists():
+        return "missing"
+    meta = _read_meta(path)
+    if meta is None or not _is_fresh(meta, file_path):
+        return "stale"
+    return "hit"
+
+
+def _encode_frame(df: DataFrame) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Раскладывает DataFrame на numpy-массивы без pickle.
+
+    Строковые колонки хранятся как массивы unicode с отдельной маской пропусков.
+    Если колонку нельзя сохранить без потери типов, возвращается None.
+    """
+    arrays: Dict[str, np.ndarray] = {}
+    columns = []
+    for i, column in enumerate(df.columns):
+        series = df[column]
+        key = f"c{i}"
+        if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series):
+            arrays[key] = series.to_numpy()
+            kind = "native"
+        else:
+            mask = series.isna().to_numpy()
+            values = series[~mask]
+            if not all(isinstance(value, str) for value in values):
+                logger.warning("Колонка '%s' содержит смешанные типы, снимок не создается.", column)
+                return None
+            arrays[key] = series.where(~mask, "").to_numpy(dtype=str)
+            arrays[f"{key}_na"] = mask
+            kind = "str"
+        columns.append({"name": str(column), "key": key, "kind": kind})
+    arrays["__columns__"] = np.array(json.dumps(columns, ensure_ascii=False))
+    return arrays
+
+
+def _decode_frame(snapshot: Any) -> DataFrame:
+    """Собирает DataFrame обратно из колонок снимка."""
+    columns = json.loads(str(snapshot["__columns__"]))
+    data = {}
+    for column in columns:
+        values = snapshot[column["key"]]
+        if column["kind"] == "str":
+            restored = values.astype(object)
+            restored[snapshot[column["key"] + "_na"]] = np.nan
+            values = restored
+        data[column["name"]] = values
+    return pd.DataFrame(data, columns=[column["name"] for column in columns])
+
+
+def save_snapshot(file_path: str | Path, df: DataFrame) -> bool:
+    """
+    Записывает колоночный снимок DataFrame рядом с рабочей книгой.
+
+    :param file_path: путь до файла xlsx
+    :param df: DataFrame, прочитанный из файла
+    :return: True, если снимок записан
+    """
+    arrays = _encode_frame(df)
+    if arrays is None:
+        return False
+    meta = {"version": SNAPSHOT_VERSION, "fingerprint": workbook_fingerprint(file_path)}
+    arrays["__meta__"] = np.array(json.dumps(meta, ensure_ascii=False))
+
+    path = snapshot_path(file_path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp_path, "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error("Ошибка записи снимка %s: %s", path, e)
+        if tmp_path.exists():
+            tmp_path.unlink()
+        return False
+    CACHE_STATS["rebuilds"] += 1
+    logger.info("Снимок %s записан (%s записей).", path, len(df))
+    return True
+
+
+def load_snapshot(file_path: str | Path) -> Optional[DataFrame]:
+    """
+    Загружает актуальный снимок рабочей книги.
+
+    :param file_path: путь до файла xlsx
+    :return: DataFrame или None, если снимка нет или он устарел
+    """
+    path = snapshot_path(file_path)
+    if not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as snapshot:
+            meta = json.loads(str(snapshot["__meta__"]))
+            if not _is_fresh(meta, file_path):
+                logger.info("Снимок %s устарел.", path)
+                return None
+            return _decode_frame(snapshot)
+    except Exception as e:
+        logger.warning("Не удалось загрузить снимок %s: %s", path, e)
+        return None
+
+
+def read_excel_cached(file_path: str | Path, rebuild: bool = False) -> DataFrame:
+    """
+    Читает Excel-файл через колоночный снимок.
+
+    При первом чтении или после изменения файла книга разбирается заново и снимок перестраивается.
+
+    :param file_path: путь до файла xlsx
+    :param rebuild: принудительно перечитать книгу и перестроить снимок
+    :return: DataFrame с исходными колонками книги
+    """
+    if not rebuild:
+        df = load_snapshot(file_path)
+        if df is not None:
+            CACHE_STATS["hits"] += 1
+            logger.info("Файл %s загружен из снимка.", file_path)
+            return df
+
+    CACHE_STATS["misses"] += 1
+    df = pd.read_excel(file_path)
+    save_snapshot(file_path, df)
+    return df
+
+
+def rebuild_cache(file_path: str | Path) -> DataFrame:
+    """Принудительно перечитывает книгу и перезаписывает снимок."""
+    return read_excel_cached(file_path, rebuild=True)
+
+
+def purge_cache(file_path: str | Path) -> bool:
+    """
+    Удаляет снимок рабочей книги.
+
+    :return: True, если снимок существовал и был удален
+    """
+    path = snapshot_path(file_path)
+    if not path.exists():
+        return False
+    path.unlink()
+    CACHE_STATS["purges"] += 1
+    logger.info("Снимок %s удален.", path)
+    return True
+
+
+def cache_stats() -> Dict[str, int]:
+    """Счетчики попаданий, промахов, перестроений и удалений снимков."""
+    return dict(CACHE_STATS)
+
+
+METRICS.register_stats("snapshot_cache", cache_stats)
@@ -0,0 +1,285 @@
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Таймауты на установку соединения и на чтение ответа, секунды
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 5
+# Повторы при 429/5xx и сетевых ошибках
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 4.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Автомат защиты: после стольких неудачных вызовов подряд хост считается недоступным на BREAKER_RESET секунд
+BREAKER_THRESHOLD = 5
+BREAKER_RESET = 30.0
+# Ограничения частоты запросов по хостам: (число запросов, период в секундах)
+RATE_LIMITS: Dict[str, Tuple[int, float]] = {
+    "api.apilayer.com": (10, 1.0),
+    "www.alphavantage.co": (5, 60.0),
+}
+# Дольше этого запрос не ждет своей очереди в ограничителе частоты, секунды
+RATE_LIMIT_MAX_WAIT = 2.0
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Хост временно считается недоступным — запрос не отправлялся."""
+
+
+class RateLimitedError(requests.exceptions.RequestException):
+    """Квота запросов к хосту исчерпана — запрос не отправлялся."""
+
+
+class CircuitBreaker:
+    """
+    Автомат защиты для одного хоста.
+
+    После threshold неудачных вызовов подряд автомат размыкается и вызовы сразу
+    отклоняются. Через reset_timeout секунд пропускается один пробный вызов:
+    успех замыкает автомат, неудача снова размыкает его.
+    """
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Состояние автомата: "closed", "open" или "half_open"."""
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос сейчас."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def release(self) -> None:
+        """Возвращает неиспользованный пробный вызов (запрос так и не был отправлен)."""
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self._trial = False
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты запросов (маркерная корзина): не больше calls запросов за period секунд.
+
+    Если маркера нет, acquire ждет его появления, но не дольше max_wait секунд.
+    """
+
+    def __init__(self, calls: int, period: float, max_wait: float = RATE_LIMIT_MAX_WAIT,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep) -> None:
+        self.capacity = float(calls)
+        self.rate = calls / period
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(calls)
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Забирает маркер; False, если ждать пришлось бы дольше max_wait."""
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            if wait > self.max_wait:
+                return False
+            # Маркер резервируется сразу, поэтому параллельные запросы выстраиваются в очередь
+            self.tokens -= 1
+        if wait:
+            self.sleep(wait)
+        return True
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Пауза из заголовка Retry-After (секунды или HTTP-дата)."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpClient:
+    """
+    HTTP-клиент для API котировок.
+
+    Соединения переиспользуются (keep-alive) через общий пул сессии. У каждого запроса
+    есть таймауты на соединение и чтение. Ответы 429/5xx и сетевые ошибки повторяются
+    с экспоненциальной паузой со случайным разбросом. По каждому хосту работают автомат
+    защиты (пока хост недоступен, запросы сразу отклоняются) и ограничитель частоты.
+    Отказ клиента — исключение-наследник requests.exceptions.RequestException.
+    """
+
+    def __init__(
+        self,
+        timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = BACKOFF_BASE,
+        backoff_max: float = BACKOFF_MAX,
+        breaker_threshold: int = BREAKER_THRESHOLD,
+        breaker_reset: float = BREAKER_RESET,
+        rate_limits: Optional[Dict[str, Tuple[int, float]]] = None,
+        pool_size: int = 10,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.rate_limits = dict(RATE_LIMITS if rate_limits is None else rate_limits)
+        self.clock = clock
+        self.sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.limiters: Dict[str, RateLimiter] = {}
+        self.stats: Dict[str, int] = {"requests": 0, "retries": 0, "rejected": 0, "rate_limited": 0}
+        self._lock = threading.Lock()
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        """Автомат защиты хоста (создается при первом обращении)."""
+        with self._lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_reset, self.clock)
+            return self.breakers[host]
+
+    def limiter(self, host: str) -> Optional[RateLimiter]:
+        """Ограничитель частоты хоста или None, если для хоста ограничения нет."""
+        if host not in self.rate_limits:
+            return None
+        with self._lock:
+            if host not in self.limiters:
+                calls, period = self.rate_limits[host]
+                self.limiters[host] = RateLimiter(calls, period, clock=self.clock, sleep=self.sleep)
+            return self.limiters[host]
+
+    def _count(self, name: str) -> None:
+        """Увеличивает счетчик stats (клиент общий для потоков)."""
+        with self._lock:
+            self.stats[name] += 1
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        """Пауза перед повтором: Retry-After, если сервер его прислал, иначе экспонента со случайным разбросом."""
+        ceiling = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        if response is not None:
+            retry_after = _retry_after(response)
+            if retry_after is not None:
+                return min(retry_after, self.backoff_max)
+        return random.uniform(0, ceiling)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        """
+        GET-запрос с таймаутами, повторами, автоматом защиты и ограничением частоты.
+
+        :param url: адрес запроса
+        :param kwargs: параметры requests (headers, params, ...)
+        :return: ответ (после исчерпания повторов — последний полученный, даже с ошибочным статусом)
+        :raises requests.exceptions.RequestException: сетевая ошибка, открытый автомат или исчерпанная квота
+        """
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError(f"Сервис {host} временно недоступен")
+        kwargs.setdefault("timeout", self.timeout)
+        limiter = self.limiter(host)
+
+        attempt = 0
+        while True:
+            if limiter is not None and not limiter.acquire():
+                self._count("rate_limited")
+                # Исчерпанная квота — не сбой хоста, поэтому автомат только освобождает пробный вызов
+                breaker.release()
+                raise RateLimitedError(f"Превышена частота запросов к {host}")
+            self._count("requests")
+            response: Optional[requests.Response] = None
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= self.max_retries:
+                    breaker.record_failure()
+                    raise
+                logger.warning("Ошибка запроса к %s: %s; повтор", host, e)
+            except requests.exceptions.RequestException:
+                # Прочие ошибки запроса (оборванный ответ, цикл редиректов, неверный адрес) не повторяются
+                breaker.record_failure()
+                raise
+            except BaseException:
+                # Запрос не выполнен по причине вне сети (например, прерывание): пробный вызов возвращается
+                breaker.release()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    return response
+                if attempt >= self.max_retries:
+                    breaker.record_failure()
+                    return response
+                logger.warning("Ответ %s от %s; повтор", response.status_code, host)
+
+            self._count("retries")
+            self.sleep(self._backoff(attempt, response))
+            attempt += 1
+
+    def close(self) -> None:
+        """Закрывает соединения пула."""
+        self.session.close()
+
+
+# Общий клиент для запросов к API котировок
+HTTP = HttpClient()
+METRICS.register_stats("http_client", lambda: HTTP.stats)
@@ -0,0 +1,287 @@
+import hashlib
+import heapq
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from src.table import TransactionTable, parse_operation_date
+from src.utils import (TOP_FIELDS, clean_top_transactions,
+                       count_stat_by_card, find_top_transactions)
+
+logger = logging.getLogger(__name__)
+
+STORE_VERSION = 4
+
+# Сколько строк учтенной части сверяет refresh: последние строки и столько же через равные промежутки
+PREFIX_CHECK_ROWS = 8
+
+
+def _kopecks(value: Any) -> int:
+    """Сумма в копейках."""
+    return round(float(value or 0) * 100)
+
+
+def transaction_digest(transaction: Mapping) -> str:
+    """Отпечаток транзакции для проверки, что уже учтенная история не изменилась."""
+    payload = json.dumps(dict(transaction), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def prefix_positions(rows: int, count: int = PREFIX_CHECK_ROWS) -> List[int]:
+    """Номера строк, по которым сверяются первые rows строк: последние count и count через равные промежутки."""
+    spread = {(rows - 1) * i // (count - 1) for i in range(count)} if rows and count > 1 else set()
+    return sorted(spread | set(range(max(rows - count, 0), rows)))
+
+
+def prefix_digest(data: Sequence[Mapping] | TransactionTable, rows: int) -> Optional[str]:
+    """
+    Отпечаток первых rows строк набора данных (None, если строк нет).
+
+    Считается по выборке строк (prefix_positions), поэтому стоит O(PREFIX_CHECK_ROWS), а не O(rows):
+    сдвиг строк, замена выгрузки и правки в конце учтенной части обнаруживаются,
+    а отдельная правка в середине большой истории — только если строка попала в выборку.
+    """
+    if not rows:
+        return None
+    digest = hashlib.sha256(str(rows).encode("ascii"))
+    for position in prefix_positions(rows):
+        transaction = data[position]
+        row = transaction_digest(transaction) if isinstance(transaction, Mapping) else repr(transaction)
+        digest.update(f"{position}:{row}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def file_signature(path: Optional[str | Path]) -> Optional[List[int]]:
+    """Размер и время изменения файла-источника данных (None, если файла нет или путь не задан)."""
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class AggregateStore:
+    """
+    Инкрементальные агрегаты по картам и топ-K трат, разбитые по месяцам.
+
+    Для каждого месяца хранятся суммы трат и кэшбэка по картам (в копейках) и
+    ограниченная куча из K крупнейших трат. Новые транзакции добавляются через
+    apply или refresh без повторного прохода по истории; состояние сохраняется в JSON.
+    Перед тем как учесть только дельту, refresh сверяет выборку строк уже учтенной истории
+    (prefix_digest), а если файл-источник с прошлого раза не менялся — только его размер и время изменения.
+    """
+
+    def __init__(self, k: int = 5, path: Optional[str | Path] = None) -> None:
+        self.k = k
+        self.path = Path(path) if path else None
+        self.rows = 0
+        # Отпечаток учтенных строк (см. prefix_digest)
+        self.prefix_digest: Optional[str] = None
+        # Размер и время изменения файла, по которому агрегаты догнаны последними (см. file_signature)
+        self.source_signature: Optional[List[int]] = None
+        # Набор данных, с которым агрегаты сверены последними (в памяти, не сохраняется)
+        self._synced: Any = None
+        self.card_order: List[str] = []
+        # месяц -> {"cards": {карта: [кэшбэк, траты]}, "top": [[-сумма, -номер, запись], ...],
+        #           "last_dt": самая поздняя дата операции месяца в ISO-формате}
+        self.months: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def load(cls, path: str | Path, k: int = 5) -> "AggregateStore":
+        """
+        Загружает хранилище из JSON-файла; если файла нет или он поврежден — пустое хранилище.
+
+        :param path: путь до файла хранилища
+        :param k: размер топа; если он не совпадает с сохраненным, хранилище строится заново
+        """
+        store = cls(k=k, path=path)
+        if not os.path.exists(path):
+            return store
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Ошибка чтения хранилища агрегатов %s: %s", path, e)
+            return store
+        if state.get("version") != STORE_VERSION or state.get("k") != k:
+            logger.info("Хранилище агрегатов %s несовместимо и будет построено заново.", path)
+            return store
+        store.rows = state["rows"]
+        store.prefix_digest = state["prefix_digest"]
+        store.source_signature = state["source_signature"]
+        store.card_order = state["card_order"]
+        store.months = state["months"]
+        logger.info("Хранилище агрегатов %s загружено: учтено %s транзакций.", path, store.rows)
+        return store
+
+    def save(self, path: Optional[str | Path] = None) -> None:
+        """Сохраняет состояние в JSON-файл (по умолчанию — в тот, из которого загружено)."""
+        path = Path(path) if path else self.path
+        if path is None:
+            raise ValueError("Не указан путь для сохранения хранилища агрегатов")
+        state = {
+            "version": STORE_VERSION,
+            "k": self.k,
+            "rows": self.rows,
+            "prefix_digest": self.prefix_digest,
+            "source_signature": self.source_signature,
+            "card_order": self.card_order,
+            "months": self.months,
+        }
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def reset(self) -> None:
+        """Очищает все агрегаты."""
+        self.rows = 0
+        self.prefix_digest = None
+        self.source_signature = None
+        self._synced = None
+        self.card_order = []
+        self.months = {}
+
+    def apply(self, transactions: Sequence[Mapping] | TransactionTable) -> int:
+        """
+        Добавляет новые транзакции к агрегатам.
+
+        Отпечаток учтенных строк по одной дельте не посчитать, поэтому он сбрасывается
+        (его заново считает refresh по всему набору данных).
+
+        :param transactions: только новые транзакции (дельта)
+        :return: количество учтенных транзакций
+        """
+        count = 0
+        for transaction in transactions:
+            operation_dt = parse_operation_date(transaction.get("operation_date", ""))
+            month_key = operation_dt.strftime("%Y-%m") if operation_dt else ""
+            month = self.months.setdefault(month_key, {"cards": {}, "top": [], "last_dt": ""})
+            if operation_dt:
+                month["last_dt"] = max(month["last_dt"], operation_dt.isoformat())
+            card = transaction.get("last_digits", "")
+            if card not in month["cards"]:
+                month["cards"][card] = [0, 0]
+                if card not in self.card_order:
+                    self.card_order.append(card)
+            totals = month["cards"][card]
+            totals[0] += _kopecks(transaction.get("cashback", 0))
+            amount = _kopecks(transaction.get("amount_transaction_rub", 0))
+            if amount < 0:
+                totals[1] -= amount
+
+            # В куче лежит K наименьших сумм; на вершине — худшая из них (и самая поздняя при равенстве)
+            record = {key: value for key, value in transaction.items() if key in TOP_FIELDS}
+            entry = [-amount, -(self.rows + count), record]
+            if len(month["top"]) < self.k:
+                heapq.heappush(month["top"], entry)
+            elif amount < -month["top"][0][0]:
+                heapq.heapreplace(month["top"], entry)
+
+            count += 1
+
+        self.rows += count
+        if count:
+            self.prefix_digest = None
+            logger.info("В агрегаты добавлено %s транзакций.", count)
+        return count
+
+    def refresh(self, data: Sequence[Mapping] | TransactionTable, source: Optional[str | Path] = None) -> int:
+        """
+        Догоняет агрегаты до полного набора данных, учитывая только дописанные в конец строки.
+
+        Если уже учтенная часть истории изменилась (не совпал prefix_digest), агрегаты
+        пересчитываются целиком. Проверка стоит O(PREFIX_CHECK_ROWS + новые строки) и не нужна вовсе,
+        если файл source не менялся с прошлого раза или передан тот же объект данных той же длины:
+        как и TransactionTable, набор данных считается неизменным после загрузки.
+
+        :param data: весь набор транзакций
+        :param source: файл, из которого прочитан data
+        :return: количество учтенных транзакций
+        """
+        if self._synced is data and self.rows == len(data):
+            return 0
+        signature = file_signature(source)
+        unchanged = signature is not None and signature == self.source_signature and self.rows == len(data)
+        if not unchanged and (self.rows > len(data) or prefix_digest(data, self.rows) != self.prefix_digest):
+            logger.warning("История транзакций изменилась, агрегаты пересчитываются полностью.")
+            self.reset()
+
+        if isinstance(data, TransactionTable):
+            delta = [data[position] for position in range(self.rows, len(data))]
+        else:
+            delta = data[self.rows:]
+        count = self.apply(delta)
+        if count:
+            self.prefix_digest = prefix_digest(data, self.rows)
+        changed = count or signature != self.source_signature
+        self.source_signature = signature
+        self._synced = data
+        if self.path is not None and changed:
+            self.save()
+        return count
+
+    def _selected_months(self, month: Optional[str]) -> List[Dict[str, Any]]:
+        if month is None:
+            return list(self.months.values())
+        return [self.months[month]] if month in self.months else []
+
+    def covers(self, moment: datetime) -> bool:
+        """
+        Можно ли отдать агрегаты месяца moment как период «с начала месяца по moment».
+
+        Это так, если в месяце нет учтенных операций позже moment.
+        """
+        month = self.months.get(moment.strftime("%Y-%m"))
+        return month is None or month["last_dt"] <= moment.isoformat()
+
+    def card_stats(self, month: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Статистика по картам в формате count_stat_by_card.
+
+        :param month: месяц в формате ГГГГ-ММ; по умолчанию — вся история
+        """
+        months = self._selected_months(month)
+        results = []
+        for card in self.card_order:
+            present = [m["cards"][card] for m in months if card in m["cards"]]
+            if not present:
+                continue
+            results.append(
+                {
+                    "last_digits": card if card else "Другие карты",
+                    "total_spent": round(sum(totals[1] for totals in present) / 100, 2),
+                    "cashback": round(sum(totals[0] for totals in present) / 100, 2),
+                }
+            )
+        return results
+
+    def top_transactions(self, month: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Топ-K трат в формате find_top_5_transactions.
+
+        :param month: месяц в формате ГГГГ-ММ; по умолчанию — вся история
+        """
+        entries = [entry for m in self._selected_months(month) for entry in m["top"]]
+        best = heapq.nsmallest(self.k, entries, key=lambda entry: (-entry[0], -entry[1]))
+        return clean_top_transactions(record for *_, record in best)
+
+    def verify(self, data: Sequence[Mapping] | TransactionTable) -> bool:
+        """
+        Сверяет агрегаты с полным пересчетом по всем данным.
+
+        :param data: весь набор транзакций, по которому построено хранилище
+        :return: True, если статистика по картам и топ совпадают
+        """
+        full = data if isinstance(data, TransactionTable) else TransactionTable.from_records(data)
+        key = lambda stats: str(stats["last_digits"])  # noqa: E731
+        cards_ok = sorted(count_stat_by_card(full), key=key) == sorted(self.card_stats(), key=key)
+        top_ok = find_top_transactions(full, self.k) == self.top_transactions()
+        if not (cards_ok and top_ok):
+            logger.error("Инкрементальные агрегаты расходятся с полным пересчетом.")
+        return cards_ok and top_ok
@@ -0,0 +1,168 @@
+import atexit
+import copy
+import logging
+import queue
+import threading
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Any, Dict, List
+
+from src.metrics import METRICS
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+CONSOLE_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Сколько записей ждет фоновой записи; при переполнении новые записи отбрасываются
+LOG_QUEUE_SIZE = 10_000
+
+# Сколько одинаковых построчных предупреждений пишется полностью, прежде чем они только считаются
+REPEATED_LIMIT = 3
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Кладет записи в очередь и сразу возвращается; в файл или консоль их пишет фоновый поток.
+
+    В потоке вызова сообщение только подставляет аргументы (чтобы изменение объектов после
+    вызова не попало в лог); время, уровень и трассировка оформляются в фоновом потоке.
+    Если очередь заполнена, запись отбрасывается и учитывается в dropped.
+    """
+
+    def __init__(self, log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listeners: List[QueueListener] = []
+_handlers: List[NonBlockingQueueHandler] = []
+_lock = threading.RLock()
+
+
+def queue_handler(*handlers: logging.Handler, queue_size: int = LOG_QUEUE_SIZE) -> NonBlockingQueueHandler:
+    """
+    Обработчик-очередь поверх handlers: запись идет в фоновом потоке, который останавливается при выходе.
+
+    :param handlers: обработчики, которые пишут записи (файл, консоль)
+    :param queue_size: размер очереди
+    :return: обработчик для logger.addHandler
+    """
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    with _lock:
+        if not _listeners:
+            atexit.register(stop_logging)
+        _listeners.append(listener)
+        _handlers.append(handler)
+    return handler
+
+
+def attach_file_log(logger: logging.Logger, path: str | Path, level: int = logging.DEBUG) -> NonBlockingQueueHandler:
+    """
+    Подключает к логгеру запись в файл через очередь.
+
+    Файл открывается при первой записи, а не при подключении.
+    """
+    file_handler = logging.FileHandler(path, encoding="utf-8", delay=True)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler = queue_handler(file_handler)
+    logger.addHandler(handler)
+    return handler
+
+
+def configure_console_logging(level: int = logging.INFO) -> None:
+    """
+    Вывод корневого логгера в консоль через очередь (вместо logging.basicConfig).
+
+    Как и basicConfig, ничего не делает, если у корневого логгера уже есть обработчики.
+    """
+    root = logging.getLogger()
+    with _lock:
+        if root.handlers:
+            return
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        root.setLevel(level)
+        root.addHandler(queue_handler(console))
+
+
+def flush_logging() -> None:
+    """Дожидается записи всех записей из очередей (останавливает и снова запускает фоновые потоки)."""
+    with _lock:
+        listeners = list(_listeners)
+    for listener in listeners:
+        listener.stop()
+        listener.start()
+
+
+def stop_logging() -> None:
+    """Записывает оставшиеся записи и останавливает фоновые потоки (вызывается при выходе)."""
+    with _lock:
+        listeners = list(_listeners)
+        _listeners.clear()
+    for listener in listeners:
+        listener.stop()
+
+
+def logging_stats() -> Dict[str, int]:
+    """Число записей, отброшенных из-за переполненных очередей."""
+    with _lock:
+        handlers = list(_handlers)
+    return {"dropped": sum(handler.dropped for handler in handlers)}
+
+
+METRICS.register_stats("log_records", logging_stats)
+
+
+class RepeatedWarnings:
+    """
+    Построчные предупреждения с ограничением: первые limit сообщений каждого вида
+    пишутся полностью, остальные только считаются, а flush() пишет итог по каждому виду.
+
+    Вид сообщения — его шаблон (без аргументов), поэтому стоимость логирования
+    перестает расти с числом некорректных строк.
+    """
+
+    def __init__(self, logger: logging.Logger, limit: int = REPEATED_LIMIT) -> None:
+        self.logger = logger
+        self.limit = limit
+        self.counts: Counter = Counter()
+        self.levels: Dict[str, int] = {}
+
+    def log(self, level: int, msg: str, *args: Any) -> None:
+        self.counts[msg] += 1
+        if self.counts[msg] <= self.limit:
+            self.levels[msg] = level
+            self.logger.log(level, msg, *args)
+
+    def warning(self, msg: str, *args: Any) -> None:
+        self.log(logging.WARNING, msg, *args)
+
+    def error(self, msg: str, *args: Any) -> None:
+        self.log(logging.ERROR, msg, *args)
+
+    def flush(self) -> None:
+        """Пишет, сколько сообщений каждого вида не попало в лог, и сбрасывает счетчики."""
+        for msg, count in self.counts.items():
+            if count > self.limit:
+                self.logger.log(
+                    self.levels[msg], "Еще %s сообщений вида '%s' не записано (всего %s)",
+                    count - self.limit, msg, count,
+                )
+        self.counts.clear()
+        self.levels.clear()
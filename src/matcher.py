@@ -0,0 +1,69 @@
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+class AhoCorasick:
+    """
+    Автомат Ахо — Корасик: находит все вхождения набора подстрок за один проход по тексту.
+
+    Шаблоны и текст сравниваются после casefold, то есть без учета регистра
+    (в том числе для кириллицы); спецсимволы ничего не значат — ищутся буквально.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self.patterns: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[int]] = [set()]
+
+        for pattern in patterns:
+            self._add(pattern.casefold())
+        self._link()
+
+    def _add(self, pattern: str) -> None:
+        pattern_id = len(self.patterns)
+        self.patterns.append(pattern)
+        state = 0
+        for char in pattern:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            state = following
+        self._output[state].add(pattern_id)
+
+    def _link(self) -> None:
+        """Строит суффиксные ссылки обходом в ширину и объединяет выходы состояний."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[following] = self._goto[fail].get(char, 0)
+                self._output[following] |= self._output[self._fail[following]]
+
+    def find(self, text: str) -> Set[int]:
+        """
+        Номера шаблонов, которые встречаются в тексте.
+
+        :param text: текст для поиска
+        :return: множество номеров шаблонов (в порядке добавления в patterns)
+        """
+        found: Set[int] = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text.casefold():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        # Пустой шаблон встречается в любом тексте
+        found |= output[0]
+        return found
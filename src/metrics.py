@@ -0,0 +1,269 @@
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Префикс имен метрик в формате Prometheus
+METRICS_PREFIX = "transactions_"
+
+# Границы корзин гистограмм длительности, секунды (как у клиента Prometheus по умолчанию)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Этапы текущего запроса (см. Metrics.collect); список общий для потоков, запущенных из запроса
+_breakdown: contextvars.ContextVar[Optional[List[Dict[str, Any]]]] = contextvars.ContextVar(
+    "metrics_breakdown", default=None
+)
+
+
+class _NoopSpan:
+    """Таймер, который ничего не делает: его отдает span(), когда метрики выключены."""
+
+    seconds = 0.0
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """Таймер этапа: при выходе из блока пишет длительность в гистограмму и в разбивку запроса."""
+
+    __slots__ = ("metrics", "stage", "detail", "started", "seconds")
+
+    def __init__(self, metrics: "Metrics", stage: str, detail: Optional[str] = None) -> None:
+        self.metrics = metrics
+        self.stage = stage
+        self.detail = detail
+        self.seconds = 0.0
+
+    def __enter__(self) -> "Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.seconds = time.perf_counter() - self.started
+        self.metrics.observe("stage_seconds", self.seconds, stage=self.stage)
+        breakdown = _breakdown.get()
+        if breakdown is not None:
+            entry = {"stage": self.stage, "seconds": round(self.seconds, 6)}
+            if self.detail is not None:
+                entry["detail"] = self.detail
+            breakdown.append(entry)
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин (накопительные счетчики считаются при выгрузке)."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metrics:
+    """
+    Счетчики, гистограммы и таймеры этапов с выгрузкой в текстовый формат Prometheus.
+
+    Выключенный реестр почти ничего не стоит: span() отдает общий пустой таймер,
+    inc() и observe() сразу возвращаются. Счетчики, которые модули уже ведут сами
+    (кэши, HTTP-клиент), подключаются через register_stats и читаются только при выгрузке.
+    """
+
+    def __init__(self, enabled: bool = True, buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 prefix: str = METRICS_PREFIX) -> None:
+        self.enabled = enabled
+        self.buckets = buckets
+        self.prefix = prefix
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._stats: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        """Обнуляет счетчики и гистограммы (подключенные источники счетчиков остаются)."""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Увеличивает счетчик name (в выгрузке — name_total) на value."""
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        """Добавляет значение в гистограмму name."""
+        if not self.enabled:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def span(self, stage: str, detail: Optional[str] = None) -> Span | _NoopSpan:
+        """
+        Таймер этапа для блока with: длительность попадает в гистограмму stage_seconds{stage=...}
+        и, если идет сбор разбивки (collect), — в разбивку текущего запроса.
+
+        :param stage: имя этапа (метка гистограммы, значений должно быть немного)
+        :param detail: уточнение только для разбивки запроса (например, тикер котировки)
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, stage, detail)
+
+    def timed(self, stage: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """Декоратор: каждый вызов функции замеряется как этап stage."""
+
+        def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.span(stage):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    @contextmanager
+    def collect(self) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Собирает разбивку времени по этапам для одного запроса.
+
+        Отдает список, в который по мере завершения этапов добавляются {"stage", "seconds"[, "detail"]}.
+        Потоки, запущенные с contextvars.copy_context(), пишут в тот же список.
+        """
+        breakdown: List[Dict[str, Any]] = []
+        token = _breakdown.set(breakdown if self.enabled else None)
+        try:
+            yield breakdown
+        finally:
+            _breakdown.reset(token)
+
+    def register_stats(self, name: str, source: Callable[[], Dict[str, float]]) -> None:
+        """
+        Подключает словарь счетчиков, который ведет другой модуль (например, QUOTES.stats).
+
+        В выгрузке он становится счетчиком name_total с меткой kind для каждого ключа.
+        """
+        self._stats[name] = source
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущие значения: {"counters": {...}, "histograms": {...}} с метками в ключе."""
+        with self._lock:
+            counters = {name + _format_labels(labels): value for (name, labels), value in self.counters.items()}
+            histograms = {
+                name + _format_labels(labels): {"count": histogram.count, "sum": round(histogram.sum, 6)}
+                for (name, labels), histogram in self.histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def render_prometheus(self) -> str:
+        """Все метрики в текстовом формате Prometheus (версия 0.0.4)."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (list(h.counts), h.sum, h.count)) for key, h in self.histograms.items())
+
+        lines: List[str] = []
+        for name, source in sorted(self._stats.items()):
+            try:
+                stats = source()
+            except Exception as e:
+                logger.error("Ошибка чтения счетчиков %s: %s", name, e)
+                continue
+            full_name = f"{self.prefix}{name}_total"
+            lines.append(f"# TYPE {full_name} counter")
+            lines.extend(
+                f"{full_name}{_format_labels((('kind', str(kind)),))} {value}"
+                for kind, value in sorted(stats.items())
+                if isinstance(value, (int, float))
+            )
+
+        typed = set()
+        for (name, labels), value in counters:
+            full_name = f"{self.prefix}{name}_total"
+            if full_name not in typed:
+                typed.add(full_name)
+                lines.append(f"# TYPE {full_name} counter")
+            lines.append(f"{full_name}{_format_labels(labels)} {value}")
+
+        for (name, labels), (counts, total, count) in histograms:
+            full_name = self.prefix + name
+            if full_name not in typed:
+                typed.add(full_name)
+                lines.append(f"# TYPE {full_name} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{full_name}_bucket{_format_labels(labels, (('le', le),))} {cumulative}")
+            lines.append(f"{full_name}_sum{_format_labels(labels)} {round(total, 6)}")
+            lines.append(f"{full_name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str | Path) -> None:
+        """Записывает метрики в файл (например, для textfile-коллектора node_exporter)."""
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        try:
+            tmp_path.write_text(self.render_prometheus(), encoding="utf-8")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error("Ошибка записи метрик %s: %s", path, e)
+
+
+def server_timing(breakdown: List[Dict[str, Any]]) -> str:
+    """Разбивка запроса в виде заголовка Server-Timing (длительности в миллисекундах, по этапам)."""
+    totals: Dict[str, float] = {}
+    for entry in breakdown:
+        totals[entry["stage"]] = totals.get(entry["stage"], 0.0) + entry["seconds"]
+    return ", ".join(f"{stage.replace('.', '-')};dur={seconds * 1000:.3f}" for stage, seconds in totals.items())
+
+
+# Общий реестр; METRICS=off в окружении выключает сбор
+METRICS = Metrics(enabled=os.getenv("METRICS", "on").lower() not in ("0", "off", "false", "no"))
@@ -0,0 +1,288 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from src.http_client import HTTP, HttpClient
+
+logger = logging.getLogger(__name__)
+
+CURRENCY_API_URL = "https://api.apilayer.com/exchangerates_data"
+STOCK_API_URL = "https://www.alphavantage.co/query"
+
+
+class QuoteProvider(ABC):
+    """
+    Источник котировок для find_exchange_rate, find_stockmarket_rate и таблицы курсов.
+
+    Методы возвращают None, если котировку получить не удалось.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def exchange_rate(self, currency_from: str, amount: float, currency_to: str) -> Optional[float]:
+        """Сумма amount в валюте currency_from, пересчитанная в currency_to."""
+
+    @abstractmethod
+    def stock_price(self, symbol: str) -> Optional[float]:
+        """Цена акции."""
+
+    @abstractmethod
+    def rate_table(self, symbols: Iterable[str], day: str, base: str) -> Optional[Dict[str, float]]:
+        """
+        Курсы нескольких валют к базовой за день.
+
+        :param symbols: коды валют
+        :param day: дата в формате ГГГГ-ММ-ДД или "latest" — текущие курсы
+        :param base: базовая валюта
+        :return: {валюта: сколько единиц валюты дают за 1 единицу базовой}
+        """
+
+
+class HttpQuoteProvider(QuoteProvider):
+    """Котировки из API apilayer (курсы валют) и Alpha Vantage (акции) через HttpClient."""
+
+    name = "http"
+
+    def __init__(self, currency_api_key: Optional[str] = None, stock_api_key: Optional[str] = None,
+                 currency_url: str = CURRENCY_API_URL, stock_url: str = STOCK_API_URL,
+                 client: Optional[HttpClient] = None) -> None:
+        self.currency_api_key = currency_api_key
+        self.stock_api_key = stock_api_key
+        self.currency_url = currency_url
+        self.stock_url = stock_url
+        self.client = client or HTTP
+
+    def exchange_rate(self, currency_from: str, amount: float, currency_to: str) -> Optional[float]:
+        url = f"{self.currency_url}/convert?to={currency_to}&from={currency_from}&amount={amount}"
+        headers = {"apikey": self.currency_api_key}
+        try:
+            response = self.client.get(url, headers=headers)
+            response.raise_for_status()
+            data = response.json()
+            result = data.get("result")
+            if result is not None:
+                return float(result)
+            else:
+                logger.warning("Ошибка API: отсутствует ключ 'result'")
+                return None
+        except requests.exceptions.RequestException as e:
+            logger.error("Ошибка при запросе API: %s", e)
+            return None
+
+    def stock_price(self, symbol: str) -> Optional[float]:
+        url = f"{self.stock_url}?function=GLOBAL_QUOTE&symbol={symbol}&apikey={self.stock_api_key}"
+        try:
+            response = self.client.get(url)
+            response.raise_for_status()
+            data = response.json()
+            price_str = data.get("Global Quote", {}).get("05. price")
+            if price_str:
+                return float(price_str)
+            else:
+                logger.warning("Ошибка API: не найден ключ '05. price' для %s", symbol)
+                return None
+        except requests.exceptions.RequestException as e:
+            logger.error("Ошибка при запросе API: %s", e)
+            return None
+
+    def rate_table(self, symbols: Iterable[str], day: str, base: str) -> Optional[Dict[str, float]]:
+        url = f"{self.currency_url}/{day}?base={base}&symbols={','.join(sorted(symbols))}"
+        try:
+            response = self.client.get(url, headers={"apikey": self.currency_api_key})
+            response.raise_for_status()
+            rates = response.json().get("rates")
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error("Ошибка при запросе таблицы курсов за %s: %s", day, e)
+            return None
+        if not isinstance(rates, dict):
+            logger.warning("Ошибка API: отсутствует ключ 'rates' в таблице курсов за %s", day)
+            return None
+        return {currency: float(rate) for currency, rate in rates.items()}
+
+
+class OfflineQuoteProvider(QuoteProvider):
+    """
+    Котировки из фикстуры — без сети, всегда одинаковые.
+
+    Фикстура: {"base": "RUB", "currency": {"USD": 75.0, ...}, "stock": {"AAPL": 150.5, ...},
+    "history": {"2021-12-30": {"USD": 74.0, ...}, ...}} — курсы валют указаны в базовой валюте
+    за единицу; "history" (курсы по дням) необязателен, для дней без записи берутся курсы "currency".
+    """
+
+    name = "offline"
+
+    def __init__(self, fixtures: Mapping[str, Any]) -> None:
+        self.base = fixtures.get("base", "RUB")
+        self.currency: Dict[str, float] = dict(fixtures.get("currency", {}))
+        self.stock: Dict[str, float] = dict(fixtures.get("stock", {}))
+        self.history: Dict[str, Dict[str, float]] = dict(fixtures.get("history", {}))
+
+    @classmethod
+    def load(cls, path: str | Path) -> "OfflineQuoteProvider":
+        """Загружает фикстуру из JSON-файла."""
+        with open(path, "r", encoding="utf-8") as file:
+            return cls(json.load(file))
+
+    def _in_base(self, currency: str, day: str = "latest") -> Optional[float]:
+        """Стоимость единицы валюты в базовой валюте фикстуры."""
+        if currency == self.base:
+            return 1.0
+        return self.history.get(day, {}).get(currency, self.currency.get(currency))
+
+    def exchange_rate(self, currency_from: str, amount: float, currency_to: str) -> Optional[float]:
+        rate_from, rate_to = self._in_base(currency_from), self._in_base(currency_to)
+        if rate_from is None or not rate_to:
+            logger.warning("В фикстуре нет курса %s/%s", currency_from, currency_to)
+            return None
+        return amount * rate_from / rate_to
+
+    def stock_price(self, symbol: str) -> Optional[float]:
+        price = self.stock.get(symbol)
+        if price is None:
+            logger.warning("В фикстуре нет цены акции %s", symbol)
+        return price
+
+    def rate_table(self, symbols: Iterable[str], day: str, base: str) -> Optional[Dict[str, float]]:
+        base_rate = self._in_base(base, day)
+        if not base_rate:
+            return None
+        rates = {}
+        for symbol in symbols:
+            rate = self._in_base(symbol, day)
+            if rate:
+                rates[symbol] = base_rate / rate
+        return rates
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_StubHTTPServer"
+
+    def do_GET(self) -> None:
+        stub = self.server.stub
+        with stub.slots:
+            status, body = stub.respond(self.path)
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    stub: "StubQuoteServer"
+
+
+class StubQuoteServer:
+    """
+    Локальный HTTP-сервер, повторяющий ответы apilayer и Alpha Vantage по фикстуре.
+
+    Нужен для воспроизводимых замеров без сети: задержка ответа (latency, секунды),
+    доля ответов 503 (error_rate, с фиксированным seed) и число одновременно
+    обрабатываемых запросов (max_concurrency — ограничивает пропускную способность).
+    """
+
+    def __init__(self, fixtures: Mapping[str, Any], latency: float = 0.0, error_rate: float = 0.0,
+                 max_concurrency: int = 64, seed: int = 0, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.offline = OfflineQuoteProvider(fixtures)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _StubHTTPServer((host, port), _StubHandler)
+        self._server.stub = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def respond(self, path: str) -> tuple:
+        """Статус и тело ответа на запрос path."""
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            return 503, {"message": "Service Unavailable"}
+
+        parts = urlsplit(path)
+        params = {name: values[0] for name, values in parse_qs(parts.query).items()}
+        if parts.path == "/query":
+            price = self.offline.stock_price(params.get("symbol", ""))
+            return 200, ({"Global Quote": {"05. price": f"{price:.4f}"}} if price is not None else {})
+        if parts.path == "/exchangerates_data/convert":
+            result = self.offline.exchange_rate(params.get("from", ""), float(params.get("amount", 1)),
+                                                params.get("to", ""))
+            return 200, {"success": result is not None, "result": result}
+        if parts.path.startswith("/exchangerates_data/"):
+            day = parts.path.rsplit("/", 1)[1]
+            symbols = [symbol for symbol in params.get("symbols", "").split(",") if symbol]
+            rates = self.offline.rate_table(symbols, day, params.get("base", self.offline.base))
+            return 200, {"success": rates is not None, "base": params.get("base"), "date": day, "rates": rates}
+        return 404, {"message": "Not Found"}
+
+    def start(self) -> "StubQuoteServer":
+        """Запускает сервер в фоновом потоке."""
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        name="stub-quotes", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Останавливает сервер."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def provider(self, client: Optional[HttpClient] = None) -> HttpQuoteProvider:
+        """HTTP-провайдер, направленный на этот сервер (по умолчанию — без ограничения частоты)."""
+        return HttpQuoteProvider(
+            currency_url=f"{self.url}/exchangerates_data",
+            stock_url=f"{self.url}/query",
+            client=client or HttpClient(rate_limits={}),
+        )
+
+    def __enter__(self) -> "StubQuoteServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def provider_from_env(currency_api_key: Optional[str] = None, stock_api_key: Optional[str] = None) -> QuoteProvider:
+    """
+    Провайдер котировок по переменным окружения.
+
+    QUOTE_PROVIDER=offline вместе с QUOTE_FIXTURES=<путь к фикстуре> включает офлайн-режим,
+    иначе используются HTTP API.
+    """
+    if os.getenv("QUOTE_PROVIDER", "http") == "offline":
+        path = os.getenv("QUOTE_FIXTURES", "")
+        try:
+            provider = OfflineQuoteProvider.load(path)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Не удалось загрузить фикстуру котировок %s: %s", path, e)
+        else:
+            logger.info("Котировки берутся из фикстуры %s", path)
+            return provider
+    return HttpQuoteProvider(currency_api_key, stock_api_key)
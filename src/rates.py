@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping, Optional, Set
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from src.table import TransactionTable, parse_operation_dates
+from src.utils import quote_provider
+
+logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = "RUB"
+LATEST = "latest"
+
+
+def fetch_rate_table(
+    symbols: Iterable[str], day: str = LATEST, base: str = BASE_CURRENCY
+) -> Optional[Dict[str, float]]:
+    """
+    Запрашивает курсы сразу нескольких валют к базовой одним запросом.
+
+    :param symbols: коды валют
+    :param day: дата в формате ГГГГ-ММ-ДД или "latest" — текущие курсы
+    :param base: базовая валюта
+    :return: {валюта: сколько единиц валюты дают за 1 единицу базовой} или None при ошибке
+    """
+    return quote_provider().rate_table(symbols, day, base)
+
+
+class RateTable:
+    """
+    Таблица курсов валют к базовой валюте по дням.
+
+    Курсы запрашиваются пачками: один запрос на день сразу для всех недостающих валют.
+    Пересчет выполняется локально, в том числе векторно для целой колонки сумм.
+    Таблицу можно сохранить в JSON-файл, чтобы исторические курсы не запрашивались повторно.
+    """
+
+    def __init__(self, base: str = BASE_CURRENCY, path: Optional[str | Path] = None) -> None:
+        self.base = base
+        self.path = Path(path) if path else None
+        # день (ГГГГ-ММ-ДД или "latest") -> {валюта: единиц валюты за 1 единицу базовой}
+        self.rates: Dict[str, Dict[str, float]] = {}
+        self.requests = 0
+
+    @classmethod
+    def load(cls, path: str | Path, base: str = BASE_CURRENCY) -> "RateTable":
+        """Загружает таблицу из JSON-файла; если файла нет или он поврежден — пустая таблица."""
+        table = cls(base=base, path=path)
+        if not os.path.exists(path):
+            return table
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Ошибка чтения таблицы курсов %s: %s", path, e)
+            return table
+        if state.get("base") == base:
+            table.rates = state["rates"]
+        return table
+
+    def save(self, path: Optional[str | Path] = None) -> None:
+        """Сохраняет таблицу в JSON-файл (по умолчанию — в тот, из которого загружена)."""
+        path = Path(path) if path else self.path
+        if path is None:
+            raise ValueError("Не указан путь для сохранения таблицы курсов")
+        # Текущие курсы со временем меняются, поэтому сохраняются только исторические
+        state = {"base": self.base, "rates": {day: rates for day, rates in self.rates.items() if day != LATEST}}
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def ensure(self, currencies: Iterable[str], days: Iterable[str] = (LATEST,)) -> int:
+        """
+        Догружает недостающие курсы: не больше одного запроса на каждый день.
+
+        :param currencies: нужные валюты
+        :param days: нужные дни (ГГГГ-ММ-ДД или "latest")
+        :return: число выполненных запросов
+        """
+        wanted = {currency for currency in currencies if isinstance(currency, str) and currency != self.base}
+        count = 0
+        for day in dict.fromkeys(days):
+            missing = wanted - set(self.rates.get(day, {}))
+            if not missing:
+                continue
+            rates = fetch_rate_table(missing, day, self.base)
+            count += 1
+            if rates:
+                self.rates.setdefault(day, {}).update(rates)
+        self.requests += count
+        if count:
+            logger.info("Загружены курсы валют: %s запросов.", count)
+        return count
+
+    def rate(self, currency: str, day: str = LATEST) -> Optional[float]:
+        """Курс валюты к базовой за день (единиц валюты за 1 единицу базовой) или None."""
+        if currency == self.base:
+            return 1.0
+        return self.rates.get(day, {}).get(currency)
+
+    def convert(self, amount: float, currency: str, day: str = LATEST) -> Optional[float]:
+        """Пересчитывает сумму в базовую валюту по курсу дня; None, если курса нет."""
+        self.ensure([currency], [day])
+        rate = self.rate(currency, day)
+        if not rate:
+            return None
+        return amount / rate
+
+    def convert_column(
+        self, amounts: np.ndarray, currencies: np.ndarray, days: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Векторно пересчитывает суммы в базовую валюту.
+
+        Курс ищется один раз на каждую пару (валюта, день), недостающие курсы
+        догружаются одним запросом на день.
+
+        :param amounts: суммы
+        :param currencies: валюта каждой суммы
+        :param days: день каждой суммы (ГГГГ-ММ-ДД); None — текущие курсы
+        :return: суммы в базовой валюте (NaN, если курса нет)
+        """
+        amounts = np.asarray(amounts, dtype="float64")
+        if days is None:
+            days = np.full(len(amounts), LATEST, dtype=object)
+        pairs = pd.MultiIndex.from_arrays([pd.Index(currencies, dtype=object), pd.Index(days, dtype=object)])
+        codes, unique_pairs = pd.factorize(pairs)
+
+        needed: Dict[str, Set[str]] = {}
+        for currency, day in unique_pairs:
+            if isinstance(currency, str) and currency != self.base and isinstance(day, str):
+                needed.setdefault(day, set()).add(currency)
+        for day, currencies_of_day in needed.items():
+            self.ensure(currencies_of_day, [day])
+
+        pair_rates = np.array(
+            [self.rate(currency, day) if isinstance(day, str) else None for currency, day in unique_pairs],
+            dtype="float64",
+        )
+        rates = np.where(codes >= 0, pair_rates[np.maximum(codes, 0)], np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(rates > 0, amounts / rates, np.nan)
+
+
+def _day_strings(operation_dt: np.ndarray) -> np.ndarray:
+    """Дни операций в формате ГГГГ-ММ-ДД (None для неразобранных дат)."""
+    days = np.datetime_as_string(np.asarray(operation_dt, dtype="datetime64[D]"), unit="D").astype(object)
+    days[days == "NaT"] = None
+    return days
+
+
+def convert_amounts(
+    data: Iterable[Mapping[str, Any]] | TransactionTable | DataFrame,
+    rates: RateTable,
+    historical: bool = True,
+    amount_field: str = "amount_transaction",
+) -> np.ndarray:
+    """
+    Пересчитывает сумму операции каждой транзакции в базовую валюту таблицы курсов.
+
+    :param data: список транзакций, TransactionTable или DataFrame
+    :param rates: таблица курсов
+    :param historical: брать курс на дату операции (иначе — текущий)
+    :param amount_field: поле суммы в валюте операции
+    :return: массив сумм в базовой валюте в порядке строк (NaN, если курса нет)
+    """
+    if isinstance(data, TransactionTable):
+        amounts = data.numeric(amount_field)
+        currencies = data.column("currency")
+        operation_dt = data.operation_dt
+    else:
+        df = data if isinstance(data, DataFrame) else pd.DataFrame(list(data))
+        if df.empty:
+            return np.array([], dtype="float64")
+        amounts = df[amount_field].to_numpy(dtype="float64")
+        currencies = df["currency"].to_numpy(dtype=object)
+        if "operation_dt" in df.columns:
+            operation_dt = df["operation_dt"].to_numpy(dtype="datetime64[ns]")
+        else:
+            operation_dt = parse_operation_dates(df["operation_date"]).to_numpy(dtype="datetime64[ns]")
+
+    days = _day_strings(operation_dt) if historical else None
+    return rates.convert_column(amounts, currencies, days)
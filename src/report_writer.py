@@ -0,0 +1,186 @@
+import atexit
+import hashlib
+import logging
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+
+from src.serialize import iter_json
+
+logger = logging.getLogger(__name__)
+
+Writer = Callable[[DataFrame, Path], None]
+
+
+def _iter_rows(df: DataFrame) -> Iterator[Dict]:
+    """Строки DataFrame как словари, собранные из колонок (без промежуточного списка словарей)."""
+    columns = list(df.columns)
+    values = [df[column].tolist() for column in df.columns]
+    for row in zip(*values):
+        yield dict(zip(columns, row))
+
+
+def _json_writer(indent: Optional[int], fmt: str = "json") -> Writer:
+    def write(df: DataFrame, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            for chunk in iter_json(_iter_rows(df), fmt=fmt, indent=indent):
+                file.write(chunk)
+
+    return write
+
+
+def _csv_writer(df: DataFrame, path: Path) -> None:
+    df.to_csv(path, index=False, encoding="utf-8")
+
+
+def _parquet_writer(df: DataFrame, path: Path) -> None:
+    df.to_parquet(path, index=False)
+
+
+# Формат -> (функция записи, расширение файла по умолчанию)
+REPORT_FORMATS: Dict[str, Tuple[Writer, str]] = {
+    "json": (_json_writer(4), ".json"),
+    "json_compact": (_json_writer(None), ".json"),
+    "jsonl": (_json_writer(None, "jsonl"), ".jsonl"),
+    "csv": (_csv_writer, ".csv"),
+    "parquet": (_parquet_writer, ".parquet"),
+}
+
+# Путь -> хэш содержимого последнего записанного в него отчета
+_LAST_WRITTEN: Dict[str, str] = {}
+_LAST_WRITTEN_LOCK = threading.Lock()
+
+
+def register_report_format(name: str, writer: Writer, extension: str) -> None:
+    """
+    Добавляет формат отчета.
+
+    :param name: имя формата для save_report(fmt=...)
+    :param writer: функция (DataFrame, путь) -> None, записывающая отчет
+    :param extension: расширение файла по умолчанию, например ".xml"
+    """
+    REPORT_FORMATS[name] = (writer, extension)
+
+
+def report_extension(fmt: str) -> str:
+    """Расширение файла для формата отчета."""
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат отчета: {fmt}")
+    return REPORT_FORMATS[fmt][1]
+
+
+def content_hash(df: DataFrame, fmt: str) -> Optional[str]:
+    """
+    Хэш содержимого отчета: формат, колонки, типы и значения (векторизованно, без сериализации).
+
+    :return: хэш или None, если значения не хэшируются (например, списки в ячейках)
+    """
+    digest = hashlib.sha256(fmt.encode("utf-8"))
+    digest.update(repr([(str(column), str(dtype)) for column, dtype in df.dtypes.items()]).encode("utf-8"))
+    try:
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    except TypeError:
+        return None
+    return digest.hexdigest()
+
+
+def is_unchanged(path: str | Path, digest: Optional[str]) -> bool:
+    """Совпадает ли отчет с последним записанным в этот файл (и файл все еще на месте)."""
+    if digest is None:
+        return False
+    with _LAST_WRITTEN_LOCK:
+        return _LAST_WRITTEN.get(str(path)) == digest and os.path.exists(path)
+
+
+def write_report(df: DataFrame, path: str | Path, fmt: str = "json", digest: Optional[str] = None) -> bool:
+    """
+    Записывает отчет в файл в заданном формате.
+
+    Запись идет во временный файл, который затем заменяет целевой.
+
+    :param df: отчет
+    :param path: путь до файла
+    :param fmt: формат из REPORT_FORMATS
+    :param digest: хэш содержимого (content_hash), запоминаемый после успешной записи
+    :return: True, если отчет записан
+    """
+    writer, _ = REPORT_FORMATS[fmt]
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        writer(df, tmp_path)
+        os.replace(tmp_path, path)
+    except ImportError as e:
+        logger.error("Для записи отчета в формате %s не хватает зависимости: %s", fmt, e)
+        return False
+    except Exception as e:
+        logger.error("Ошибка записи отчета %s: %s", path, e)
+        return False
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    if digest is not None:
+        with _LAST_WRITTEN_LOCK:
+            _LAST_WRITTEN[str(path)] = digest
+    return True
+
+
+class BackgroundWriter:
+    """
+    Фоновая запись отчетов: задания попадают в ограниченную очередь, их выполняет отдельный поток.
+
+    Когда очередь заполнена, submit ждет освобождения места, поэтому
+    отчеты не копятся в памяти без ограничения.
+    """
+
+    def __init__(self, max_pending: int = 8) -> None:
+        self.queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._run, name="report-writer", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            task = self.queue.get()
+            try:
+                if task is None:
+                    return
+                df, path, fmt, digest = task
+                if write_report(df, path, fmt, digest):
+                    logger.info("Отчет сохранен в файл %s", path)
+            finally:
+                self.queue.task_done()
+
+    def submit(self, df: DataFrame, path: str | Path, fmt: str = "json", digest: Optional[str] = None) -> None:
+        """Ставит отчет в очередь на запись."""
+        if not self.thread.is_alive():
+            raise RuntimeError("Фоновая запись отчетов остановлена")
+        self.queue.put((df, path, fmt, digest))
+
+    def flush(self) -> None:
+        """Ждет, пока будут записаны все поставленные в очередь отчеты."""
+        self.queue.join()
+
+    def close(self) -> None:
+        """Дописывает очередь и останавливает поток."""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+
+_background: Optional[BackgroundWriter] = None
+_background_lock = threading.Lock()
+
+
+def background_writer() -> BackgroundWriter:
+    """Общий фоновый писатель отчетов; создается при первом обращении и дописывает очередь при выходе."""
+    global _background
+    with _background_lock:
+        if _background is None or not _background.thread.is_alive():
+            _background = BackgroundWriter()
+            atexit.register(_background.close)
+        return _background
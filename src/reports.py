@@ -1,35 +1,57 @@
-import json
+import functools
 import logging
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional
 
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
 
+from src.logs import configure_console_logging
+from src.metrics import METRICS
+from src.report_writer import (background_writer, content_hash, is_unchanged,
+                               report_extension, write_report)
+from src.table import TransactionTable, parse_operation_dates
+from src.utils import TYPED_COLUMNS
+
 # Настройка логирования
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+configure_console_logging(logging.INFO)
 
 
-def save_report(file_name: Optional[str] = None) -> Any:
+def save_report(file_name: Optional[str] = None, fmt: str = "json", background: bool = False,
+                skip_unchanged: bool = True) -> Any:
     """
-    Декоратор для сохранения результата работы функции в JSON-файл.
+    Декоратор для сохранения результата работы функции (DataFrame) в файл.
+
+    Отчет пишется по колонкам, без промежуточного списка словарей. Если отчет
+    не изменился с прошлой записи в тот же файл, запись пропускается.
 
     :param file_name: Опциональное имя файла для сохранения.
+    :param fmt: Формат: "json" (с отступами), "json_compact", "jsonl", "csv", "parquet"
+        или добавленный через register_report_format.
+    :param background: Записывать отчет в фоновом потоке (через ограниченную очередь),
+        не задерживая вызывающего.
+    :param skip_unchanged: Не перезаписывать файл, если содержимое отчета не изменилось.
     :return: Декоратор, оборачивающий функцию.
     """
+    extension = report_extension(fmt)
 
     def decorator(func: Any) -> Any:
+        @functools.wraps(func)
         def wrapper(*args: tuple, **kwargs: dict) -> Any:
-            logging.info(f"Выполнение функции {func.__name__}")
+            logging.info("Выполнение функции %s", func.__name__)
             result = func(*args, **kwargs)
-            file_path = file_name or f"report_{func.__name__}.json"
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(
-                    result.to_dict(orient="records"), f, ensure_ascii=False, indent=4
-                )
-            logging.info(f"Отчет сохранен в файл {file_path}")
+            file_path = file_name or f"report_{func.__name__}{extension}"
+            with METRICS.span("report.save"):
+                digest = content_hash(result, fmt)
+                if skip_unchanged and is_unchanged(file_path, digest):
+                    logging.info("Отчет не изменился, файл %s не перезаписывается", file_path)
+                elif background:
+                    # Копия — чтобы изменения результата у вызывающего не попали в файл
+                    background_writer().submit(result.copy(), file_path, fmt, digest)
+                    logging.info("Отчет поставлен в очередь на запись в файл %s", file_path)
+                elif write_report(result, file_path, fmt, digest):
+                    logging.info("Отчет сохранен в файл %s", file_path)
             return result
 
         return wrapper
@@ -37,39 +59,245 @@ def save_report(file_name: Optional[str] = None) -> Any:
     return decorator
 
 
+def _operation_dates(df: DataFrame) -> pd.Series:
+    """Даты операций DataFrame транзакций как datetime."""
+    if "operation_dt" in df.columns:
+        # Таблица из read_xlsx_frame уже содержит разобранные даты
+        return df["operation_dt"]
+    return parse_operation_dates(df["operation_date"])
+
+
+def _records_frame(transactions: Iterable[Dict[str, Any]], wanted: Optional[set]) -> DataFrame:
+    """
+    DataFrame из транзакций нужных категорий (wanted=None — всех).
+
+    Как у pd.DataFrame(transactions): индекс — номера транзакций во входных данных,
+    колонки — все встреченные поля, даже если ни одна транзакция не подошла.
+    """
+    rows, positions = [], []
+    columns: Dict[str, None] = {}
+    last_keys = None
+    for position, transaction in enumerate(transactions):
+        keys = transaction.keys()
+        if keys != last_keys:
+            columns.update(dict.fromkeys(keys))
+            last_keys = keys
+        if wanted is None or transaction.get("category") in wanted:
+            rows.append(transaction)
+            positions.append(position)
+    return pd.DataFrame(rows, index=pd.Index(positions, dtype=np.int64), columns=list(columns))
+
+
+def _window_start(date: Optional[str], days: int) -> datetime:
+    """Начало периода: за days дней до даты date (по умолчанию — сегодня)."""
+    date_str = date if date is not None else datetime.today().strftime("%Y-%m-%d")
+    return datetime.strptime(date_str, "%Y-%m-%d") - timedelta(days=days)
+
+
+class SpendingReport:
+    """
+    Траты по всем категориям за период, посчитанные одной группировкой.
+
+    rows — транзакции периода (дата операции в формате ГГГГ-ММ-ДД), summary — число
+    операций и сумма по каждой категории, category(name) — строки одной категории.
+    """
+
+    def __init__(self, rows: DataFrame, amount_field: str) -> None:
+        self.rows = rows
+        if rows.empty or "category" not in rows.columns:
+            self.groups: Dict[Any, np.ndarray] = {}
+            self.summary = DataFrame({"count": pd.Series(dtype="int64"), "total": pd.Series(dtype="float64")})
+            return
+        grouped = rows.groupby("category", sort=False)
+        self.groups = grouped.indices
+        amounts = rows[amount_field] if amount_field in rows.columns else pd.Series(0.0, index=rows.index)
+        self.summary = DataFrame(
+            {
+                "count": grouped.size(),
+                "total": amounts.groupby(rows["category"], sort=False).sum().round(2),
+            }
+        )
+
+    def categories(self) -> List[Any]:
+        """Категории, по которым есть транзакции за период, в порядке первого появления."""
+        return list(self.summary.index)
+
+    def category(self, category: str) -> DataFrame:
+        """Транзакции одной категории за период."""
+        positions = self.groups.get(category)
+        if positions is None:
+            return self.rows.iloc[0:0]
+        return self.rows.iloc[positions]
+
+
+@METRICS.timed("spending_report")
+def spending_report(
+    transactions: Iterable[Dict[str, Any]] | DataFrame | TransactionTable,
+    date: Optional[str] = None,
+    days: int = 90,
+    end: Optional[str] = None,
+    categories: Optional[Iterable[str]] = None,
+    amount_field: str = "amount_transaction_rub",
+) -> SpendingReport:
+    """
+    Отбирает транзакции за период сразу по всем категориям и группирует их одним проходом.
+
+    :param transactions: Список или генератор транзакций в виде словарей
+        либо типизированная таблица (DataFrame из read_xlsx_frame или TransactionTable).
+    :param date: Дата в формате ГГГГ-ММ-ДД, от которой отсчитывается период. Если не указана, берется текущая.
+    :param days: Длина периода в днях (период начинается с даты date минус days дней).
+    :param end: Опциональная последняя дата периода в формате ГГГГ-ММ-ДД (включительно);
+        по умолчанию период сверху не ограничен.
+    :param categories: Если указаны — учитываются только эти категории
+        (транзакции остальных отбрасываются еще до построения DataFrame).
+    :param amount_field: Поле суммы для итогов по категориям.
+    :return: SpendingReport с итогами и строками по категориям.
+    """
+    start = _window_start(date, days)
+    end_dt = datetime.combine(datetime.strptime(end, "%Y-%m-%d").date(), time.max) if end else None
+    wanted = set(categories) if categories is not None else None
+
+    if isinstance(transactions, TransactionTable):
+        # Период отбирается по индексу дат, категории — по кодам внутри периода
+        positions = transactions.date_index.between(start=start, end=end_dt)
+        if wanted is not None:
+            codes = [transactions.code_of("category", category) for category in wanted]
+            codes = [code for code in codes if code is not None]
+            positions = positions[np.isin(transactions.codes("category")[positions], codes)]
+        METRICS.inc("rows_scanned", len(positions), function="spending_report")
+        df = transactions.to_frame(positions)
+        # Номера строк исходной таблицы, как у списка транзакций
+        df.index = pd.Index(positions, dtype=np.int64)
+    elif isinstance(transactions, DataFrame):
+        METRICS.inc("rows_scanned", len(transactions), function="spending_report")
+        df = transactions if wanted is None else transactions[transactions["category"].isin(wanted)]
+    else:
+        df = _records_frame(transactions, wanted)
+
+    if "operation_date" in df.columns:
+        operation_dt = _operation_dates(df)
+
+        # Строки таблицы уже отобраны по индексу дат, остальные фильтруются по datetime64
+        if not isinstance(transactions, TransactionTable):
+            in_window = (operation_dt >= start).to_numpy()
+            if end_dt is not None:
+                in_window &= (operation_dt <= end_dt).to_numpy()
+            df, operation_dt = df[in_window], operation_dt[in_window]
+
+        # Дата в строку для сериализации — только у строк, попавших в период
+        df = df.drop(columns=TYPED_COLUMNS, errors="ignore")
+        df["operation_date"] = operation_dt.dt.strftime("%Y-%m-%d").to_numpy()
+    else:
+        df = df.drop(columns=TYPED_COLUMNS, errors="ignore")
+
+    report = SpendingReport(df, amount_field)
+    METRICS.inc("rows_matched", len(df), function="spending_report")
+    logging.info("Отчет по тратам: %s транзакций в %s категориях", len(df), len(report.groups))
+    return report
+
+
 @save_report()
+@METRICS.timed("spending_by_category")
 def spending_by_category(
-    transactions: List[Dict[str, Any]], category: str, date: Optional[str] = None
+    transactions: Iterable[Dict[str, Any]] | DataFrame | TransactionTable,
+    category: str,
+    date: Optional[str] = None,
 ) -> DataFrame:
     """
     Фильтрует список транзакций по заданной категории за последние 90 дней.
 
-    :param transactions: Список транзакций в виде словарей.
+    Это срез отчета spending_report по одной категории; транзакции чужих категорий
+    отбрасываются еще до построения DataFrame, поэтому при передаче генератора
+    в памяти остается только нужная категория.
+
+    :param transactions: Список или генератор транзакций в виде словарей
+        либо типизированная таблица (DataFrame из read_xlsx_frame или TransactionTable).
     :param category: Категория, по которой нужно отфильтровать транзакции.
     :param date: Опциональная дата, от которой отсчитываются 90 дней. Если не указана, берется текущая.
     :return: DataFrame с отфильтрованными транзакциями.
     """
     logging.info("Начало обработки транзакций по категории")
 
-    if date is None:
-        date_str = datetime.today().strftime("%Y-%m-%d")
+    category_title = category.title()
+    report = spending_report(transactions, date, categories=[category_title])
+    df_filtered = report.category(category_title)
+
+    logging.info("Найдено %s транзакций по категории '%s'", len(df_filtered), category)
+    return df_filtered
+
+
+@METRICS.timed("rolling_spending")
+def rolling_spending(
+    transactions: Iterable[Dict[str, Any]] | DataFrame | TransactionTable,
+    days: int = 90,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    amount_field: str = "amount_transaction_rub",
+) -> DataFrame:
+    """
+    Скользящая сумма операций по каждой категории за последние days дней — для каждого дня истории.
+
+    Значение в строке дня D — сумма операций категории с датами от D минус days дней
+    до D включительно (как в spending_report(transactions, D, days, end=D)).
+    Считается за один проход: суммы раскладываются по дням, затем берется
+    разность накопленных сумм на концах окна.
+
+    :param transactions: Список или генератор транзакций в виде словарей
+        либо типизированная таблица (DataFrame из read_xlsx_frame или TransactionTable).
+    :param days: Длина окна в днях.
+    :param start: Первый день в результате (ГГГГ-ММ-ДД); по умолчанию — день первой операции.
+    :param end: Последний день в результате (ГГГГ-ММ-ДД); по умолчанию — день последней операции.
+    :param amount_field: Поле суммы операции.
+    :return: DataFrame: строки — дни, колонки — категории (в порядке первого появления).
+    """
+    if isinstance(transactions, TransactionTable):
+        operation_dt = transactions.operation_dt
+        codes, labels = transactions.codes("category"), transactions.categories("category")
+        kopecks = transactions.amounts(amount_field)
     else:
-        date_str = date
+        df = transactions if isinstance(transactions, DataFrame) else pd.DataFrame(list(transactions))
+        if df.empty:
+            return DataFrame(dtype="float64")
+        operation_dt = _operation_dates(df).to_numpy(dtype="datetime64[ns]")
+        codes, labels = pd.factorize(df["category"]) if "category" in df.columns else (np.full(len(df), -1), [])
+        amounts = df[amount_field] if amount_field in df.columns else pd.Series(0.0, index=df.index)
+        kopecks = np.round(amounts.fillna(0).to_numpy(dtype="float64") * 100).astype(np.int64)
 
-    date_dt = datetime.strptime(date_str, "%Y-%m-%d")  # Преобразование в datetime
-    three_months_ago = date_dt - timedelta(days=90)
+    day_numbers = operation_dt.astype("datetime64[D]")
+    valid = ~np.isnat(day_numbers) & (codes >= 0)
+    if not valid.any():
+        return DataFrame(dtype="float64")
+    day_numbers, codes, kopecks = day_numbers[valid], codes[valid], kopecks[valid]
 
-    df = pd.DataFrame(transactions)
-    df["operation_date"] = pd.to_datetime(df["operation_date"], dayfirst=True)
+    # Оставляем только категории, которые встречаются, в порядке первого появления
+    used, first_seen = np.unique(codes, return_index=True)
+    used = used[np.argsort(first_seen)]
+    columns = np.full(len(labels), -1)
+    columns[used] = np.arange(len(used))
 
-    # Преобразуем datetime в строку для сериализации
-    df["operation_date"] = df["operation_date"].dt.strftime("%Y-%m-%d")
+    first_day = day_numbers.min()
+    last_day = day_numbers.max()
+    first_out = np.datetime64(start, "D") if start else first_day
+    last_out = np.datetime64(end, "D") if end else last_day
+    if last_out < first_out:
+        return DataFrame(dtype="float64", columns=[labels[code] for code in used])
 
-    # Фильтруем по дате и категории
-    df_filtered = df[
-        (df["operation_date"] >= three_months_ago.strftime("%Y-%m-%d"))
-        & (df["category"] == category.title())
-    ]
+    # Дневные суммы по категориям (в копейках) и накопленные суммы по дням с нулевой строкой в начале
+    origin = min(first_day, first_out - np.timedelta64(days, "D"))
+    n_days = int((max(last_day, last_out) - origin).astype(int)) + 1
+    day_offsets = (day_numbers - origin).astype(np.int64)
+    daily = np.bincount(
+        day_offsets * len(used) + columns[codes], weights=kopecks, minlength=n_days * len(used)
+    ).reshape(n_days, len(used))
+    cumulative = np.vstack([np.zeros((1, len(used))), np.cumsum(daily, axis=0)])
 
-    logging.info(f"Найдено {len(df_filtered)} транзакций по категории '{category}'")
-    return df_filtered
+    out_days = np.arange(int((first_out - origin).astype(int)), int((last_out - origin).astype(int)) + 1)
+    window_sums = cumulative[out_days + 1] - cumulative[np.maximum(out_days - days, 0)]
+
+    result = DataFrame(
+        np.round(window_sums / 100, 2),
+        index=pd.DatetimeIndex(origin + out_days.astype("timedelta64[D]"), name="date"),
+        columns=[labels[code] for code in used],
+    )
+    logging.info("Скользящие траты за %s дней: %s дней, %s категорий", days, len(result), len(result.columns))
+    return result
@@ -0,0 +1,255 @@
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+
+from src.table import TransactionTable
+
+logger = logging.getLogger(__name__)
+
+RESULTS_VERSION = 1
+
+KeyArgs = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+# Версии списков и DataFrame: id объекта -> (объект, длина, версия); хранятся для нескольких последних объектов
+VERSIONS_MAX = 4
+_versions: Dict[int, Tuple[Any, int, str]] = {}
+_versions_lock = threading.Lock()
+
+
+def _memoized_version(data: List[Any] | DataFrame, compute: Callable[[Any], str]) -> str:
+    """
+    Версия списка или DataFrame, посчитанная один раз на загруженный объект.
+
+    Как и отпечаток TransactionTable, версия переиспользуется, пока передается тот же объект
+    той же длины: данные считаются неизменными после загрузки (добавление строк
+    пересчитывает версию, правка значений на месте — нет).
+    """
+    with _versions_lock:
+        cached = _versions.get(id(data))
+    if cached is not None and cached[0] is data and cached[1] == len(data):
+        return cached[2]
+
+    version = compute(data)
+    with _versions_lock:
+        _versions.pop(id(data), None)
+        while len(_versions) >= VERSIONS_MAX:
+            del _versions[next(iter(_versions))]
+        _versions[id(data)] = (data, len(data), version)
+    return version
+
+
+def _list_version(data: List[Any]) -> str:
+    return hashlib.sha256(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+def _frame_version(data: DataFrame) -> str:
+    return hashlib.sha256(pd.util.hash_pandas_object(data.astype(str)).to_numpy().tobytes()).hexdigest()
+
+
+def dataset_version(data: Iterable[Mapping] | TransactionTable | DataFrame) -> Optional[str]:
+    """
+    Версия набора данных — SHA-256 его содержимого.
+
+    Для TransactionTable отпечаток считается один раз и запоминается в таблице, список словарей
+    (через pickle) и DataFrame хешируются целиком один раз на загруженный объект. Для генераторов версии нет
+    (их нельзя прочитать дважды) — такие вызовы не кэшируются.
+    """
+    if isinstance(data, TransactionTable):
+        return data.fingerprint()
+    if isinstance(data, DataFrame):
+        return _memoized_version(data, _frame_version)
+    if isinstance(data, list):
+        return _memoized_version(data, _list_version)
+    return None
+
+
+def _encode_value(value: Any) -> Dict[str, Any]:
+    """Результат функции в виде, пригодном для JSON."""
+    if isinstance(value, DataFrame):
+        # 15 знаков — максимум to_json; по умолчанию (10) суммы после загрузки отличались бы
+        split = json.loads(value.to_json(orient="split", force_ascii=False, date_format="iso", double_precision=15))
+        split["dtypes"] = {str(column): str(dtype) for column, dtype in value.dtypes.items()}
+        return {"kind": "frame", "value": split}
+    return {"kind": "str", "value": value}
+
+
+def _decode_value(entry: Dict[str, Any]) -> Any:
+    """Восстанавливает результат, сохраненный _encode_value."""
+    if entry["kind"] == "str":
+        return entry["value"]
+    split = entry["value"]
+    df = DataFrame(split["data"], index=split["index"], columns=split["columns"])
+    return df.astype(split["dtypes"]) if len(df.columns) else df
+
+
+class ResultCache:
+    """
+    LRU-кэш результатов поиска и отчетов.
+
+    Ключ записи — имя функции, версия набора данных (dataset_version) и нормализованные
+    аргументы запроса. Когда приходит набор данных другой версии, записи прежней версии
+    удаляются. Кэш можно сохранить в JSON-файл и загрузить при следующем запуске.
+    """
+
+    def __init__(self, max_size: int = 128, path: Optional[str | Path] = None) -> None:
+        if max_size < 1:
+            raise ValueError("Размер кэша должен быть положительным")
+        self.max_size = max_size
+        self.path = Path(path) if path else None
+        self.version: Optional[str] = None
+        # В памяти лежат сами результаты (строки и DataFrame); в JSON они кодируются только при сохранении
+        self.entries: "OrderedDict[str, Any]" = OrderedDict()
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        # Кэш может использоваться из нескольких потоков (например, сервером)
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: str | Path, max_size: int = 128) -> "ResultCache":
+        """Загружает кэш из JSON-файла; если файла нет или он поврежден — пустой кэш."""
+        cache = cls(max_size=max_size, path=path)
+        if not os.path.exists(path):
+            return cache
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Ошибка чтения кэша результатов %s: %s", path, e)
+            return cache
+        if state.get("version") != RESULTS_VERSION:
+            logger.info("Кэш результатов %s несовместим и будет очищен.", path)
+            return cache
+        cache.version = state["dataset_version"]
+        for key, entry in state["entries"][-max_size:]:
+            cache.entries[key] = _decode_value(entry)
+        logger.info("Кэш результатов %s загружен: %s записей.", path, len(cache.entries))
+        return cache
+
+    def save(self, path: Optional[str | Path] = None) -> None:
+        """Сохраняет кэш в JSON-файл (по умолчанию — в тот, из которого загружен)."""
+        path = Path(path) if path else self.path
+        if path is None:
+            raise ValueError("Не указан путь для сохранения кэша результатов")
+        with self._lock:
+            state = {
+                "version": RESULTS_VERSION,
+                "dataset_version": self.version,
+                "entries": [[key, _encode_value(value)] for key, value in self.entries.items()],
+            }
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def clear(self) -> None:
+        """Удаляет все записи (счетчики сохраняются)."""
+        with self._lock:
+            self.entries.clear()
+            self.version = None
+
+    def _use_version(self, version: str) -> None:
+        """Переключает кэш на версию данных, удаляя записи прежней версии."""
+        if version != self.version:
+            if self.entries:
+                logger.info("Набор данных изменился, кэш результатов очищен.")
+                self.stats["invalidations"] += 1
+            self.entries.clear()
+            self.version = version
+
+    def get(self, version: str, key: str) -> Any:
+        """
+        Результат из кэша или None, если записи нет.
+
+        :param version: версия набора данных
+        :param key: нормализованный ключ запроса
+        """
+        with self._lock:
+            self._use_version(version)
+            value = self.entries.get(key)
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+        # DataFrame отдается копией, чтобы изменения у вызывающего не портили кэш
+        return value.copy() if isinstance(value, DataFrame) else value
+
+    def put(self, version: str, key: str, value: Any) -> None:
+        """
+        Кладет результат в кэш, вытесняя давно не использованные записи.
+
+        Кэшируются только строки (JSON-ответы) и DataFrame.
+        """
+        if not isinstance(value, (str, DataFrame)):
+            return
+        with self._lock:
+            self._use_version(version)
+            self.entries[key] = value.copy() if isinstance(value, DataFrame) else value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def wrap(self, func: Callable[..., Any], key_args: Optional[KeyArgs] = None) -> Callable[..., Any]:
+        """
+        Оборачивает функцию вида func(data, ...) кэшем; возвращаемое значение не меняется.
+
+        :param func: функция, первым аргументом принимающая набор транзакций
+        :param key_args: нормализация аргументов запроса (без data) перед построением ключа
+        :return: обертка с тем же интерфейсом
+        """
+        signature = inspect.signature(func)
+        name = getattr(func, "__name__", repr(func))
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            data = arguments.pop(next(iter(signature.parameters)))
+            version = dataset_version(data)
+            if version is None:
+                return func(*args, **kwargs)
+
+            if key_args is not None:
+                arguments = key_args(arguments)
+            key = json.dumps([name, arguments], sort_keys=True, ensure_ascii=False, default=str)
+            cached = self.get(version, key)
+            if cached is not None:
+                logger.info("Результат %s взят из кэша.", name)
+                return cached
+
+            result = func(*args, **kwargs)
+            self.put(version, key, result)
+            return result
+
+        return wrapper
+
+
+def search_key(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ключ поиска по слову: регистр не важен, поисковый индекс на результат не влияет.
+
+    Слово приводится через lower(), а не casefold(): поиск с re.IGNORECASE не считает
+    равными, например, "ß" и "ss", значит, и ключи у них должны быть разными.
+    """
+    key_word = arguments.get("key_word")
+    return {"key_word": key_word.lower() if isinstance(key_word, str) else key_word}
+
+
+def spending_key(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Ключ отчета по категории: категория приводится как в отчете, пустая дата — сегодняшняя."""
+    category = arguments.get("category")
+    date = arguments.get("date") or datetime.today().strftime("%Y-%m-%d")
+    return {"category": category.title() if isinstance(category, str) else category, "date": date}
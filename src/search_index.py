@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set
+
+from src.incremental import file_signature, prefix_digest
+from src.table import TransactionTable
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 3
+INDEX_SUFFIX = ".search.json"
+DEFAULT_FIELDS = ("description", "category")
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+# Турецкие «İ» и «ı» при IGNORECASE совпадают с «i», а casefold() приводит их к другим строкам
+_DOTTED_I = str.maketrans({"İ": "i", "ı": "i"})
+
+
+def fold(text: str) -> str:
+    """
+    Приводит строку к виду для триграмм и слов без учета регистра (корректно для кириллицы).
+
+    Символы, которые совпадают при re.IGNORECASE, после fold тоже совпадают, поэтому
+    триграммы дают все строки, которые найдет поиск с IGNORECASE (и, возможно, лишние).
+    """
+    return text.translate(_DOTTED_I).casefold()
+
+
+def trigrams(text: str) -> Set[str]:
+    """Множество триграмм уже приведенной к нижнему регистру строки."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def index_path(file_path: str | Path) -> Path:
+    """Путь до файла индекса, который лежит рядом с xlsx-файлом."""
+    file_path = Path(file_path)
+    return file_path.with_name(file_path.name + INDEX_SUFFIX)
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс по текстовым полям транзакций.
+
+    Для каждого поля хранятся списки строк по триграммам (для поиска подстроки)
+    и по словам (для поиска слов). Кандидаты из пересечения списков
+    проверяются тем же шаблоном (re.escape и IGNORECASE), что и полный просмотр,
+    поэтому поиск подстроки дает тот же результат, но смотрит только на кандидатов.
+    Строки можно дописывать: refresh досчитывает только новые, если уже проиндексированная
+    часть данных не изменилась (это проверяется по выборке ее строк, prefix_digest).
+    """
+
+    def __init__(self, fields: Sequence[str] = DEFAULT_FIELDS) -> None:
+        self.fields = tuple(fields)
+        self.rows = 0
+        # Отпечаток проиндексированных строк (см. incremental.prefix_digest)
+        self.prefix_digest: Optional[str] = None
+        # Размер и время изменения файла, по которому индекс догнан последним (см. file_signature)
+        self.source_signature: Optional[List[int]] = None
+        self.grams: Dict[str, Dict[str, List[int]]] = {field: {} for field in self.fields}
+        self.words: Dict[str, Dict[str, List[int]]] = {field: {} for field in self.fields}
+
+    @classmethod
+    def build(cls, data: Sequence[Mapping] | TransactionTable,
+              fields: Sequence[str] = DEFAULT_FIELDS) -> "SearchIndex":
+        """Строит индекс по всему набору транзакций."""
+        index = cls(fields)
+        index.add(data)
+        index.prefix_digest = prefix_digest(data, index.rows)
+        return index
+
+    def add(self, transactions: Iterable[Mapping]) -> int:
+        """
+        Добавляет в индекс новые транзакции; их номера продолжают нумерацию уже учтенных строк.
+
+        Отпечаток проиндексированных строк по одним новым транзакциям не посчитать, поэтому
+        он сбрасывается (его заново считают build и refresh по всему набору данных).
+
+        :return: количество добавленных транзакций
+        """
+        count = 0
+        for transaction in transactions:
+            position = self.rows + count
+            for field in self.fields if isinstance(transaction, Mapping) else ():
+                value = transaction.get(field)
+                if not isinstance(value, str):
+                    continue
+                text = fold(value)
+                for gram in trigrams(text):
+                    self.grams[field].setdefault(gram, []).append(position)
+                for word in set(WORD_PATTERN.findall(text)):
+                    self.words[field].setdefault(word, []).append(position)
+            count += 1
+
+        self.rows += count
+        if count:
+            self.prefix_digest = None
+            logger.info("В поисковый индекс добавлено %s транзакций.", count)
+        return count
+
+    def refresh(self, data: Sequence[Mapping] | TransactionTable, source: Optional[str | Path] = None) -> int:
+        """
+        Догоняет индекс до полного набора данных, добавляя только дописанные в конец строки.
+
+        Если уже проиндексированная часть изменилась (не совпал prefix_digest), индекс строится
+        заново. Проверка не нужна, если файл source не менялся с прошлого раза. Индекс при этом
+        меняется, поэтому refresh вызывается при загрузке данных, а не из поиска, который может
+        идти в нескольких потоках.
+
+        :param data: весь набор транзакций
+        :param source: файл, из которого прочитан data
+        :return: количество добавленных транзакций
+        """
+        signature = file_signature(source)
+        unchanged = signature is not None and signature == self.source_signature and self.rows == len(data)
+        if not unchanged and (self.rows > len(data) or prefix_digest(data, self.rows) != self.prefix_digest):
+            logger.warning("Данные изменились, поисковый индекс строится заново.")
+            self.__init__(self.fields)  # type: ignore[misc]
+        count = self.add(data[position] for position in range(self.rows, len(data)))
+        if count:
+            self.prefix_digest = prefix_digest(data, self.rows)
+        self.source_signature = signature
+        return count
+
+    def covers(self, data: Sequence[Mapping] | TransactionTable) -> bool:
+        """
+        Построен ли индекс по data: совпадают число строк и выборка строк (prefix_digest).
+
+        Только читает индекс, поэтому годится для проверки перед каждым поиском.
+        """
+        return self.rows == len(data) and prefix_digest(data, self.rows) == self.prefix_digest
+
+    @staticmethod
+    def _intersect(postings: List[List[int]]) -> List[int]:
+        """Пересечение списков строк, начиная с самого короткого."""
+        if not postings:
+            return []
+        postings = sorted(postings, key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(posting)
+        return sorted(candidates)
+
+    def candidates(self, query: str, field: str = "description") -> Optional[List[int]]:
+        """
+        Строки, которые могут содержать подстроку query (по триграммам).
+
+        :return: отсортированные номера строк или None, если запрос короче триграммы
+            и его нужно проверять полным просмотром
+        """
+        text = fold(query)
+        if len(text) < 3:
+            return None
+        grams = self.grams[field]
+        return self._intersect([grams.get(gram, []) for gram in trigrams(text)])
+
+    def search(self, data: Sequence[Mapping] | TransactionTable, query: str,
+               fields: Sequence[str] = ("description",)) -> List[int]:
+        """
+        Номера строк, у которых хотя бы одно из полей содержит query как подстроку без учета регистра.
+
+        Кандидаты проверяются шаблоном re.escape(query) с IGNORECASE — как при полном просмотре.
+
+        :param data: тот же набор транзакций, по которому построен индекс
+        :param query: искомая подстрока (спецсимволы регулярных выражений не действуют)
+        :param fields: поля, в которых искать
+        :return: номера строк по возрастанию
+        """
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        found: Set[int] = set()
+        for field in fields:
+            candidates = self.candidates(query, field)
+            if candidates is None:
+                candidates = range(min(self.rows, len(data)))
+            for position in candidates:
+                transaction = data[position]
+                value = transaction.get(field) if isinstance(transaction, Mapping) else None
+                if isinstance(value, str) and pattern.search(value) is not None:
+                    found.add(position)
+        return sorted(found)
+
+    def search_words(self, query: str, fields: Sequence[str] = ("description",)) -> List[int]:
+        """
+        Номера строк, в которых встречаются все слова запроса (целиком, без учета регистра).
+
+        Ответ берется только из списков слов, без обращения к данным.
+        """
+        words = set(WORD_PATTERN.findall(fold(query)))
+        if not words:
+            return []
+        found: Set[int] = set()
+        for field in fields:
+            found.update(self._intersect([self.words[field].get(word, []) for word in words]))
+        return sorted(found)
+
+    def save(self, path: str | Path) -> None:
+        """Сохраняет индекс в JSON-файл."""
+        state = {
+            "version": INDEX_VERSION,
+            "fields": self.fields,
+            "rows": self.rows,
+            "prefix_digest": self.prefix_digest,
+            "source_signature": self.source_signature,
+            "grams": self.grams,
+            "words": self.words,
+        }
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str | Path, fields: Sequence[str] = DEFAULT_FIELDS) -> "SearchIndex":
+        """
+        Загружает индекс из JSON-файла; если файла нет, он поврежден или построен
+        по другим полям — возвращает пустой индекс (его можно догнать через refresh).
+        """
+        index = cls(fields)
+        if not os.path.exists(path):
+            return index
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                state = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Ошибка чтения поискового индекса %s: %s", path, e)
+            return index
+        if state.get("version") != INDEX_VERSION or tuple(state.get("fields", ())) != index.fields:
+            logger.info("Поисковый индекс %s несовместим и будет построен заново.", path)
+            return index
+        index.rows = state["rows"]
+        index.prefix_digest = state["prefix_digest"]
+        index.source_signature = state["source_signature"]
+        index.grams = state["grams"]
+        index.words = state["words"]
+        logger.info("Поисковый индекс %s загружен: %s транзакций.", path, index.rows)
+        return index
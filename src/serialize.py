@@ -0,0 +1,162 @@
+import json
+import math
+from datetime import date
+from json.encoder import encode_basestring
+from typing import IO, Any, Dict, Iterable, Iterator, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.table import FIELDS
+
+FORMATS = ("json", "jsonl")
+COMPACT_SEPARATORS = (",", ":")
+
+
+class TransactionEncoder(json.JSONEncoder):
+    """
+    JSON-кодировщик для значений, которые встречаются в транзакциях и отчетах.
+
+    Скаляры NumPy превращаются в обычные числа, массивы — в списки, даты и
+    Timestamp — в строки ISO 8601, NaT — в null, строки TransactionTable — в объекты.
+    """
+
+    def default(self, o: Any) -> Any:
+        if o is pd.NaT:
+            return None
+        if isinstance(o, np.bool_):
+            return bool(o)
+        if isinstance(o, np.integer):
+            return int(o)
+        if isinstance(o, np.floating):
+            return float(o)
+        if isinstance(o, np.datetime64):
+            return None if np.isnat(o) else pd.Timestamp(o).isoformat()
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+        if isinstance(o, date):
+            return o.isoformat()
+        if isinstance(o, Mapping):
+            return dict(o)
+        return super().default(o)
+
+
+def dumps(obj: Any, indent: Optional[int] = 4) -> str:
+    """Сериализует объект в JSON-строку с TransactionEncoder; indent=None — компактная запись."""
+    separators = COMPACT_SEPARATORS if indent is None else None
+    return json.dumps(obj, cls=TransactionEncoder, ensure_ascii=False, indent=indent, separators=separators)
+
+
+# Закодированные заранее ключи известной схемы транзакции
+_KEYS = {field: encode_basestring(field) for field in FIELDS}
+
+
+class _RecordEncoder:
+    """
+    Кодирует одну транзакцию как элемент массива верхнего уровня.
+
+    Плоские словари со строками, числами и None (схема транзакции) собираются
+    напрямую из заранее закодированных ключей; все остальное передается TransactionEncoder.
+    """
+
+    def __init__(self, indent: Optional[int]) -> None:
+        if indent is None:
+            self.open, self.close, self.key_separator = "", "", ":"
+            self.encoder = TransactionEncoder(ensure_ascii=False, separators=COMPACT_SEPARATORS)
+            self.pad = ""
+        else:
+            self.open = "\n" + " " * (2 * indent)
+            self.close = "\n" + " " * indent
+            self.key_separator = ": "
+            self.encoder = TransactionEncoder(ensure_ascii=False, indent=indent)
+            self.pad = " " * indent
+
+    def _fallback(self, record: Any) -> str:
+        # Строки JSON не содержат переводов строк, поэтому отступ можно добавить заменой
+        return self.encoder.encode(record).replace("\n", "\n" + self.pad)
+
+    def encode(self, record: Any) -> str:
+        if type(record) is not dict or not record:
+            return self._fallback(record)
+        parts = []
+        for key, value in record.items():
+            encoded_key = _KEYS.get(key)
+            if encoded_key is None:
+                if type(key) is not str:
+                    return self._fallback(record)
+                encoded_key = encode_basestring(key)
+            value_type = type(value)
+            if value_type is str:
+                encoded = encode_basestring(value)
+            elif value_type is int or (value_type is float and math.isfinite(value)):
+                encoded = repr(value)
+            elif value is None:
+                encoded = "null"
+            else:
+                return self._fallback(record)
+            parts.append(self.open + encoded_key + self.key_separator + encoded)
+        return "{" + ",".join(parts) + self.close + "}"
+
+
+def iter_json(items: Iterable[Any], fmt: str = "json", indent: Optional[int] = 4,
+              batch_size: int = 256) -> Iterator[str]:
+    """
+    Сериализует последовательность записей по частям, не собирая всю строку в памяти.
+
+    :param items: записи (обычно словари транзакций); могут приходить из генератора
+    :param fmt: "json" — один JSON-массив (склейка частей совпадает с json.dumps),
+        "jsonl" — JSON Lines: по одной компактной записи на строку
+    :param indent: отступ для формата "json"; None — компактная запись без пробелов
+    :param batch_size: сколько записей объединять в одну часть
+    :return: генератор строк-частей
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат вывода: {fmt}")
+    if fmt == "jsonl":
+        encoder = _RecordEncoder(None)
+        separator, head, tail, first_separator = "\n", "", "\n", ""
+    else:
+        encoder = _RecordEncoder(indent)
+        pad = "" if indent is None else "\n" + " " * indent
+        separator, head, tail, first_separator = "," + pad, "[", ("" if indent is None else "\n") + "]", pad
+
+    parts = [head]
+    empty = True
+    for item in items:
+        parts.append((first_separator if empty else separator) + encoder.encode(item))
+        empty = False
+        if len(parts) >= batch_size:
+            yield "".join(parts)
+            parts = []
+
+    if fmt == "json" and empty:
+        yield "[]"
+        return
+    if not empty:
+        parts.append(tail)
+    if parts:
+        yield "".join(parts)
+
+
+def write_json(items: Iterable[Any], file: IO[str], fmt: str = "json", indent: Optional[int] = 4,
+               batch_size: int = 256) -> int:
+    """
+    Записывает записи в открытый текстовый файл по мере их появления.
+
+    :param items: записи для сериализации
+    :param file: файловый объект, открытый на запись в текстовом режиме
+    :param fmt: "json" или "jsonl" (см. iter_json)
+    :param indent: отступ для формата "json"
+    :param batch_size: сколько записей передавать в file.write за раз
+    :return: количество записанных записей
+    """
+    counter: Dict[str, int] = {"count": 0}
+
+    def counted() -> Iterator[Any]:
+        for item in items:
+            counter["count"] += 1
+            yield item
+
+    for chunk in iter_json(counted(), fmt=fmt, indent=indent, batch_size=batch_size):
+        file.write(chunk)
+    return counter["count"]
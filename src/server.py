@@ -0,0 +1,256 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from src.incremental import AggregateStore
+from src.metrics import METRICS, server_timing
+from src.reports import spending_by_category
+from src.result_cache import ResultCache, search_key, spending_key
+from src.search_index import SearchIndex, index_path
+from src.serialize import dumps
+from src.services import search_transactions_by_keyword
+from src.table import TransactionTable
+from src.utils import read_xlsx_table
+from src.views import web_page
+
+logger = logging.getLogger(__name__)
+
+# Как часто проверять, не изменилась ли рабочая книга, секунды
+RELOAD_CHECK_INTERVAL = 1.0
+
+# Отчет по категории без записи в файл: сервер отдает его в ответе
+_spending_by_category = getattr(spending_by_category, "__wrapped__", spending_by_category)
+
+
+class HttpError(Exception):
+    """Ошибка запроса с HTTP-статусом, которую сервер отдает клиенту."""
+
+    def __init__(self, status: str, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class DatasetState:
+    """Загруженный набор данных с индексами; после создания не меняется (кроме кэша результатов)."""
+
+    def __init__(self, table: TransactionTable, index: SearchIndex, store: AggregateStore,
+                 signature: Tuple[float, int]) -> None:
+        self.table = table
+        self.index = index
+        self.store = store
+        self.signature = signature
+        self.loaded_at = time.time()
+        self.results = ResultCache()
+        self.search = self.results.wrap(search_transactions_by_keyword, search_key)
+        self.spending = self.results.wrap(_spending_by_category, spending_key)
+
+
+class Dataset:
+    """
+    Набор транзакций, загруженный в память один раз и перезагружаемый при изменении файла.
+
+    Запросы получают текущее состояние через current(); перезагрузка собирает новое
+    состояние и подменяет ссылку, поэтому запросы, начатые раньше, дорабатывают со старыми данными.
+    """
+
+    def __init__(self, path: str | Path, check_interval: float = RELOAD_CHECK_INTERVAL) -> None:
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+        self._state = self._load()
+
+    def _signature(self) -> Tuple[float, int]:
+        stat = os.stat(self.path)
+        return stat.st_mtime, stat.st_size
+
+    def _load(self) -> DatasetState:
+        started = time.perf_counter()
+        signature = self._signature()
+        table = read_xlsx_table(self.path, use_cache=True)
+        index = SearchIndex.load(index_path(self.path))
+        if index.refresh(table, source=self.path):
+            index.save(index_path(self.path))
+        store = AggregateStore()
+        store.refresh(table)
+        logger.info("Загружено %s транзакций из %s за %.2f с", len(table), self.path, time.perf_counter() - started)
+        return DatasetState(table, index, store, signature)
+
+    def current(self) -> DatasetState:
+        """Текущее состояние; если рабочая книга изменилась — сначала перезагружает ее."""
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            # Файл перезагружает один поток, остальные пока работают с прежним состоянием
+            if self._reload_lock.acquire(blocking=False):
+                try:
+                    self._reload_if_changed()
+                finally:
+                    self._reload_lock.release()
+        return self._state
+
+    def _reload_if_changed(self) -> None:
+        try:
+            if self._signature() == self._state.signature:
+                return
+            self._state = self._load()
+        except Exception as e:
+            logger.error("Ошибка перезагрузки %s, используются прежние данные: %s", self.path, e)
+            return
+        self.reloads += 1
+        logger.info("Рабочая книга %s изменилась, данные перезагружены.", self.path)
+
+
+def _param(params: Dict[str, List[str]], name: str, required: bool = True) -> Optional[str]:
+    values = params.get(name)
+    if not values or not values[0]:
+        if required:
+            raise HttpError("400 Bad Request", f"Не указан параметр {name}")
+        return None
+    return values[0]
+
+
+def handle_web_page(state: DatasetState, params: Dict[str, List[str]]) -> str:
+    """GET /web_page?time=ГГГГ-ММ-ДД ЧЧ:ММ:СС"""
+    return web_page(_param(params, "time"), state.table, store=state.store)
+
+
+def handle_search(state: DatasetState, params: Dict[str, List[str]]) -> str:
+    """GET /search?q=слово"""
+    return state.search(state.table, _param(params, "q"), index=state.index)
+
+
+def spending_json(state: DatasetState, category: str, date: Optional[str] = None) -> str:
+    """Траты по категории за 90 дней до date в виде JSON (как в файле отчета)."""
+    df = state.spending(state.table, category, date)
+    return dumps(df.to_dict(orient="records"), indent=4)
+
+
+def handle_spending(state: DatasetState, params: Dict[str, List[str]]) -> str:
+    """GET /spending?category=Категория[&date=ГГГГ-ММ-ДД]"""
+    return spending_json(state, _param(params, "category"), _param(params, "date", required=False))
+
+
+def handle_health(state: DatasetState, params: Dict[str, List[str]]) -> str:
+    """GET /health — размер загруженного набора и время загрузки."""
+    return dumps(
+        {"status": "ok", "rows": len(state.table), "loaded_at": state.loaded_at, "cache": state.results.stats},
+        indent=None,
+    )
+
+
+def handle_metrics(state: DatasetState, params: Dict[str, List[str]]) -> str:
+    """GET /metrics — счетчики и гистограммы в текстовом формате Prometheus."""
+    return METRICS.render_prometheus()
+
+
+ROUTES: Dict[str, Callable[[DatasetState, Dict[str, List[str]]], str]] = {
+    "/web_page": handle_web_page,
+    "/search": handle_search,
+    "/spending": handle_spending,
+    "/health": handle_health,
+    "/metrics": handle_metrics,
+}
+
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+CONTENT_TYPES = {"/metrics": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+def with_timings(body: str, breakdown: List[Dict[str, Any]]) -> str:
+    """Ответ вместе с разбивкой времени: {"result": ответ, "timings": [...]} (ответ не перекодируется)."""
+    return f'{{"result": {body}, "timings": {dumps(breakdown, indent=None)}}}'
+
+
+def make_app(dataset: Dataset) -> Callable[..., Iterable[bytes]]:
+    """
+    WSGI-приложение с эндпоинтами ROUTES поверх загруженного набора данных.
+
+    Разбивка времени запроса по этапам отдается в заголовке Server-Timing,
+    а с параметром timings=1 — еще и в теле ответа.
+
+    :param dataset: набор транзакций
+    :return: WSGI-приложение
+    """
+    METRICS.register_stats("result_cache", lambda: dataset.current().results.stats)
+
+    def app(environ: Dict[str, Any], start_response: Callable[..., Any]) -> Iterable[bytes]:
+        path = environ.get("PATH_INFO", "/")
+        params = parse_qs(environ.get("QUERY_STRING", ""))
+        started = time.perf_counter()
+        with METRICS.collect() as breakdown:
+            try:
+                if environ.get("REQUEST_METHOD") != "GET":
+                    raise HttpError("405 Method Not Allowed", "Поддерживается только GET")
+                handler = ROUTES.get(path)
+                if handler is None:
+                    raise HttpError("404 Not Found", f"Неизвестный адрес {path}")
+                status, body = "200 OK", handler(dataset.current(), params)
+            except HttpError as e:
+                status, body = e.status, json.dumps({"error": str(e)}, ensure_ascii=False)
+            except Exception as e:
+                logger.error("Ошибка обработки запроса %s: %s", path, e)
+                status = "500 Internal Server Error"
+                body = json.dumps({"error": "Внутренняя ошибка"}, ensure_ascii=False)
+        route = path if path in ROUTES else "other"
+        METRICS.observe("request_seconds", time.perf_counter() - started, route=route)
+        METRICS.inc("requests", route=route, status=status.split()[0])
+
+        headers = [("Content-Type", CONTENT_TYPES.get(path, JSON_CONTENT_TYPE))]
+        if breakdown:
+            headers.append(("Server-Timing", server_timing(breakdown)))
+            wanted = _param(params, "timings", required=False) in ("1", "true")
+            if wanted and status == "200 OK" and path not in CONTENT_TYPES:
+                body = with_timings(body, breakdown)
+        payload = body.encode("utf-8")
+        headers.append(("Content-Length", str(len(payload))))
+        start_response(status, headers)
+        return [payload]
+
+    return app
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """WSGI-сервер, обрабатывающий каждый запрос в отдельном потоке."""
+
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(format, *args)
+
+
+def create_server(path: str | Path, host: str = "127.0.0.1", port: int = 8000) -> WSGIServer:
+    """Загружает набор данных и создает сервер (port=0 — свободный порт)."""
+    dataset = Dataset(path)
+    return make_server(host, port, make_app(dataset), server_class=ThreadingWSGIServer, handler_class=_QuietHandler)
+
+
+def serve(path: str | Path, host: str = "127.0.0.1", port: int = 8000) -> None:
+    """Запускает сервер и обслуживает запросы до прерывания."""
+    server = create_server(path, host, port)
+    logger.info("Сервер запущен на http://%s:%s", host, server.server_port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP-сервер анализа транзакций")
+    parser.add_argument("--file", default=str(Path(__file__).resolve().parent.parent / "data" / "operations.xlsx"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    arguments = parser.parse_args()
+    serve(arguments.file, arguments.host, arguments.port)
@@ -1,46 +1,308 @@
-import json
 import logging
 import re
-from typing import Any, Dict, List
+from collections.abc import Iterator, Mapping
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.logs import RepeatedWarnings
+from src.matcher import AhoCorasick
+from src.metrics import METRICS
+from src.search_index import SearchIndex
+from src.serialize import iter_json
+from src.table import TransactionTable
 
 logger = logging.getLogger(__name__)
 
 
-def search_transactions_by_keyword(data: List[Dict[str, Any]], key_word: str) -> str:
+TABLE_BATCH_SIZE = 1000
+
+
+def find_transactions_by_keyword(
+    data: Iterable[Dict[str, Any]] | TransactionTable, key_word: str, index: Optional[SearchIndex] = None
+) -> Iterator[Dict[str, Any]]:
     """
-    Выполняет поиск транзакций по заданному ключевому слову в их описании.
+    Находит транзакции, в описании которых встречается ключевое слово, и отдает их по одной.
+
+    Ключевое слово ищется как обычная подстрока без учета регистра (спецсимволы
+    регулярных выражений не действуют). Строки TransactionTable раскодируются
+    пачками, поэтому весь результат не собирается в памяти.
 
-    :param data: Список транзакций, где каждая транзакция представлена словарем.
+    :param data: Список транзакций, где каждая транзакция представлена словарем,
+        генератор транзакций (например, из iter_xlsx) или TransactionTable.
     :param key_word: Ключевое слово для поиска в описании транзакций.
-    :return: JSON-строка с найденными транзакциями.
+    :param index: Поисковый индекс, построенный по data; с ним проверяются
+        только строки-кандидаты, а не все описания. Поиск индекс не меняет: его догоняют
+        до данных при загрузке (SearchIndex.refresh), а индекс, построенный не по data
+        (см. SearchIndex.covers), не используется.
+    :return: Генератор найденных транзакций.
     """
-    if not isinstance(data, list):
+    if not isinstance(data, (list, Iterator, TransactionTable)):
         logger.error("Переданные данные не являются списком.")
-        return json.dumps([])
+        return
 
     if not isinstance(key_word, str) or not key_word:
         logger.warning("Ключевое слово отсутствует или не является строкой.")
-        return json.dumps([])
+        return
+
+    logger.info("Начат поиск транзакций по ключевому слову: '%s'", key_word)
 
-    logger.info(f"Начат поиск транзакций по ключевому слову: '{key_word}'")
+    count = 0
+    # Строки, проверенные без индекса (с индексом проверяются только кандидаты)
+    scanned = 0
+    pattern = re.compile(re.escape(key_word), re.IGNORECASE)
 
-    result_list = []
-    pattern = re.compile(rf"{key_word}", re.IGNORECASE)
+    # Генератор по индексу не проверить: его строки нельзя прочитать по номерам
+    if isinstance(data, Iterator):
+        index = None
+    elif index is not None and not index.covers(data):
+        logger.warning("Поисковый индекс не соответствует данным, выполняется полный просмотр.")
+        index = None
 
-    for transaction in data:
-        if not isinstance(transaction, dict):
-            logger.warning(f"Пропущена некорректная транзакция: {transaction}")
-            continue
+    if isinstance(data, TransactionTable):
+        if index is not None:
+            positions = np.asarray(index.search(data, key_word), dtype=np.int64)
+        else:
+            scanned = len(data)
+            positions = _search_table(data, pattern)
+        for start in range(0, len(positions), TABLE_BATCH_SIZE):
+            for transaction in data.to_records(positions[start:start + TABLE_BATCH_SIZE]):
+                count += 1
+                yield transaction
 
-        if "description" not in transaction:
-            logger.warning(f"Пропущена транзакция без описания: {transaction}")
-            continue
+    elif index is not None:
+        for position in index.search(data, key_word):
+            count += 1
+            yield data[position]
 
-        if pattern.search(transaction["description"]) is not None:
-            result_list.append(transaction)
+    else:
+        skipped = RepeatedWarnings(logger)
+        for transaction in data:
+            scanned += 1
+            if not isinstance(transaction, dict):
+                skipped.warning("Пропущена некорректная транзакция: %s", transaction)
+                continue
 
+            if "description" not in transaction:
+                skipped.warning("Пропущена транзакция без описания: %s", transaction)
+                continue
+
+            if pattern.search(transaction["description"]) is not None:
+                count += 1
+                yield transaction
+        skipped.flush()
+
+    METRICS.inc("rows_scanned", scanned, function="find_transactions_by_keyword")
+    METRICS.inc("rows_matched", count, function="find_transactions_by_keyword")
     logger.info(
-        f"Найдено {len(result_list)} транзакций по ключевому слову '{key_word}'"
+        "Найдено %s транзакций по ключевому слову '%s'", count, key_word
     )
 
-    return json.dumps(result_list, indent=4, ensure_ascii=False)
+
+@METRICS.timed("search")
+def search_transactions_by_keyword(
+    data: Iterable[Dict[str, Any]] | TransactionTable, key_word: str, index: Optional[SearchIndex] = None
+) -> str:
+    """
+    Выполняет поиск транзакций по заданному ключевому слову в их описании.
+
+    :param data: Список транзакций, где каждая транзакция представлена словарем,
+        генератор транзакций (например, из iter_xlsx) или TransactionTable.
+    :param key_word: Ключевое слово для поиска в описании транзакций.
+    :param index: Поисковый индекс, построенный по data (см. find_transactions_by_keyword).
+    :return: JSON-строка с найденными транзакциями.
+    """
+    return "".join(iter_json(find_transactions_by_keyword(data, key_word, index), indent=4))
+
+
+def stream_transactions_by_keyword(
+    data: Iterable[Dict[str, Any]] | TransactionTable,
+    key_word: str,
+    fmt: str = "jsonl",
+    index: Optional[SearchIndex] = None,
+) -> Iterator[str]:
+    """
+    Поиск транзакций с потоковой выдачей: JSON отдается частями по мере нахождения транзакций.
+
+    Чтобы записать результат в файл, части можно передавать в file.write
+    или воспользоваться write_json(find_transactions_by_keyword(...), file).
+
+    :param data: Транзакции (как в search_transactions_by_keyword).
+    :param key_word: Ключевое слово для поиска в описании транзакций.
+    :param fmt: "jsonl" — по одной транзакции на строку, "json" — компактный JSON-массив.
+    :param index: Поисковый индекс, построенный по data.
+    :return: Генератор строк-частей.
+    """
+    return iter_json(find_transactions_by_keyword(data, key_word, index), fmt=fmt, indent=None)
+
+
+Term = str | Tuple[str, str]
+
+
+def _parse_terms(terms: Iterable[Term], fields: Sequence[str]) -> Optional[List[Tuple[str, Tuple[str, ...], str]]]:
+    """
+    Приводит ключевые слова к виду (подпись, поля, текст).
+
+    Строка ищется во всех полях fields, пара (поле, строка) — только в указанном поле.
+    Возвращает None, если среди ключевых слов есть пустые или не строки.
+    """
+    parsed = []
+    for term in terms:
+        if isinstance(term, tuple) and len(term) == 2:
+            field, text = term
+            label, term_fields = f"{field}:{text}", (field,)
+        else:
+            text, label, term_fields = term, term, tuple(fields)
+        if not isinstance(text, str) or not text:
+            return None
+        parsed.append((label, term_fields, text.casefold()))
+    return parsed
+
+
+def find_transactions_by_terms(
+    data: Iterable[Dict[str, Any]] | TransactionTable,
+    all_of: Iterable[Term] = (),
+    any_of: Iterable[Term] = (),
+    none_of: Iterable[Term] = (),
+    fields: Sequence[str] = ("description",),
+) -> Iterator[Tuple[Dict[str, Any], List[str]]]:
+    """
+    Поиск транзакций сразу по многим ключевым словам за один проход.
+
+    Все ключевые слова ищутся одним автоматом Ахо — Корасик как обычные подстроки
+    без учета регистра. Транзакция подходит, если в ней встречаются все слова all_of,
+    хотя бы одно из any_of (если он задан) и ни одного из none_of.
+
+    :param data: Список или генератор транзакций либо TransactionTable.
+    :param all_of: Слова, которые должны встретиться все (И).
+    :param any_of: Слова, из которых должно встретиться хотя бы одно (ИЛИ).
+    :param none_of: Слова, которых не должно быть (НЕ).
+    :param fields: Поля, в которых ищутся слова, заданные строкой;
+        слово в виде пары ("category", "Кафе") ищется только в своем поле.
+    :return: Генератор пар (транзакция, список сработавших слов из all_of и any_of).
+    """
+    if not isinstance(data, (list, Iterator, TransactionTable)):
+        logger.error("Переданные данные не являются списком.")
+        return
+
+    groups = [_parse_terms(terms, fields) for terms in (all_of, any_of, none_of)]
+    if any(group is None for group in groups) or not any(groups):
+        logger.warning("Ключевые слова отсутствуют или не являются строками.")
+        return
+    all_terms, any_terms, none_terms = groups
+    terms = all_terms + any_terms + none_terms
+    logger.info("Начат поиск транзакций по %s ключевым словам", len(terms))
+
+    texts = list(dict.fromkeys(text for _, _, text in terms))
+    automaton = AhoCorasick(texts)
+    pattern_ids = [texts.index(text) for _, _, text in terms]
+    scan_fields = list(dict.fromkeys(field for _, term_fields, _ in terms for field in term_fields))
+    positive = len(all_terms) + len(any_terms)
+    labels = [label for label, _, _ in terms[:positive]]
+
+    def matches(hits: List[bool]) -> bool:
+        return (
+            all(hits[:len(all_terms)])
+            and (not any_terms or any(hits[len(all_terms):positive]))
+            and not any(hits[positive:])
+        )
+
+    count = 0
+    scanned = 0
+    if isinstance(data, TransactionTable) and all(data.kinds.get(field) == "category" for field in scan_fields):
+        scanned = len(data)
+        hits = _match_table(data, automaton, terms, pattern_ids, scan_fields)
+        all_count = len(all_terms)
+        selected_mask = hits[:all_count].all(axis=0) & ~hits[positive:].any(axis=0)
+        if any_terms:
+            selected_mask &= hits[all_count:positive].any(axis=0)
+        selected = np.flatnonzero(selected_mask)
+        for start in range(0, len(selected), TABLE_BATCH_SIZE):
+            batch = selected[start:start + TABLE_BATCH_SIZE]
+            for position, transaction in zip(batch, data.to_records(batch)):
+                count += 1
+                yield transaction, [label for label, hit in zip(labels, hits[:positive, position]) if hit]
+    else:
+        # Описания часто повторяются, поэтому автомат запускается один раз на каждое значение поля
+        found: Dict[Tuple[str, Any], set] = {}
+        skipped = RepeatedWarnings(logger)
+        for transaction in data:
+            scanned += 1
+            if not isinstance(transaction, Mapping):
+                skipped.warning("Пропущена некорректная транзакция: %s", transaction)
+                continue
+            field_hits = {}
+            for field in scan_fields:
+                value = transaction.get(field)
+                key = (field, value)
+                if key not in found:
+                    found[key] = automaton.find(value) if isinstance(value, str) else set()
+                field_hits[field] = found[key]
+            hits = [
+                any(pattern_id in field_hits[field] for field in term_fields)
+                for (_, term_fields, _), pattern_id in zip(terms, pattern_ids)
+            ]
+            if matches(hits):
+                count += 1
+                if isinstance(data, TransactionTable):
+                    transaction = dict(transaction)
+                yield transaction, [label for label, hit in zip(labels, hits) if hit]
+        skipped.flush()
+
+    METRICS.inc("rows_scanned", scanned, function="find_transactions_by_terms")
+    METRICS.inc("rows_matched", count, function="find_transactions_by_terms")
+    logger.info("Найдено %s транзакций по %s ключевым словам", count, len(terms))
+
+
+def _match_table(table: TransactionTable, automaton: AhoCorasick, terms: List[Tuple[str, Tuple[str, ...], str]],
+                 pattern_ids: List[int], scan_fields: List[str]) -> np.ndarray:
+    """
+    Матрица попаданий (слово x строка) для TransactionTable: автомат запускается
+    один раз на каждое уникальное значение поля, строки отбираются по кодам.
+    """
+    code_hits = {
+        field: [automaton.find(value) if isinstance(value, str) else set() for value in table.categories(field)]
+        for field in scan_fields
+    }
+    hits = np.zeros((len(terms), len(table)), dtype=bool)
+    for row, ((_, term_fields, _), pattern_id) in enumerate(zip(terms, pattern_ids)):
+        for field in term_fields:
+            matched_codes = [code for code, found in enumerate(code_hits[field]) if pattern_id in found]
+            hits[row] |= np.isin(table.codes(field), matched_codes)
+    return hits
+
+
+@METRICS.timed("search_terms")
+def search_transactions_by_terms(
+    data: Iterable[Dict[str, Any]] | TransactionTable,
+    all_of: Iterable[Term] = (),
+    any_of: Iterable[Term] = (),
+    none_of: Iterable[Term] = (),
+    fields: Sequence[str] = ("description",),
+) -> str:
+    """
+    Поиск транзакций по многим ключевым словам (см. find_transactions_by_terms).
+
+    :return: JSON-строка со списком {"transaction": транзакция, "matched_terms": сработавшие слова}.
+    """
+    results = (
+        {"transaction": transaction, "matched_terms": matched}
+        for transaction, matched in find_transactions_by_terms(data, all_of, any_of, none_of, fields)
+    )
+    return "".join(iter_json(results, indent=4))
+
+
+def _search_table(table: TransactionTable, pattern: re.Pattern) -> np.ndarray:
+    """
+    Поиск по TransactionTable: шаблон проверяется один раз на каждое уникальное описание,
+    затем совпавшие коды отбираются по всей колонке.
+    """
+    if table.kinds["description"] != "category":
+        return np.array([], dtype=np.int64)
+    descriptions = table.categories("description")
+    matched_codes = [
+        code
+        for code, description in enumerate(descriptions)
+        if isinstance(description, str) and pattern.search(description) is not None
+    ]
+    return np.flatnonzero(np.isin(table.codes("description"), matched_codes))
@@ -0,0 +1,406 @@
+import hashlib
+import json
+import sys
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+# Поля транзакции в том порядке, в котором их отдает read_xlsx
+FIELDS = (
+    "operation_date",
+    "payment_date",
+    "state",
+    "last_digits",
+    "amount_transaction",
+    "currency",
+    "amount_transaction_rub",
+    "account_currency",
+    "cashback",
+    "category",
+    "transaction_code",
+    "benefit",
+    "amount_to_piggy",
+    "description",
+    "amount_rounded",
+)
+
+# Суммы хранятся в копейках (int64)
+KOPECK_FIELDS = (
+    "amount_transaction",
+    "amount_transaction_rub",
+    "cashback",
+    "amount_to_piggy",
+    "amount_rounded",
+)
+
+OPERATION_DATE_FORMAT = "%d.%m.%Y %H:%M:%S"
+
+
+def parse_operation_dates(values: pd.Series) -> pd.Series:
+    """
+    Разбирает колонку дат операций в datetime64.
+
+    Основной формат выгрузки разбирается по шаблону, остальные значения —
+    с dayfirst=True. Неразборчивые даты превращаются в NaT.
+    """
+    parsed = pd.to_datetime(values, format=OPERATION_DATE_FORMAT, errors="coerce")
+    rest = parsed.isna() & values.astype(bool)
+    if rest.any():
+        parsed[rest] = pd.to_datetime(values[rest].astype(str), format="mixed", dayfirst=True, errors="coerce")
+    return parsed
+
+
+def parse_operation_date(value: Any) -> Optional[datetime]:
+    """Разбирает одну дату операции; для пустых и неразборчивых значений — None."""
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value), OPERATION_DATE_FORMAT)
+    except ValueError:
+        parsed = pd.to_datetime(str(value), format="mixed", dayfirst=True, errors="coerce")
+        return None if pd.isna(parsed) else parsed.to_pydatetime()
+
+
+def _downcast(values: np.ndarray) -> np.ndarray:
+    """Переводит числовую колонку в 32-битный тип, если это не меняет значений."""
+    target = {"i": np.int32, "u": np.uint32, "f": np.float32}.get(values.dtype.kind)
+    if target is None or values.dtype.itemsize <= 4:
+        return values
+    narrowed = values.astype(target)
+    return narrowed if np.array_equal(narrowed, values, equal_nan=values.dtype.kind == "f") else values
+
+
+class DateIndex:
+    """
+    Отсортированный индекс дат операций.
+
+    Хранит только номера строк, упорядоченные по дате (int32), а сами даты берет
+    из исходной колонки без копирования. Выборка за любой период — два двоичных
+    поиска (O(log N)). Строки без даты (NaT) в индекс не попадают.
+    """
+
+    def __init__(self, dates: np.ndarray) -> None:
+        self.source = np.asarray(dates, dtype="datetime64[ns]")
+        valid = np.flatnonzero(~np.isnat(self.source))
+        positions = valid[np.argsort(self.source[valid], kind="stable")]
+        self.positions = positions.astype(np.int32) if len(self.source) < 2**31 else positions
+
+    @classmethod
+    def from_records(cls, records: Sequence[Mapping]) -> "DateIndex":
+        """Строит индекс по списку словарей транзакций (даты разбираются один раз)."""
+        values = pd.Series([record.get("operation_date", "") for record in records], dtype=object)
+        return cls(parse_operation_dates(values).to_numpy(dtype="datetime64[ns]"))
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def between(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> np.ndarray:
+        """
+        Номера строк с датой операции в интервале [start, end].
+
+        :param start: начало периода включительно; None — без ограничения
+        :param end: конец периода включительно; None — без ограничения
+        :return: номера строк в исходном порядке
+        """
+        def date_at(position: int) -> np.datetime64:
+            return self.source[position]
+
+        low = 0 if start is None else bisect_left(self.positions, np.datetime64(start, "ns"), key=date_at)
+        high = (
+            len(self.positions)
+            if end is None
+            else bisect_right(self.positions, np.datetime64(end, "ns"), key=date_at)
+        )
+        return np.sort(self.positions[low:high])
+
+    def last_days(self, days: int, end: datetime) -> np.ndarray:
+        """Строки за последние days дней до end включительно (с полуночи первого дня)."""
+        start = datetime.combine(end.date(), time.min) - timedelta(days=days)
+        return self.between(start, end)
+
+    def month_to_date(self, moment: datetime) -> np.ndarray:
+        """Строки с начала месяца moment до самого moment включительно."""
+        return self.between(datetime.combine(moment.date().replace(day=1), time.min), moment)
+
+    def nbytes(self) -> int:
+        """Память, занятая индексом, в байтах."""
+        return self.positions.nbytes
+
+
+class TransactionRow(Mapping):
+    """
+    Легкое представление одной строки TransactionTable.
+
+    Ведет себя как словарь транзакции (поддерживает [], get, keys, items),
+    но значения читаются из колонок таблицы только при обращении.
+    """
+
+    __slots__ = ("_table", "_position")
+
+    def __init__(self, table: "TransactionTable", position: int) -> None:
+        self._table = table
+        self._position = position
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._table.kinds:
+            raise KeyError(key)
+        return self._table.value(key, self._position)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Материализует строку в обычный словарь транзакции."""
+        return {key: self[key] for key in FIELDS}
+
+    def __repr__(self) -> str:
+        return f"TransactionRow({self.to_dict()})"
+
+
+class TransactionTable:
+    """
+    Компактная колоночная таблица транзакций.
+
+    Строковые поля хранятся словарным кодированием (коды int32 + словарь значений),
+    суммы — в копейках int64, дата операции — в datetime64. Строки как словари
+    не создаются: индексирование и итерация отдают TransactionRow.
+    При создании строится отсортированный индекс дат (date_index) для выборок по периодам.
+    """
+
+    def __init__(self, columns: Dict[str, Any], kinds: Dict[str, str], size: int,
+                 operation_dt: np.ndarray, date_overrides: Dict[int, Any]) -> None:
+        self.columns = columns
+        self.kinds = kinds
+        self.size = size
+        self.operation_dt = operation_dt
+        # Исходные строки дат, которые не восстанавливаются форматированием operation_dt
+        self.date_overrides = date_overrides
+        self.date_index = DateIndex(operation_dt)
+        self._fingerprint: Optional[str] = None
+
+    @classmethod
+    def from_frame(cls, df: DataFrame) -> "TransactionTable":
+        """
+        Строит таблицу из нормализованного DataFrame (см. read_xlsx_frame).
+
+        :param df: DataFrame с внутренними именами колонок
+        :return: TransactionTable
+        """
+        df = df.reset_index(drop=True)
+        columns: Dict[str, Any] = {}
+        kinds: Dict[str, str] = {}
+        for field in FIELDS:
+            if field == "operation_date":
+                continue
+            series = df[field] if field in df.columns else pd.Series([""] * len(df), dtype=object)
+            if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                is_int = pd.api.types.is_integer_dtype(series)
+                if field in KOPECK_FIELDS:
+                    columns[field] = np.rint(series.to_numpy(dtype=np.float64) * 100).astype(np.int64)
+                    kinds[field] = "kopecks_int" if is_int else "kopecks"
+                else:
+                    columns[field] = _downcast(series.to_numpy())
+                    kinds[field] = "int" if is_int else "float"
+            else:
+                codes, categories = pd.factorize(series, use_na_sentinel=False)
+                columns[field] = (codes.astype(np.int32), np.asarray(categories, dtype=object))
+                kinds[field] = "category"
+
+        raw_dates = df["operation_date"] if "operation_date" in df.columns else pd.Series([""] * len(df))
+        if "operation_dt" in df.columns:
+            operation_dt = pd.to_datetime(df["operation_dt"])
+        else:
+            operation_dt = parse_operation_dates(raw_dates)
+        formatted = operation_dt.dt.strftime(OPERATION_DATE_FORMAT)
+        mismatch = np.flatnonzero((formatted != raw_dates).to_numpy())
+        date_overrides = {int(i): raw_dates.iloc[i] for i in mismatch}
+        kinds["operation_date"] = "date"
+
+        return cls(columns, kinds, len(df), operation_dt.to_numpy(dtype="datetime64[ns]"), date_overrides)
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "TransactionTable":
+        """Строит таблицу из списка словарей транзакций."""
+        return cls.from_frame(pd.DataFrame(list(records), columns=list(FIELDS)).fillna(0))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, position: int) -> TransactionRow:
+        if position < 0:
+            position += self.size
+        if not 0 <= position < self.size:
+            raise IndexError("Индекс строки вне таблицы")
+        return TransactionRow(self, position)
+
+    def __iter__(self) -> Iterator[TransactionRow]:
+        for position in range(self.size):
+            yield TransactionRow(self, position)
+
+    def value(self, field: str, position: int) -> Any:
+        """Значение одного поля в одной строке."""
+        kind = self.kinds[field]
+        if kind == "date":
+            if position in self.date_overrides:
+                return self.date_overrides[position]
+            return pd.Timestamp(self.operation_dt[position]).strftime(OPERATION_DATE_FORMAT)
+        if kind == "category":
+            codes, categories = self.columns[field]
+            return categories[codes[position]]
+        value = self.columns[field][position]
+        if kind == "kopecks":
+            return int(value) / 100
+        if kind == "kopecks_int":
+            return int(value) // 100
+        return value.item()
+
+    def codes(self, field: str) -> np.ndarray:
+        """Коды словарно закодированной колонки."""
+        return self.columns[field][0]
+
+    def categories(self, field: str) -> np.ndarray:
+        """Словарь значений словарно закодированной колонки."""
+        return self.columns[field][1]
+
+    def code_of(self, field: str, value: Any) -> Optional[int]:
+        """Код значения в словаре колонки или None, если значения нет."""
+        matches = np.flatnonzero(self.categories(field) == value)
+        return int(matches[0]) if len(matches) else None
+
+    def amounts(self, field: str) -> np.ndarray:
+        """Колонка сумм в копейках (int64)."""
+        if self.kinds[field].startswith("kopecks"):
+            return self.columns[field]
+        return np.rint(self.numeric(field) * 100).astype(np.int64)
+
+    def numeric(self, field: str) -> np.ndarray:
+        """Колонка в виде float64; нечисловые значения превращаются в 0."""
+        kind = self.kinds[field]
+        if kind.startswith("kopecks"):
+            return self.columns[field] / 100
+        if kind == "category":
+            codes, categories = self.columns[field]
+            values = pd.to_numeric(pd.Series(categories), errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+            return values[codes]
+        return self.columns[field].astype(np.float64)
+
+    def column(self, field: str, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """Раскодированная колонка (целиком или для выбранных строк)."""
+        if positions is None:
+            positions = np.arange(self.size)
+        kind = self.kinds[field]
+        if kind == "date":
+            values = pd.Series(self.operation_dt[positions]).dt.strftime(OPERATION_DATE_FORMAT).to_numpy(dtype=object)
+            for i, position in enumerate(positions):
+                if int(position) in self.date_overrides:
+                    values[i] = self.date_overrides[int(position)]
+            return values
+        if kind == "category":
+            codes, categories = self.columns[field]
+            return categories[codes[positions]]
+        values = self.columns[field][positions]
+        if kind == "kopecks":
+            return values / 100
+        if kind == "kopecks_int":
+            return values // 100
+        # Узкие типы хранения (см. _downcast) наружу отдаются как 64-битные
+        return values.astype(np.int64 if kind == "int" else np.float64)
+
+    def to_frame(self, positions: Optional[np.ndarray] = None) -> DataFrame:
+        """
+        Раскодирует таблицу в DataFrame формата read_xlsx_frame.
+
+        :param positions: номера строк; по умолчанию — все строки
+        :return: DataFrame с полями транзакции и колонкой operation_dt
+        """
+        if positions is None:
+            positions = np.arange(self.size)
+        positions = np.asarray(positions, dtype=np.int64)
+        data = {field: self.column(field, positions) for field in FIELDS}
+        data["operation_dt"] = self.operation_dt[positions]
+        return pd.DataFrame(data)
+
+    def to_records(self, positions: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Раскодирует выбранные строки в список словарей транзакций."""
+        return self.to_frame(positions).drop(columns=["operation_dt"]).to_dict(orient="records")
+
+    def take(self, positions: np.ndarray) -> "TransactionTable":
+        """Новая таблица из выбранных строк; словари значений разделяются с исходной."""
+        positions = np.asarray(positions, dtype=np.int64)
+        columns = {}
+        for field, column in self.columns.items():
+            if self.kinds[field] == "category":
+                columns[field] = (column[0][positions], column[1])
+            else:
+                columns[field] = column[positions]
+        index = {int(position): i for i, position in enumerate(positions)}
+        overrides = {index[p]: raw for p, raw in self.date_overrides.items() if p in index}
+        return TransactionTable(columns, dict(self.kinds), len(positions), self.operation_dt[positions], overrides)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Память, занятая таблицей, в байтах: по колонкам и итог (ключ "total").
+
+        Для словарных колонок учитываются коды и сами строки словаря.
+        """
+        usage = {}
+        for field, column in self.columns.items():
+            if self.kinds[field] == "category":
+                codes, categories = column
+                usage[field] = codes.nbytes + categories.nbytes + sum(sys.getsizeof(value) for value in categories)
+            else:
+                usage[field] = column.nbytes
+        usage["operation_date"] = self.operation_dt.nbytes + sum(
+            sys.getsizeof(raw) for raw in self.date_overrides.values()
+        )
+        usage["date_index"] = self.date_index.nbytes()
+        usage["total"] = sum(usage.values())
+        return usage
+
+    def fingerprint(self) -> str:
+        """
+        Отпечаток содержимого таблицы (SHA-256 по колонкам).
+
+        Считается один раз при первом обращении: таблица после создания не изменяется.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for field, column in self.columns.items():
+                digest.update(f"{field}:{self.kinds[field]}".encode("utf-8"))
+                if self.kinds[field] == "category":
+                    codes, categories = column
+                    digest.update(codes.tobytes())
+                    digest.update(json.dumps(categories.tolist(), ensure_ascii=False, default=str).encode("utf-8"))
+                else:
+                    digest.update(column.tobytes())
+            digest.update(self.operation_dt.tobytes())
+            digest.update(json.dumps(sorted(self.date_overrides.items()), default=str).encode("utf-8"))
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def __repr__(self) -> str:
+        return f"TransactionTable({self.size} строк)"
+
+
+def records_memory_usage(records: List[Dict[str, Any]]) -> int:
+    """Оценка памяти, занятой списком словарей транзакций, в байтах (для сравнения с таблицей)."""
+    total = sys.getsizeof(records)
+    seen = set()
+    for record in records:
+        total += sys.getsizeof(record)
+        for key, value in record.items():
+            for item in (key, value):
+                if id(item) not in seen:
+                    seen.add(id(item))
+                    total += sys.getsizeof(item)
+    return total
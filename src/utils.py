@@ -2,31 +2,88 @@ import heapq
 import json
 import logging
 import os
+import threading
+import time
 from datetime import datetime
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Mapping,
+                    Optional, Sequence, Tuple, Union)
 
+import openpyxl
 import pandas as pd
-import requests
 from dotenv import load_dotenv
+from pandas import DataFrame
+
+from src.aggregate import aggregate, top_k
+from src.cache import read_excel_cached
+from src.logs import RepeatedWarnings, attach_file_log
+from src.metrics import METRICS
+from src.quote_providers import QuoteProvider, provider_from_env
+from src.table import TransactionTable, parse_operation_dates
 
 logger = logging.getLogger("utils")
 logger.setLevel(logging.DEBUG)
 
-file_handler = logging.FileHandler("utils.log", encoding="utf-8")
-file_handler.setLevel(logging.DEBUG)
-
-file_formatter = logging.Formatter(
-    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
-file_handler.setFormatter(file_formatter)
-
-logger.addHandler(file_handler)
+# Запись в utils.log (путь можно задать в UTILS_LOG) идет в фоновом потоке через очередь
+file_handler = attach_file_log(logger, os.getenv("UTILS_LOG", "utils.log"), logging.DEBUG)
 load_dotenv()
 CURRENCY_API_KEY = os.getenv("CURRENCY_API_KEY")
 STOCKMARKET_API_KEY = os.getenv("STOCKMARKET_API_KEY")
 
 
+XLSX_COLUMNS = {
+    "Дата операции": "operation_date",
+    "Дата платежа": "payment_date",
+    "Статус": "state",
+    "Номер карты": "last_digits",
+    "Сумма операции": "amount_transaction",
+    "Валюта операции": "currency",
+    "Сумма платежа": "amount_transaction_rub",
+    "Валюта платежа": "account_currency",
+    "Кэшбэк": "cashback",
+    "Категория": "category",
+    "MCC": "transaction_code",
+    "Бонусы (включая кэшбэк)": "benefit",
+    "Округление на инвесткопилку": "amount_to_piggy",
+    "Описание": "description",
+    "Сумма операции с округлением": "amount_rounded",
+}
+
+# Значения для колонок, которых нет в файле, в порядке полей транзакции
+COLUMN_DEFAULTS = {
+    "operation_date": "",
+    "payment_date": "",
+    "state": "",
+    "last_digits": "",
+    "amount_transaction": 0,
+    "currency": "",
+    "amount_transaction_rub": 0,
+    "account_currency": "",
+    "cashback": 0,
+    "category": "",
+    "transaction_code": "",
+    "benefit": 0,
+    "amount_to_piggy": 0,
+    "description": "",
+    "amount_rounded": 0,
+}
+
+AMOUNT_COLUMNS = (
+    "amount_transaction",
+    "amount_transaction_rub",
+    "cashback",
+    "amount_to_piggy",
+    "amount_rounded",
+)
+
+# Поля транзакции, которые попадают в топ трат
+TOP_FIELDS = ("operation_date", "amount_transaction_rub", "category", "description")
+
+# Колонки типизированной таблицы, которых нет в словарях транзакций
+TYPED_COLUMNS = ["operation_dt"]
+
+
 def good_something(datetime_str: str) -> str:
     """
     :param datetime_str: строка с указанием времени
@@ -45,10 +102,10 @@ def good_something(datetime_str: str) -> str:
         else:
             greeting = "Доброй ночи!"
 
-        logger.info(f"Приветствие: {greeting} (на основе времени {datetime_str})")
+        logger.info("Приветствие: %s (на основе времени %s)", greeting, datetime_str)
         return greeting
     except ValueError as e:
-        logger.error(f"Ошибка обработки времени: {datetime_str} - {e}")
+        logger.error("Ошибка обработки времени: %s - %s", datetime_str, e)
         return "Ошибка в формате даты"
 
 
@@ -61,49 +118,130 @@ def find_all_cards(data: List[Dict[str, str | float]]) -> List[str | float]:
     cards = [transaction.get("last_digits", "") for transaction in data]
     unique_cards = list(set(cards))
 
-    logger.info(f"Найдено {len(unique_cards)} уникальных карт.")
+    logger.info("Найдено %s уникальных карт.", len(unique_cards))
     return unique_cards
 
 
 def count_stat_by_card(
-    data: List[Dict[str, Union[str, float]]],
+    data: Iterable[Dict[str, Union[str, float]]] | TransactionTable,
 ) -> List[Dict[str, Union[str, float]]]:
     """
     Считает количество трат и кэшбэка по каждой карте.
+
+    Данные проходятся один раз (см. src.aggregate), поэтому можно передать
+    генератор из iter_xlsx или TransactionTable.
     """
-    if not data:
+    stats = aggregate(data, key="card")
+    METRICS.inc("rows_scanned", sum(card_stats["count"] for card_stats in stats.values()),
+                function="count_stat_by_card")
+    if not stats:
         logger.warning("Передан пустой список транзакций.")
         return []
 
-    all_cards = find_all_cards(data)
-    results = []
-
-    for card in all_cards:
-        cashback = sum(
-            float(transaction.get("cashback", 0) or 0)
-            for transaction in data
-            if transaction["last_digits"] == card
-        )
-        total_spent = sum(
-            float(transaction.get("amount_transaction_rub", 0) or 0)
-            for transaction in data
-            if transaction.get("last_digits") == card
-            and float(transaction.get("amount_transaction_rub", 0) or 0) < 0
-        )
-
-        results.append(
-            {
-                "last_digits": card if card else "Другие карты",
-                "total_spent": round(-total_spent, 2),
-                "cashback": round(cashback, 2),
-            }
-        )
+    results = [
+        {
+            "last_digits": card if card else "Другие карты",
+            "total_spent": card_stats["spent"],
+            "cashback": card_stats["cashback"],
+        }
+        for card, card_stats in stats.items()
+    ]
 
-    logger.info(f"Рассчитана статистика по {len(results)} картам.")
+    logger.info("Рассчитана статистика по %s картам.", len(results))
     return results
 
 
-def find_top_5_transactions(data: List[Dict[str, str]]) -> List[Dict[str, str]]:
+def clean_top_transactions(
+    transactions: Iterable[Mapping], fields: Sequence[str] = TOP_FIELDS
+) -> List[Dict[str, str]]:
+    """Оставляет в топ-транзакциях нужные поля и переводит траты в положительные суммы."""
+    clean_result = [
+        {key: value for key, value in transaction.items() if key in fields}
+        for transaction in transactions
+    ]
+    for transaction in clean_result:
+        try:
+            if (
+                "amount_transaction_rub" in transaction
+                and float(transaction["amount_transaction_rub"]) < 0
+            ):
+                transaction["amount_transaction_rub"] = str(
+                    round(abs(float(transaction["amount_transaction_rub"])))
+                )
+        except (ValueError, TypeError):
+            pass
+    return clean_result
+
+
+def find_top_transactions(
+    data: Iterable[Dict[str, str]] | TransactionTable,
+    k: int = 5,
+    group_by: Optional[str | Callable] = None,
+    fields: Sequence[str] = TOP_FIELDS,
+) -> List[Dict[str, str]] | Dict[Any, List[Dict[str, str]]]:
+    """
+    Ищет K самых крупных трат — всего или отдельно в каждой группе — за один проход.
+
+    :param data: список или генератор транзакций либо TransactionTable
+    :param k: размер топа
+    :param group_by: ключ группировки ("card", "category", "month", имя поля или функция);
+        None — один общий топ
+    :param fields: поля транзакции, которые попадут в результат
+    :return: список транзакций или словарь {значение ключа: список транзакций}
+    """
+    try:
+        groups = top_k(data, k, key=group_by)
+        if hasattr(data, "__len__"):
+            METRICS.inc("rows_scanned", len(data), function="find_top_transactions")
+        logger.info("Топ-%s транзакций успешно найден.", k)
+    except (ValueError, KeyError) as e:
+        logger.error("Ошибка при поиске топ-%s транзакций: %s", k, e)
+        return [] if group_by is None else {}
+
+    top = {
+        group_key: clean_top_transactions((transaction for *_, transaction in entries), fields)
+        for group_key, entries in groups.items()
+    }
+    if group_by is None:
+        return top.get(None, [])
+    return top
+
+
+def find_top_transactions_with_groups(
+    data: Iterable[Dict[str, str]] | TransactionTable,
+    k: int = 5,
+    group_by: str | Callable = "card",
+    group_k: int = 3,
+    fields: Sequence[str] = TOP_FIELDS,
+) -> Tuple[List[Dict[str, str]], Dict[Any, List[Dict[str, str]]]]:
+    """
+    Общий топ-K и топы по группам за один проход.
+
+    Общий топ собирается из топов групп: каждая группа хранит max(k, group_k) трат,
+    поэтому в их объединении гарантированно есть K крупнейших.
+
+    :return: кортеж (общий топ-k, словарь {значение ключа: топ-group_k группы})
+    """
+    try:
+        groups = top_k(data, max(k, group_k), key=group_by)
+        if hasattr(data, "__len__"):
+            METRICS.inc("rows_scanned", len(data), function="find_top_transactions")
+    except (ValueError, KeyError) as e:
+        logger.error("Ошибка при поиске топ-%s транзакций: %s", k, e)
+        return [], {}
+
+    overall = heapq.nsmallest(k, chain.from_iterable(groups.values()), key=lambda entry: entry[:2])
+    logger.info("Топ-%s транзакций успешно найден.", k)
+    return (
+        clean_top_transactions((transaction for *_, transaction in overall), fields),
+        {
+            group_key: clean_top_transactions((transaction for *_, transaction in entries[:group_k]), fields)
+            for group_key, entries in groups.items()
+        },
+    )
+
+
+def find_top_5_transactions(data: List[Dict[str, str]] | TransactionTable) -> List[Dict[str, str]]:
     """
     Ищет 5 самых крупных транзакций
     """
@@ -111,155 +249,379 @@ def find_top_5_transactions(data: List[Dict[str, str]]) -> List[Dict[str, str]]:
         logger.warning("Передан пустой список транзакций.")
         return []
 
+    return find_top_transactions(data, 5)
+
+
+def normalize_transaction(transaction: Dict) -> Dict:
+    """
+    Переводит строку выгрузки с русскими заголовками во внутренний формат транзакции.
+
+    :param transaction: словарь с колонками Excel-файла
+    :return: словарь транзакции с внутренними ключами
+    """
+    return {
+        "operation_date": transaction.get("Дата операции", ""),
+        "payment_date": transaction.get("Дата платежа", ""),
+        "state": transaction.get("Статус", ""),
+        "last_digits": str(transaction.get("Номер карты", ""))[1:],
+        "amount_transaction": transaction.get("Сумма операции", 0),
+        "currency": transaction.get("Валюта операции", ""),
+        "amount_transaction_rub": transaction.get("Сумма платежа", 0),
+        "account_currency": transaction.get("Валюта платежа", ""),
+        "cashback": transaction.get("Кэшбэк", 0),
+        "category": transaction.get("Категория", ""),
+        "transaction_code": transaction.get("MCC", ""),
+        "benefit": int(transaction.get("Бонусы (включая кэшбэк)", 0)),  # Приводим к int
+        "amount_to_piggy": transaction.get("Округление на инвесткопилку", 0),
+        "description": transaction.get("Описание", ""),
+        "amount_rounded": transaction.get("Сумма операции с округлением", 0),
+    }
+
+
+def normalize_frame(df: DataFrame) -> Tuple[DataFrame, DataFrame]:
+    """
+    Колоночно нормализует DataFrame выгрузки.
+
+    Русские заголовки переименовываются во внутренние, типы приводятся по колонкам:
+    номер карты превращается в последние цифры, бонусы — в int64, суммы — в числа.
+    Дополнительная колонка operation_dt содержит дату операции в datetime64.
+    Строки, не прошедшие проверку, попадают в отдельный отчет с причиной отказа.
+
+    :param df: DataFrame с колонками Excel-файла
+    :return: кортеж (типизированная таблица транзакций, отклоненные строки)
+    """
+    df = df.fillna(0).rename(columns=XLSX_COLUMNS)
+    for column, default in COLUMN_DEFAULTS.items():
+        if column not in df.columns:
+            df[column] = default
+    df = df[list(COLUMN_DEFAULTS)].copy()
+
+    reasons = pd.Series("", index=df.index, dtype=object)
+    for column in ("benefit",) + AMOUNT_COLUMNS:
+        numeric = pd.to_numeric(df[column], errors="coerce")
+        invalid = numeric.isna() & (reasons == "")
+        reasons[invalid] = f"некорректное значение в колонке {column}"
+        df[column] = numeric
+
+    rejected_mask = reasons != ""
+    rejected = df[rejected_mask].assign(reason=reasons[rejected_mask])
+    df = df[~rejected_mask]
+
+    df["last_digits"] = df["last_digits"].astype(str).str[1:]
+    df["benefit"] = df["benefit"].astype("int64")
+    df["operation_dt"] = parse_operation_dates(df["operation_date"])
+    return df, rejected
+
+
+def frame_to_records(df: DataFrame) -> List[Dict]:
+    """Превращает типизированную таблицу в список словарей транзакций."""
+    return df.drop(columns=TYPED_COLUMNS, errors="ignore").to_dict(orient="records")
+
+
+@METRICS.timed("read_xlsx")
+def read_xlsx_frame(file_path: str | Path, use_cache: bool = False) -> Tuple[DataFrame, DataFrame]:
+    """
+    Читает Excel-файл в типизированную таблицу транзакций.
+
+    :param file_path: путь до файла xlsx
+    :param use_cache: читать книгу через колоночный снимок (см. src.cache)
+    :return: кортеж (таблица транзакций, отклоненные строки); при ошибке — пустые таблицы
+    """
+    if not os.path.exists(file_path):
+        logger.warning("Файл %s не найден. Возвращаем пустой список.", file_path)
+        return pd.DataFrame(), pd.DataFrame()
+
     try:
-        result = heapq.nsmallest(
-            5, data, key=lambda x: float(x.get("amount_transaction_rub", 0))
-        )
-        logger.info("Топ-5 транзакций успешно найден.")
-        wanted_keys = [
-            "operation_date",
-            "amount_transaction_rub",
-            "category",
-            "description",
-        ]
-        clean_result = [
-            {key: value for key, value in transaction.items() if key in wanted_keys}
-            for transaction in result
-        ]
-        for transaction in clean_result:
-            try:
-                if (
-                    "amount_transaction_rub" in transaction
-                    and float(transaction["amount_transaction_rub"]) < 0
-                ):
-                    transaction["amount_transaction_rub"] = str(
-                        round(abs(float(transaction["amount_transaction_rub"])))
-                    )
-            except (ValueError, TypeError):
-                pass
-        return clean_result
-    except (ValueError, KeyError) as e:
-        logger.error(f"Ошибка при поиске топ-5 транзакций: {e}")
-        return []
+        df = read_excel_cached(file_path) if use_cache else pd.read_excel(file_path)
+        if not set(XLSX_COLUMNS) & set(df.columns):
+            logger.warning("Файл %s не содержит списка транзакций.", file_path)
+            return pd.DataFrame(), pd.DataFrame()
+
+        table, rejected = normalize_frame(df)
+        METRICS.inc("rows_read", len(table))
+        METRICS.inc("rows_rejected", len(rejected))
+        if len(rejected):
+            logger.error("Ошибка обработки транзакций в файле %s: отклонено %s записей.", file_path, len(rejected))
+        logger.info("Файл %s успешно загружен. Найдено %s записей.", file_path, len(table))
+        return table, rejected
+    except Exception as e:
+        logger.error("Ошибка чтения файла %s: %s", file_path, e)
+        return pd.DataFrame(), pd.DataFrame()
 
 
-def read_xlsx(file_path: str | Path) -> List[Dict]:
+def read_xlsx(file_path: str | Path, use_cache: bool = False) -> List[Dict]:
     """
     Читает Excel-файл и возвращает список транзакций.
 
     :param file_path: путь до файла xlsx
+    :param use_cache: читать книгу через колоночный снимок (см. src.cache)
     :return: список со словарями транзакций
     """
-    if not os.path.exists(file_path):
-        logger.warning(f"Файл {file_path} не найден. Возвращаем пустой список.")
-        return []
+    table, _ = read_xlsx_frame(file_path, use_cache=use_cache)
+    return frame_to_records(table)
+
+
+def read_xlsx_table(file_path: str | Path, use_cache: bool = False) -> TransactionTable:
+    """
+    Читает Excel-файл в компактную колоночную таблицу транзакций.
+
+    :param file_path: путь до файла xlsx
+    :param use_cache: читать книгу через колоночный снимок (см. src.cache)
+    :return: TransactionTable (пустая, если файл не прочитан)
+    """
+    table, _ = read_xlsx_frame(file_path, use_cache=use_cache)
+    return TransactionTable.from_frame(table)
 
-    try:
-        df = pd.read_excel(file_path)
-        df.fillna(0, inplace=True)
-        data = df.to_dict(orient="records")
 
-        if not isinstance(data, list):
-            logger.warning(f"Файл {file_path} не содержит списка транзакций.")
-            return []
+def iter_xlsx(file_path: str | Path) -> Iterator[Dict]:
+    """
+    Построчно читает Excel-файл и по одной отдает нормализованные транзакции.
 
-        logger.info(f"Файл {file_path} успешно загружен. Найдено {len(data)} записей.")
+    В отличие от read_xlsx не держит в памяти весь файл: книга открывается
+    в режиме read-only, пустые ячейки заменяются на 0, как и в read_xlsx.
 
-        normalized_data = []
-        for transaction in data:
+    :param file_path: путь до файла xlsx
+    :return: генератор словарей транзакций
+    """
+    if not os.path.exists(file_path):
+        logger.warning("Файл %s не найден. Возвращаем пустой список.", file_path)
+        return
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            logger.warning("Файл %s не содержит списка транзакций.", file_path)
+            return
+
+        count = 0
+        row_errors = RepeatedWarnings(logger)
+        for row in rows:
+            transaction = {
+                column: 0 if value is None else value
+                for column, value in zip(header, row)
+            }
             try:
-                normalized_transaction = {
-                    "operation_date": transaction.get("Дата операции", ""),
-                    "payment_date": transaction.get("Дата платежа", ""),
-                    "state": transaction.get("Статус", ""),
-                    "last_digits": str(transaction.get("Номер карты", ""))[1:],
-                    "amount_transaction": transaction.get("Сумма операции", 0),
-                    "currency": transaction.get("Валюта операции", ""),
-                    "amount_transaction_rub": transaction.get("Сумма платежа", 0),
-                    "account_currency": transaction.get("Валюта платежа", ""),
-                    "cashback": transaction.get("Кэшбэк", 0),
-                    "category": transaction.get("Категория", ""),
-                    "transaction_code": transaction.get("MCC", ""),
-                    "benefit": int(
-                        transaction.get("Бонусы (включая кэшбэк)", 0)
-                    ),  # Приводим к int
-                    "amount_to_piggy": transaction.get(
-                        "Округление на инвесткопилку", 0
-                    ),
-                    "description": transaction.get("Описание", ""),
-                    "amount_rounded": transaction.get(
-                        "Сумма операции с округлением", 0
-                    ),
-                }
-                normalized_data.append(normalized_transaction)
+                normalized = normalize_transaction(transaction)
             except (ValueError, TypeError) as e:
-                logger.error(f"Ошибка обработки транзакции: {transaction}. Ошибка: {e}")
-                continue  # Пропускаем некорректные транзакции
+                row_errors.error("Ошибка обработки транзакции: %s. Ошибка: %s", transaction, e)
+                continue
+            count += 1
+            yield normalized
 
-        return normalized_data
-    except Exception as e:
-        logger.error(f"Ошибка чтения файла {file_path}: {e}")
-        return []
+        row_errors.flush()
+        logger.info("Файл %s прочитан построчно. Найдено %s записей.", file_path, count)
+    finally:
+        workbook.close()
+
+
+def iter_xlsx_batches(file_path: str | Path, batch_size: int = 1000) -> Iterator[List[Dict]]:
+    """
+    Читает Excel-файл пачками фиксированного размера.
+
+    :param file_path: путь до файла xlsx
+    :param batch_size: количество транзакций в одной пачке
+    :return: генератор списков транзакций
+    """
+    if batch_size < 1:
+        raise ValueError("Размер пачки должен быть положительным")
+
+    batch: List[Dict] = []
+    for transaction in iter_xlsx(file_path):
+        batch.append(transaction)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 def read_json(file_path: Path) -> Dict:
     """Читает JSON-файл настроек клиента."""
     if not os.path.exists(file_path):
-        logger.warning(f"Файл {file_path} не найден. Возвращаем пустой словарь.")
+        logger.warning("Файл %s не найден. Возвращаем пустой словарь.", file_path)
         return {}
     try:
         with open(file_path, "r", encoding="utf-8") as file:
             data = json.load(file)
             if not isinstance(data, dict):
-                logger.warning(f"Файл {file_path} содержит некорректные данные.")
+                logger.warning("Файл %s содержит некорректные данные.", file_path)
                 return {}
-            logger.info(f"Файл {file_path} успешно загружен.")
+            logger.info("Файл %s успешно загружен.", file_path)
             return data
     except json.JSONDecodeError as e:
-        logger.error(f"Ошибка декодирования JSON в файле {file_path}: {e}")
+        logger.error("Ошибка декодирования JSON в файле %s: %s", file_path, e)
         return {}
     except Exception as e:
-        logger.error(f"Ошибка чтения файла {file_path}: {e}")
+        logger.error("Ошибка чтения файла %s: %s", file_path, e)
         return {}
 
 
+# Время жизни котировки в кэше по источникам, секунды
+QUOTE_TTLS = {"currency": 3600, "stock": 900}
+# Сколько еще после TTL устаревшее значение отдается сразу (с обновлением в фоне), секунды
+QUOTE_MAX_STALE = 86400
+
+
+class QuoteCache:
+    """
+    Кэш котировок с временем жизни по источникам и схемой stale-while-revalidate.
+
+    Свежее значение отдается из кэша. Устаревшее (но не старше TTL + max_stale) тоже отдается
+    сразу, а в фоне запускается обновление. В остальных случаях котировка запрашивается
+    синхронно; если API вернул ошибку, отдается последнее известное значение.
+    Кэш потокобезопасен и может сохраняться в JSON-файл между запусками.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, max_stale: float = QUOTE_MAX_STALE,
+                 path: Optional[str | Path] = None, clock: Callable[[], float] = time.time) -> None:
+        self.ttls = dict(QUOTE_TTLS if ttls is None else ttls)
+        self.max_stale = max_stale
+        self.path = Path(path) if path else None
+        self.clock = clock
+        # ключ -> {"value": котировка, "fetched_at": время получения (unix)}
+        self.entries: Dict[str, Dict[str, float]] = {}
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0, "fallbacks": 0}
+        self._lock = threading.Lock()
+        self._refreshing: set = set()
+
+    def use_file(self, path: str | Path) -> None:
+        """Подключает файл для хранения кэша и загружает из него сохраненные котировки."""
+        self.path = Path(path)
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                entries = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error("Ошибка чтения кэша котировок %s: %s", self.path, e)
+            return
+        with self._lock:
+            self.entries.update(entries)
+        logger.info("Кэш котировок %s загружен: %s котировок.", self.path, len(entries))
+
+    def _save(self) -> None:
+        """Сохраняет кэш в файл (если он подключен)."""
+        if self.path is None:
+            return
+        with self._lock:
+            entries = dict(self.entries)
+        tmp_path = self.path.with_name(f"{self.path.name}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(entries, file, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error("Ошибка записи кэша котировок %s: %s", self.path, e)
+
+    def clear(self) -> None:
+        """Удаляет все котировки и сбрасывает счетчики."""
+        with self._lock:
+            self.entries.clear()
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def _fetch(self, key: str, fetch: Callable[[], float | None]) -> float | None:
+        """Запрашивает котировку и запоминает ее, если API ответил."""
+        METRICS.inc("api_calls", source=key.split(":", 1)[0])
+        with METRICS.span("quote.api"):
+            value = fetch()
+        with self._lock:
+            if value is None:
+                self.stats["errors"] += 1
+                return None
+            self.entries[key] = {"value": value, "fetched_at": self.clock()}
+        self._save()
+        return value
+
+    def _refresh(self, key: str, fetch: Callable[[], float | None]) -> None:
+        try:
+            self._fetch(key, fetch)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, source: str, key: str, fetch: Callable[[], float | None]) -> float | None:
+        """
+        Котировка из кэша или из API.
+
+        :param source: источник ("currency" или "stock") — определяет TTL
+        :param key: ключ котировки
+        :param fetch: функция без аргументов, запрашивающая котировку (None — ошибка API)
+        :return: котировка или None, если ее нет ни в API, ни в кэше
+        """
+        key = f"{source}:{key}"
+        ttl = self.ttls.get(source, 0)
+        with self._lock:
+            entry = self.entries.get(key)
+            age = self.clock() - entry["fetched_at"] if entry else None
+            if entry and age <= ttl:
+                self.stats["hits"] += 1
+                return entry["value"]
+            if entry and age <= ttl + self.max_stale:
+                self.stats["stale_hits"] += 1
+                start_refresh = key not in self._refreshing
+                if start_refresh:
+                    self._refreshing.add(key)
+                    self.stats["refreshes"] += 1
+            else:
+                self.stats["misses"] += 1
+                start_refresh = None
+
+        if start_refresh is not None:
+            if start_refresh:
+                threading.Thread(target=self._refresh, args=(key, fetch), daemon=True).start()
+            return entry["value"]
+
+        value = self._fetch(key, fetch)
+        if value is None and entry:
+            logger.warning("API не ответил, используется последнее известное значение %s", key)
+            with self._lock:
+                self.stats["fallbacks"] += 1
+            return entry["value"]
+        return value
+
+    def metrics(self) -> Dict[str, Any]:
+        """Счетчики кэша, число котировок и их возраст в секундах."""
+        now = self.clock()
+        with self._lock:
+            ages = {key: round(now - entry["fetched_at"], 3) for key, entry in self.entries.items()}
+            return {**self.stats, "entries": len(ages), "ages": ages, "max_age": max(ages.values(), default=0.0)}
+
+
+QUOTES = QuoteCache()
+METRICS.register_stats("quote_cache", lambda: QUOTES.stats)
+
+# Источник котировок: HTTP API или, при QUOTE_PROVIDER=offline, фикстура из QUOTE_FIXTURES
+_quote_provider: QuoteProvider = provider_from_env(CURRENCY_API_KEY, STOCKMARKET_API_KEY)
+
+
+def quote_provider() -> QuoteProvider:
+    """Текущий источник котировок."""
+    return _quote_provider
+
+
+def use_quote_provider(provider: QuoteProvider) -> None:
+    """Переключает источник котировок; кэш QUOTES очищается, чтобы не смешивать котировки источников."""
+    global _quote_provider
+    _quote_provider = provider
+    QUOTES.clear()
+
+
 def find_exchange_rate(
     currency_from: str, amount: float = 1, currency_to: str = "RUB"
 ) -> float | None:
-    """Конвертирует сумму из одной валюты в рубли через API."""
+    """Конвертирует сумму из одной валюты в рубли через API (с кэшем QUOTES)."""
     if currency_from == currency_to:
         return amount
-    url = f"https://api.apilayer.com/exchangerates_data/convert?to={currency_to}&from={currency_from}&amount={amount}"
-    url = f"https://api.apilayer.com/exchangerates_data/convert?to={currency_to}&from={currency_from}&amount={amount}"
-    headers = {"apikey": CURRENCY_API_KEY}
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        result = data.get("result")
-        if result is not None:
-            return float(result)
-        else:
-            logger.warning("Ошибка API: отсутствует ключ 'result'")
-            return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка при запросе API: {e}")
-        return None
+    return QUOTES.get(
+        "currency",
+        f"{currency_from}:{currency_to}:{amount}",
+        lambda: _quote_provider.exchange_rate(currency_from, amount, currency_to),
+    )
 
 
 def find_stockmarket_rate(stock_from: str) -> float | None:
-    """Получает курс акции."""
-    url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={stock_from}&apikey={STOCKMARKET_API_KEY}"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        price_str = data.get("Global Quote", {}).get("05. price")
-        if price_str:
-            return float(price_str)
-        else:
-            logger.warning(f"Ошибка API: не найден ключ '05. price' для {stock_from}")
-            return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Ошибка при запросе API: {e}")
-        return None
+    """Получает курс акции (с кэшем QUOTES)."""
+    return QUOTES.get("stock", stock_from, lambda: _quote_provider.stock_price(stock_from))
@@ -1,33 +1,161 @@
-import json
+import contextvars
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
+from src.incremental import AggregateStore
+from src.logs import configure_console_logging
+from src.metrics import METRICS
+from src.serialize import dumps
+from src.table import DateIndex, TransactionTable
 from src.utils import (count_stat_by_card, find_exchange_rate,
                        find_stockmarket_rate, find_top_5_transactions,
-                       good_something, read_json)
+                       find_top_transactions,
+                       find_top_transactions_with_groups, good_something,
+                       read_json)
 
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+configure_console_logging(logging.INFO)
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 MAIN_DIR = SCRIPT_DIR.parent
 SETTINGS_PATH = MAIN_DIR / "user_settings.json"
 
+# Общий срок на получение всех котировок, секунды (можно задать в настройках как "quotes_deadline")
+QUOTES_DEADLINE = 8.0
+QUOTES_MAX_WORKERS = 8
 
-def web_page(current_time: str, data: List[Dict[str, Any]]) -> str:
+# Индексы дат списков транзакций: id списка -> (список, индекс); хранятся для нескольких последних списков
+LIST_INDEXES_MAX = 4
+_list_indexes: Dict[int, Tuple[List[Dict[str, Any]], DateIndex]] = {}
+_list_indexes_lock = threading.Lock()
+
+# Вид котировки -> сообщения лога: получена, ошибка, не успела к сроку
+QUOTE_MESSAGES = {
+    "currency": (
+        "Получен курс валюты %s: %s",
+        "Ошибка при получении курса для валюты %s: %s",
+        "Курс валюты %s не получен за %s с, значение отсутствует.",
+    ),
+    "stock": (
+        "Получена цена акции %s: %s",
+        "Ошибка при получении цены для акции %s: %s",
+        "Цена акции %s не получена за %s с, значение отсутствует.",
+    ),
+}
+
+
+def list_date_index(data: List[Dict[str, Any]]) -> DateIndex:
+    """
+    Индекс дат списка транзакций, построенный один раз на загруженный список.
+
+    Индекс переиспользуется, пока передается тот же объект списка той же длины: как и
+    TransactionTable, список считается неизменным после загрузки (добавление строк
+    перестраивает индекс, правка дат внутри словарей — нет).
+    """
+    with _list_indexes_lock:
+        cached = _list_indexes.get(id(data))
+    if cached is not None and cached[0] is data and len(cached[1].source) == len(data):
+        return cached[1]
+
+    index = DateIndex.from_records(data)
+    with _list_indexes_lock:
+        _list_indexes.pop(id(data), None)
+        while len(_list_indexes) >= LIST_INDEXES_MAX:
+            del _list_indexes[next(iter(_list_indexes))]
+        _list_indexes[id(data)] = (data, index)
+    return index
+
+
+def _month_to_date(
+    data: List[Dict[str, Any]] | TransactionTable, moment: datetime
+) -> List[Dict[str, Any]] | TransactionTable:
+    """Транзакции с начала месяца moment до самого moment (через индекс дат)."""
+    if isinstance(data, TransactionTable):
+        return data.take(data.date_index.month_to_date(moment))
+    return [data[position] for position in list_date_index(data).month_to_date(moment)]
+
+
+def _timed_quote(kind: str, name: str, fetch: Any) -> Any:
+    with METRICS.span(f"quote.{kind}", detail=name):
+        return fetch(name)
+
+
+def _fetch_quotes(
+    currencies: List[str], stocks: List[str], deadline: float
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Запрашивает курсы валют и цены акций параллельно в пуле потоков.
+
+    Ответы, не пришедшие за deadline секунд, считаются отсутствующими (значение None),
+    котировки с ошибкой пропускаются. Порядок соответствует порядку в настройках.
+
+    :return: (currency_rates, stocks_prices) в формате ответа web_page
+    """
+    tasks = [("currency", currency, find_exchange_rate) for currency in currencies]
+    tasks += [("stock", stock, find_stockmarket_rate) for stock in stocks]
+    if not tasks:
+        return [], []
+
+    executor = ThreadPoolExecutor(max_workers=min(len(tasks), QUOTES_MAX_WORKERS), thread_name_prefix="quotes")
+    # Контекст копируется, чтобы время каждой котировки попало в разбивку запроса
+    futures = [
+        executor.submit(contextvars.copy_context().run, _timed_quote, kind, name, fetch) for kind, name, fetch in tasks
+    ]
+    wait(futures, timeout=deadline)
+    # Не дожидаемся опоздавших запросов: их ограничивает таймаут самого запроса
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    currency_rates: List[Dict[str, Any]] = []
+    stocks_prices: List[Dict[str, Any]] = []
+    for (kind, name, _), future in zip(tasks, futures):
+        received, failed, missing = QUOTE_MESSAGES[kind]
+        if not future.done() or future.cancelled():
+            logging.warning(missing, name, deadline)
+            METRICS.inc("quote_timeouts", kind=kind)
+            value = None
+        elif future.exception() is not None:
+            logging.error(failed, name, future.exception())
+            METRICS.inc("quote_errors", kind=kind)
+            continue
+        else:
+            value = future.result()
+            logging.info(received, name, value)
+
+        if kind == "currency":
+            currency_rates.append({"currency": name, "rate": value})
+        else:
+            stocks_prices.append({"stock": name, "price": value})
+    return currency_rates, stocks_prices
+
+
+@METRICS.timed("web_page")
+def web_page(
+    current_time: str,
+    data: List[Dict[str, Any]] | TransactionTable,
+    store: Optional[AggregateStore] = None,
+) -> str:
     """
     Формирует JSON-ответ для фронтенда, содержащий информацию о картах, курсах валют, акциях и транзакциях.
 
-    :param current_time: Текущее время в строковом формате.
-    :param data: Список транзакций, представленный в виде списка словарей.
+    Статистика по картам и топ транзакций считаются за период с начала месяца
+    до current_time. Если в настройках пользователя задан "top_per_card", в ответ добавляется
+    топ трат по каждой карте (top_transactions_by_card), рассчитанный в том же проходе.
+
+    :param current_time: Текущее время в формате ГГГГ-ММ-ДД ЧЧ:ММ:СС.
+    :param data: Список транзакций, представленный в виде списка словарей, или TransactionTable.
+    :param store: Опциональное хранилище инкрементальных агрегатов. Если передано, статистика
+        по картам и топ транзакций берутся из месячных агрегатов после досчета новых строк
+        (когда в месяце нет операций позже current_time).
     :return: JSON-строка с данными для отображения на веб-странице.
     """
     logging.info("Вызвана функция web_page с текущим временем: %s", current_time)
 
     try:
-        user_settings = read_json(SETTINGS_PATH)
+        with METRICS.span("web_page.settings"):
+            user_settings = read_json(SETTINGS_PATH)
         logging.info("Загружены настройки пользователя.")
     except Exception as e:
         logging.error("Ошибка при загрузке настроек пользователя: %s", e)
@@ -35,37 +163,67 @@ def web_page(current_time: str, data: List[Dict[str, Any]]) -> str:
 
     user_currencies = user_settings.get("user_currencies", [])
     logging.info("Получены валюты пользователя: %s", user_currencies)
-
-    currency_rates = []
-    for currency in user_currencies:
-        try:
-            rate = find_exchange_rate(currency)
-            currency_rates.append({"currency": currency, "rate": rate})
-            logging.info("Получен курс валюты %s: %s", currency, rate)
-        except Exception as e:
-            logging.error("Ошибка при получении курса для валюты %s: %s", currency, e)
-
     user_stocks = user_settings.get("user_stocks", [])
     logging.info("Получены акции пользователя: %s", user_stocks)
 
-    stocks_prices = []
-    for stock in user_stocks:
-        try:
-            price = find_stockmarket_rate(stock)
-            stocks_prices.append({"stock": stock, "price": price})
-            logging.info("Получена цена акции %s: %s", stock, price)
-        except Exception as e:
-            logging.error("Ошибка при получении цены для акции %s: %s", stock, e)
+    deadline = float(user_settings.get("quotes_deadline", QUOTES_DEADLINE))
+    with METRICS.span("web_page.quotes"):
+        currency_rates, stocks_prices = _fetch_quotes(user_currencies, user_stocks, deadline)
+
+    top_per_card = int(user_settings.get("top_per_card", 0) or 0)
+    top_by_card = None
+
+    try:
+        moment = datetime.strptime(current_time, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        logging.warning("Некорректное время %s, используются все транзакции.", current_time)
+        moment = None
 
     try:
+        if store is not None:
+            with METRICS.span("web_page.store_refresh"):
+                store.refresh(data)
+        use_store = store is not None and (moment is None or store.covers(moment))
+
+        window = data
+        if moment is not None and (not use_store or top_per_card):
+            with METRICS.span("web_page.window"):
+                window = _month_to_date(data, moment)
+            logging.info("Выбрано %s транзакций с начала месяца.", len(window))
+
+        if use_store:
+            month = moment.strftime("%Y-%m") if moment else None
+            with METRICS.span("web_page.cards"):
+                cards = store.card_stats(month)
+            with METRICS.span("web_page.top"):
+                top_transactions = store.top_transactions(month)
+                if top_per_card:
+                    top_by_card = find_top_transactions(window, top_per_card, group_by="card")
+        else:
+            with METRICS.span("web_page.cards"):
+                cards = count_stat_by_card(window)
+            with METRICS.span("web_page.top"):
+                if top_per_card:
+                    top_transactions, top_by_card = find_top_transactions_with_groups(
+                        window, 5, group_by="card", group_k=top_per_card
+                    )
+                else:
+                    top_transactions = find_top_5_transactions(window)
+
         response = {
             "greeting": good_something(current_time),
-            "cards": count_stat_by_card(data),
-            "top_transactions": find_top_5_transactions(data),
+            "cards": cards,
+            "top_transactions": top_transactions,
             "currency_rates": currency_rates,
             "stocks_prices": stocks_prices,
         }
-        response_json = json.dumps(response, indent=4, ensure_ascii=False)
+        if top_by_card is not None:
+            response["top_transactions_by_card"] = [
+                {"last_digits": card if card else "Другие карты", "top_transactions": top}
+                for card, top in top_by_card.items()
+            ]
+        with METRICS.span("web_page.json"):
+            response_json = dumps(response, indent=4)
         logging.info("Сформирован ответ для фронтенда.")
         return response_json
     except Exception as e:
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Лог src.utils пишется во временный каталог, а не в корень репозитория
+os.environ.setdefault("UTILS_LOG", os.path.join(tempfile.mkdtemp(prefix="utils-log-"), "utils.log"))
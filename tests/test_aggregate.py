@@ -0,0 +1,94 @@
+import pandas as pd
+import pytest
+
+from src.aggregate import aggregate, top_k
+from src.table import TransactionTable
+
+
+@pytest.fixture
+def transactions():
+    return [
+        {"operation_date": "31.12.2021 16:44:00", "last_digits": "7197", "category": "Супермаркеты",
+         "currency": "RUB", "transaction_code": 5411.0, "amount_transaction_rub": -160.89, "cashback": 1.0},
+        {"operation_date": "30.12.2021 10:00:00", "last_digits": "7197", "category": "Пополнения",
+         "currency": "RUB", "transaction_code": 0.0, "amount_transaction_rub": 5000.0, "cashback": 0.0},
+        {"operation_date": "15.11.2021 12:00:00", "last_digits": "5091", "category": "Супермаркеты",
+         "currency": "USD", "transaction_code": 5411.0, "amount_transaction_rub": -64.0, "cashback": 0.5},
+        {"operation_date": "14.11.2021 12:00:00", "last_digits": "7197", "category": "Супермаркеты",
+         "currency": "RUB", "transaction_code": 5411.0, "amount_transaction_rub": -39.11, "cashback": 0.0},
+    ]
+
+
+def test_aggregate_by_card(transactions):
+    result = aggregate(transactions, "card")
+
+    assert list(result) == ["7197", "5091"]
+    assert result["7197"] == {
+        "count": 3,
+        "spent": 200.0,
+        "spent_count": 2,
+        "cashback": 1.0,
+        "min_amount": -160.89,
+        "max_amount": 5000.0,
+        "avg_amount": 1600.0,
+        "avg_spent": 100.0,
+    }
+
+
+@pytest.mark.parametrize("key", ["card", "category", "mcc", "currency", "month"])
+def test_table_matches_records(transactions, key):
+    table = TransactionTable.from_records(transactions)
+
+    assert aggregate(table, key) == aggregate(transactions, key)
+
+
+def test_aggregate_by_month(transactions):
+    result = aggregate(transactions, "month")
+
+    assert list(result) == ["2021-12", "2021-11"]
+    assert result["2021-11"]["spent"] == 103.11
+
+
+def test_aggregate_by_function_and_frame(transactions):
+    by_sign = aggregate(transactions, lambda t: t["amount_transaction_rub"] < 0)
+    assert by_sign[True]["count"] == 3
+
+    frame = pd.DataFrame(transactions)
+    assert aggregate(frame, "category") == aggregate(transactions, "category")
+
+
+def test_aggregate_empty():
+    assert aggregate([], "card") == {}
+    assert aggregate(TransactionTable.from_records([]), "card") == {}
+
+
+def test_top_k_groups(transactions):
+    result = top_k(transactions, 2, key="card")
+
+    assert list(result) == ["7197", "5091"]
+    assert [amount for amount, _, _ in result["7197"]] == [-160.89, -39.11]
+    assert [position for _, position, _ in result["5091"]] == [2]
+
+
+@pytest.mark.parametrize("key", [None, "card", "category", "month"])
+def test_top_k_table_matches_records(transactions, key):
+    table = TransactionTable.from_records(transactions)
+    expected = top_k(transactions, 2, key=key)
+    result = top_k(table, 2, key=key)
+
+    assert list(result) == list(expected)
+    for group_key, entries in expected.items():
+        assert [entry[:2] for entry in result[group_key]] == [entry[:2] for entry in entries]
+
+
+def test_top_k_ties_keep_row_order():
+    transactions = [{"amount_transaction_rub": amount} for amount in (-20.0, -5.0, -20.0, -20.0)]
+
+    assert [position for _, position, _ in top_k(transactions, 2)[None]] == [0, 2]
+    table = TransactionTable.from_records(transactions)
+    assert [position for _, position, _ in top_k(table, 2)[None]] == [0, 2]
+
+
+def test_top_k_invalid_size(transactions):
+    with pytest.raises(ValueError):
+        top_k(transactions, 0)
@@ -0,0 +1,99 @@
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from src.batch import main, run_batch
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "operations.xlsx"
+    pd.DataFrame(
+        {
+            "Дата операции": ["01.12.2021 12:00:00", "02.12.2021 12:00:00", "03.12.2021 12:00:00"],
+            "Номер карты": ["*7197", "*7197", "*5091"],
+            "Сумма платежа": [-100.0, -200.0, -50.0],
+            "Сумма операции": [-100.0, -200.0, -50.0],
+            "Категория": ["Супермаркеты", "Супермаркеты", "Каршеринг"],
+            "Описание": ["Магнит", "Пятерочка", "Ситидрайв"],
+        }
+    ).to_excel(path, index=False)
+    return path
+
+
+QUERIES = [
+    {"id": "q1", "service": "search", "args": {"key_word": "магнит"}},
+    {"service": "spending", "args": {"category": "Супермаркеты", "date": "2021-12-31"}},
+    {"service": "web_page", "args": {"current_time": "2021-12-03 20:00:00"}},
+    {"service": "unknown"},
+    {"service": "search", "args": {"word": "магнит"}},
+]
+
+
+def lines(queries):
+    return [json.dumps(query, ensure_ascii=False) + "\n" for query in queries] + ["\n", "{not json\n"]
+
+
+@patch("src.views.read_json", return_value={"user_currencies": [], "user_stocks": []})
+def test_run_batch(mock_read_json, workbook):
+    out = io.StringIO()
+    summary = run_batch(workbook, lines(QUERIES), out)
+
+    outputs = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [output["line"] for output in outputs] == [1, 2, 3, 4, 5, 7]
+    assert [output["status"] for output in outputs] == ["ok", "ok", "ok", "error", "error", "error"]
+    assert outputs[0]["id"] == "q1"
+    assert [transaction["description"] for transaction in outputs[0]["result"]] == ["Магнит"]
+    assert [row["description"] for row in outputs[1]["result"]] == ["Магнит", "Пятерочка"]
+    assert outputs[2]["result"]["cards"][0]["last_digits"] == "7197"
+    assert "Неизвестный сервис" in outputs[3]["error"]
+    assert all(output["seconds"] >= 0 for output in outputs)
+
+    assert summary["queries"] == 6
+    assert summary["errors"] == 3
+    assert summary["services"]["search"]["count"] == 2
+
+
+def test_run_batch_in_processes(workbook):
+    queries = [{"service": "search", "args": {"key_word": word}} for word in ["магнит", "пятерочка", "сити"] * 3]
+    sequential, parallel = io.StringIO(), io.StringIO()
+
+    run_batch(workbook, lines(queries)[:-2], sequential)
+    with patch("src.batch.ProcessPoolExecutor", wraps=ProcessPoolExecutor) as pool:
+        summary = run_batch(workbook, lines(queries)[:-2], parallel, workers=2)
+    # Без fork: в процессе уже работают фоновые потоки логирования
+    assert pool.call_args.kwargs["mp_context"].get_start_method() == "spawn"
+
+    def by_line(text):
+        outputs = sorted((json.loads(line) for line in text.splitlines()), key=lambda output: output["line"])
+        return [(output["line"], output["result"]) for output in outputs]
+
+    assert by_line(parallel.getvalue()) == by_line(sequential.getvalue())
+    assert summary["queries"] == 9 and summary["errors"] == 0
+
+
+def test_run_batch_timings(workbook):
+    queries = [{"service": "search", "args": {"key_word": word}} for word in ["магнит", "сити"]]
+    out = io.StringIO()
+    run_batch(workbook, lines(queries)[:-2], out, workers=2, timings=True)
+
+    for output in map(json.loads, out.getvalue().splitlines()):
+        assert [entry["stage"] for entry in output["timings"]] == ["search"]
+
+
+def test_main_writes_output_file(workbook, tmp_path, capsys):
+    queries = tmp_path / "queries.jsonl"
+    queries.write_text("".join(lines(QUERIES[:1])[:1]), encoding="utf-8")
+    results = tmp_path / "results.jsonl"
+
+    metrics = tmp_path / "metrics.prom"
+
+    main([str(queries), "-o", str(results), "--file", str(workbook), "--metrics", str(metrics)])
+
+    assert json.loads(results.read_text(encoding="utf-8"))["status"] == "ok"
+    assert 'transactions_query_seconds_count{service="search"}' in metrics.read_text(encoding="utf-8")
+    assert json.loads(capsys.readouterr().err)["queries"] == 1
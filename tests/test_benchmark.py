@@ -0,0 +1,52 @@
+import json
+
+from src import benchmark
+from src.benchmark import compare, main, measure, run_suite
+
+
+def suite_results(seconds, peak_mb=10.0, calibration=0.05):
+    return {"calibration_seconds": calibration, "results": {"search": {"seconds": seconds, "peak_mb": peak_mb}}}
+
+
+def test_measure():
+    result = measure(lambda: [0] * 100_000, repeat=2)
+    assert result["seconds"] >= 0
+    assert result["peak_mb"] > 0.5
+
+
+def test_compare_detects_regressions():
+    baseline = suite_results(0.1)
+    assert compare(suite_results(0.12), baseline) == []
+    assert len(compare(suite_results(0.3), baseline)) == 1
+    assert len(compare(suite_results(0.1, peak_mb=20.0), baseline)) == 1
+    # Медленная машина: калибровка вдвое дольше — время вдвое больше не регрессия
+    assert compare(suite_results(0.2, calibration=0.1), baseline) == []
+    # Замеры без базовой линии не сравниваются
+    assert compare({"results": {"new": {"seconds": 5.0, "peak_mb": 1.0}}}, baseline) == []
+
+
+def test_run_suite(tmp_path):
+    names = ["read_xlsx_table", "search_transactions_by_keyword", "spending_by_category", "web_page"]
+    results = run_suite(300, tmp_path, repeat=1, names=names)
+    assert set(results["results"]) == set(names)
+    assert results["rows"] == 300
+    # Отчет по категории пишется в рабочий каталог, а не в текущий
+    assert (tmp_path / "report_spending_by_category.json").exists()
+
+
+def test_main_baseline_and_regression(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, "SCALES", {"10k": 200})
+    arguments = ["--repeat", "1", "--only", "count_stat_by_card", "--workdir", str(tmp_path / "data"),
+                 "--baselines", str(tmp_path)]
+
+    assert main(arguments) == 0
+    path = tmp_path / "baseline_10k.json"
+    baseline = json.loads(path.read_text(encoding="utf-8"))
+    assert "count_stat_by_card" in baseline["results"]
+
+    baseline["results"]["count_stat_by_card"] = {"seconds": 0.0, "peak_mb": 0.0}
+    baseline["calibration_seconds"] = None
+    path.write_text(json.dumps(baseline), encoding="utf-8")
+    monkeypatch.setattr(benchmark, "MIN_TIME_DELTA", -1)
+    monkeypatch.setattr(benchmark, "MIN_MEMORY_DELTA_MB", -1)
+    assert main(arguments) == 1
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.cache import (cache_stats, cache_status, load_snapshot, purge_cache,
+                       read_excel_cached, rebuild_cache, snapshot_path)
+from src.utils import read_xlsx
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    # Небольшая книга с теми же заголовками, что и выгрузка банка
+    df = pd.DataFrame(
+        {
+            "Дата операции": ["31.12.2021 16:44:00", "30.12.2021 10:00:00"],
+            "Номер карты": ["*7197", np.nan],
+            "Сумма платежа": [-160.89, 5000.0],
+            "Категория": ["Супермаркеты", "Пополнения"],
+            "MCC": [5411.0, np.nan],
+            "Бонусы (включая кэшбэк)": [3, 0],
+        }
+    )
+    path = tmp_path / "operations.xlsx"
+    df.to_excel(path, index=False)
+    return path
+
+
+def test_first_read_writes_snapshot(workbook):
+    assert cache_status(workbook) == "missing"
+    df = read_excel_cached(workbook)
+
+    assert snapshot_path(workbook).exists()
+    assert cache_status(workbook) == "hit"
+    pd.testing.assert_frame_equal(load_snapshot(workbook), df)
+
+
+def test_second_read_is_hit(workbook):
+    read_excel_cached(workbook)
+    before = cache_stats()
+    read_excel_cached(workbook)
+    after = cache_stats()
+
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
+
+
+def test_stale_snapshot_is_rebuilt(workbook):
+    read_excel_cached(workbook)
+    pd.DataFrame({"Категория": ["Другое"]}).to_excel(workbook, index=False)
+
+    assert cache_status(workbook) == "stale"
+    df = read_excel_cached(workbook)
+    assert list(df.columns) == ["Категория"]
+    assert cache_status(workbook) == "hit"
+
+
+def test_rebuild_and_purge(workbook):
+    rebuild_cache(workbook)
+    assert cache_status(workbook) == "hit"
+
+    assert purge_cache(workbook) is True
+    assert cache_status(workbook) == "missing"
+    assert purge_cache(workbook) is False
+
+
+def test_read_xlsx_same_records_with_cache(workbook):
+    expected = read_xlsx(workbook)
+    assert read_xlsx(workbook, use_cache=True) == expected
+    assert read_xlsx(workbook, use_cache=True) == expected
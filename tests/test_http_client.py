@@ -0,0 +1,191 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src.http_client import (CircuitBreaker, CircuitOpenError, HttpClient,
+                             RateLimitedError, RateLimiter)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.paths.append(self.path)
+        server.connections.add(self.client_address)
+        status, headers = server.responses.pop(0) if server.responses else (200, {})
+        body = b'{"ok": true}'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    """Локальный HTTP-сервер: отвечает статусами из server.responses, затем 200."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.responses = []
+    server.paths = []
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_client(clock, **kwargs):
+    kwargs.setdefault("rate_limits", {})
+    return HttpClient(timeout=(1, 1), clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def url(server, path="/quote"):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def test_get_reuses_connection(stub, clock):
+    client = make_client(clock)
+    for _ in range(3):
+        assert client.get(url(stub)).json() == {"ok": True}
+    assert len(stub.paths) == 3
+    # Keep-alive: все запросы прошли по одному соединению
+    assert len(stub.connections) == 1
+    client.close()
+
+
+def test_retries_5xx_and_429_with_backoff(stub, clock):
+    stub.responses = [(503, {}), (429, {"Retry-After": "1.5"})]
+    client = make_client(clock, max_retries=2, backoff_base=0.5)
+
+    response = client.get(url(stub))
+
+    assert response.status_code == 200
+    assert len(stub.paths) == 3
+    assert client.stats["retries"] == 2
+    assert 0 <= clock.sleeps[0] <= 0.5
+    assert clock.sleeps[1] == 1.5
+
+
+def test_retries_exhausted_returns_last_response(stub, clock):
+    stub.responses = [(500, {})] * 3
+    client = make_client(clock, max_retries=2)
+    response = client.get(url(stub))
+    assert response.status_code == 500
+    with pytest.raises(requests.exceptions.HTTPError):
+        response.raise_for_status()
+
+
+def test_client_errors_are_not_retried(stub, clock):
+    stub.responses = [(404, {})]
+    client = make_client(clock)
+    assert client.get(url(stub)).status_code == 404
+    assert len(stub.paths) == 1
+
+
+def test_circuit_breaker_fails_fast(stub, clock):
+    stub.responses = [(503, {})] * 2
+    client = make_client(clock, max_retries=0, breaker_threshold=2, breaker_reset=30)
+
+    client.get(url(stub))
+    client.get(url(stub))
+    with pytest.raises(CircuitOpenError):
+        client.get(url(stub))
+    assert len(stub.paths) == 2
+    assert client.stats["rejected"] == 1
+
+    # После паузы пробный запрос проходит и замыкает автомат
+    clock.now += 30
+    assert client.get(url(stub)).status_code == 200
+    assert client.breaker(f"127.0.0.1:{stub.server_address[1]}").state == "closed"
+
+
+def test_connection_error_opens_breaker(clock):
+    client = make_client(clock, max_retries=1, breaker_threshold=1)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.get("http://127.0.0.1:9/quote")
+    assert client.stats["requests"] == 2
+    with pytest.raises(CircuitOpenError):
+        client.get("http://127.0.0.1:9/quote")
+
+
+@pytest.mark.parametrize("error", [requests.exceptions.ChunkedEncodingError, KeyboardInterrupt])
+def test_other_errors_during_trial_do_not_block_breaker(stub, clock, monkeypatch, error):
+    client = make_client(clock, max_retries=0, breaker_threshold=1, breaker_reset=30)
+    stub.responses = [(503, {})]
+    client.get(url(stub))
+    clock.now += 30
+
+    get = client.session.get
+
+    def failing_get(*args, **kwargs):
+        raise error("обрыв ответа")
+
+    monkeypatch.setattr(client.session, "get", failing_get)
+    with pytest.raises(error):
+        client.get(url(stub))
+
+    # Пробный вызов не остается занятым: после паузы (или сразу, если запрос не ушел) хост снова пробуется
+    monkeypatch.setattr(client.session, "get", get)
+    clock.now += 30
+    assert client.get(url(stub)).status_code == 200
+    assert client.breaker(f"127.0.0.1:{stub.server_address[1]}").state == "closed"
+
+
+def test_rate_limit(stub, clock):
+    host = f"127.0.0.1:{stub.server_address[1]}"
+    client = make_client(clock, rate_limits={host: (2, 10.0)})
+
+    client.get(url(stub))
+    client.get(url(stub))
+    # Следующий маркер появится через 5 секунд — дольше допустимого ожидания
+    with pytest.raises(RateLimitedError):
+        client.get(url(stub))
+    assert len(stub.paths) == 2
+
+    clock.now += 5
+    assert client.get(url(stub)).status_code == 200
+
+
+def test_rate_limiter_waits_for_token(clock):
+    limiter = RateLimiter(1, 1.0, max_wait=2.0, clock=clock, sleep=clock.sleep)
+    assert limiter.acquire()
+    assert limiter.acquire()
+    assert clock.sleeps == [1.0]
+
+
+def test_half_open_allows_single_trial(clock):
+    breaker = CircuitBreaker(threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert not breaker.allow()
+    clock.now += 10
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
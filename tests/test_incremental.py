@@ -0,0 +1,152 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from src import incremental
+from src.incremental import AggregateStore
+from src.table import TransactionTable
+from src.utils import count_stat_by_card, find_top_5_transactions
+
+
+def make_transaction(day, card, amount, cashback=0.0):
+    return {
+        "operation_date": f"{day:02d}.12.2021 12:00:00",
+        "last_digits": card,
+        "amount_transaction_rub": amount,
+        "cashback": cashback,
+        "category": "Супермаркеты",
+        "description": f"Покупка {day}",
+    }
+
+
+@pytest.fixture
+def history():
+    return [
+        make_transaction(1, "7197", -100.5, 1.0),
+        make_transaction(2, "5091", -20.0),
+        make_transaction(3, "7197", 3000.0),
+        make_transaction(4, "", -700.0),
+        make_transaction(5, "5091", -20.0, 0.5),
+        make_transaction(6, "7197", -55.55),
+        make_transaction(7, "7197", -1.0),
+    ]
+
+
+def test_store_matches_full_recompute(history):
+    store = AggregateStore()
+    store.apply(history)
+
+    assert store.card_stats() == count_stat_by_card(history)
+    assert store.top_transactions() == find_top_5_transactions(history)
+    assert store.verify(history)
+
+
+def test_refresh_applies_only_delta(history, tmp_path):
+    path = tmp_path / "aggregates.json"
+    store = AggregateStore(path=path)
+    assert store.refresh(history[:4]) == 4
+
+    reloaded = AggregateStore.load(path)
+    assert reloaded.rows == 4
+    assert reloaded.refresh(history) == 3
+    assert reloaded.refresh(history) == 0
+    assert reloaded.verify(history)
+    assert json.loads(path.read_text(encoding="utf-8"))["rows"] == 7
+
+
+def test_refresh_rebuilds_when_history_changes(history):
+    store = AggregateStore()
+    store.refresh(history)
+
+    # Новая строка в начале выгрузки сдвигает уже учтенные строки
+    changed = [make_transaction(8, "7197", -5000.0)] + history
+    assert store.refresh(changed) == len(changed)
+    assert store.verify(changed)
+
+
+def test_refresh_detects_changes_before_last_row(history, tmp_path):
+    path = tmp_path / "aggregates.json"
+    AggregateStore(path=path).refresh(history[:4])
+
+    # Последняя учтенная строка та же, изменилась сумма в первой
+    changed = [make_transaction(1, "7197", -999.0)] + history[1:]
+    store = AggregateStore.load(path)
+    assert store.refresh(changed) == len(changed)
+    assert store.verify(changed)
+
+
+def test_refresh_same_data_is_not_rechecked(history, monkeypatch):
+    table = TransactionTable.from_records(history)
+    store = AggregateStore()
+    store.refresh(table)
+
+    monkeypatch.setattr(incremental, "prefix_digest", lambda *args: pytest.fail("префикс сверяется повторно"))
+    assert store.refresh(table) == 0
+
+
+def test_refresh_checks_only_sampled_rows(tmp_path, monkeypatch):
+    history = [make_transaction(day % 28 + 1, "7197", -float(day)) for day in range(1000)]
+    path = tmp_path / "aggregates.json"
+    AggregateStore(path=path).refresh(history[:990])
+
+    calls = []
+    digest = incremental.transaction_digest
+
+    def counting_digest(transaction):
+        calls.append(1)
+        return digest(transaction)
+
+    monkeypatch.setattr(incremental, "transaction_digest", counting_digest)
+    reloaded = AggregateStore.load(path)
+    assert reloaded.refresh(history) == 10
+    # Выборка до дельты и после нее, а не вся история
+    assert len(calls) <= 4 * incremental.PREFIX_CHECK_ROWS
+    assert reloaded.verify(history)
+
+
+def test_refresh_skips_check_for_unchanged_source(history, tmp_path, monkeypatch):
+    source = tmp_path / "operations.xlsx"
+    source.write_bytes(b"1234")
+    path = tmp_path / "aggregates.json"
+    AggregateStore(path=path).refresh(history, source=source)
+
+    def fail(*args):
+        pytest.fail("история сверяется, хотя файл не менялся")
+
+    monkeypatch.setattr(incremental, "prefix_digest", fail)
+    assert AggregateStore.load(path).refresh(history, source=source) == 0
+
+    # Дописанный файл сверяется по выборке строк
+    monkeypatch.undo()
+    source.write_bytes(b"123456")
+    changed = history + [make_transaction(8, "5091", -1.0)]
+    assert AggregateStore.load(path).refresh(changed, source=source) == 1
+
+
+def test_refresh_table(history):
+    table = TransactionTable.from_records(history)
+    store = AggregateStore()
+    store.refresh(table)
+
+    assert store.verify(table)
+
+
+def test_month_partitions(history):
+    november = dict(make_transaction(1, "7197", -10000.0), operation_date="30.11.2021 12:00:00")
+    store = AggregateStore(k=2)
+    store.apply(history + [november])
+
+    assert store.card_stats("2021-11") == [{"last_digits": "7197", "total_spent": 10000.0, "cashback": 0.0}]
+    assert [t["amount_transaction_rub"] for t in store.top_transactions("2021-12")] == ["700", "100"]
+    assert [t["amount_transaction_rub"] for t in store.top_transactions()] == ["10000", "700"]
+    assert store.card_stats("2020-01") == []
+
+
+def test_covers_month_to_date(history):
+    store = AggregateStore()
+    store.apply(history)
+
+    assert store.covers(datetime(2021, 12, 7, 12))
+    assert not store.covers(datetime(2021, 12, 6, 12))
+    assert store.covers(datetime(2022, 1, 1))
@@ -0,0 +1,53 @@
+import logging
+import queue
+
+from src.logs import (REPEATED_LIMIT, NonBlockingQueueHandler, RepeatedWarnings, attach_file_log,
+                      flush_logging)
+
+
+def test_file_log_is_written_in_background(tmp_path):
+    logger = logging.getLogger("test_logs.file")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    path = tmp_path / "test.log"
+    handler = attach_file_log(logger, path, logging.INFO)
+    try:
+        logger.debug("Не попадает в файл: %s", 1)
+        logger.info("Загружено %s транзакций", 10)
+        flush_logging()
+    finally:
+        logger.removeHandler(handler)
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    assert lines[0].endswith("test_logs.file - INFO - Загружено 10 транзакций")
+
+
+def test_queue_handler_does_not_block_when_full():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    transaction = {"description": "Магнит"}
+    record = logging.LogRecord("test", logging.WARNING, __file__, 1, "Транзакция: %s", (transaction,), None)
+
+    handler.emit(record)
+    handler.emit(record)
+
+    assert handler.dropped == 1
+    queued = handler.queue.get_nowait()
+    # Аргументы подставлены в момент вызова: позднее изменение объекта не попадает в лог
+    transaction["description"] = "Пятерочка"
+    assert queued.getMessage() == "Транзакция: {'description': 'Магнит'}"
+
+
+def test_repeated_warnings(caplog):
+    warnings = RepeatedWarnings(logging.getLogger("test_logs.repeated"))
+    with caplog.at_level(logging.WARNING):
+        for number in range(50):
+            warnings.warning("Пропущена строка %s", number)
+        warnings.error("Ошибка в строке %s", 1)
+        warnings.flush()
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages[:REPEATED_LIMIT] == [f"Пропущена строка {number}" for number in range(REPEATED_LIMIT)]
+    assert messages[-1] == f"Еще {50 - REPEATED_LIMIT} сообщений вида 'Пропущена строка %s' не записано (всего 50)"
+    assert len(messages) == REPEATED_LIMIT + 2
+    assert warnings.counts == {}
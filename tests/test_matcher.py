@@ -0,0 +1,25 @@
+import pytest
+
+from src.matcher import AhoCorasick
+
+
+@pytest.mark.parametrize(
+    "patterns, text, expected",
+    [
+        (["he", "she", "his", "hers"], "ushers", {0, 1, 3}),
+        (["магнит", "МАГ", "пят"], "Кафе Магнит", {0, 1}),
+        (["ёлка", "a.b"], "ЁЛКА и axb", {0}),
+        (["a.b", "(x)"], "a.b (x)", {0, 1}),
+        (["abc"], "", set()),
+        (["aa"], "aaaa", {0}),
+    ],
+)
+def test_find(patterns, text, expected):
+    assert AhoCorasick(patterns).find(text) == expected
+
+
+def test_find_matches_naive_search():
+    patterns = ["ab", "bab", "b", "abba", "cab", "bc"]
+    automaton = AhoCorasick(patterns)
+    for text in ["abbabcab", "cabba", "bbbb", "xyz"]:
+        assert automaton.find(text) == {i for i, pattern in enumerate(patterns) if pattern in text}
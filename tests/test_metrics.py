@@ -0,0 +1,85 @@
+import contextvars
+import threading
+
+from src.metrics import Metrics, server_timing
+
+
+def test_counters_and_histograms():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.inc("rows_scanned", 10, function="search")
+    metrics.inc("rows_scanned", 5, function="search")
+    metrics.observe("stage_seconds", 0.05, stage="read")
+    metrics.observe("stage_seconds", 0.5, stage="read")
+    metrics.observe("stage_seconds", 5.0, stage="read")
+
+    text = metrics.render_prometheus()
+    assert "# TYPE transactions_rows_scanned_total counter" in text
+    assert 'transactions_rows_scanned_total{function="search"} 15' in text
+    assert 'transactions_stage_seconds_bucket{stage="read",le="0.1"} 1' in text
+    assert 'transactions_stage_seconds_bucket{stage="read",le="1.0"} 2' in text
+    assert 'transactions_stage_seconds_bucket{stage="read",le="+Inf"} 3' in text
+    assert 'transactions_stage_seconds_count{stage="read"} 3' in text
+    assert metrics.snapshot()["histograms"]['stage_seconds{stage="read"}'] == {"count": 3, "sum": 5.55}
+
+
+def test_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.inc("requests", route='a"b\\c')
+    assert 'transactions_requests_total{route="a\\"b\\\\c"} 1' in metrics.render_prometheus()
+
+
+def test_span_and_breakdown():
+    metrics = Metrics()
+
+    @metrics.timed("outer")
+    def work():
+        with metrics.span("inner", detail="USD"):
+            pass
+        # Поток с копией контекста пишет в разбивку того же запроса
+        thread = threading.Thread(target=contextvars.copy_context().run, args=(inner_in_thread,))
+        thread.start()
+        thread.join()
+
+    def inner_in_thread():
+        with metrics.span("thread"):
+            pass
+
+    with metrics.collect() as breakdown:
+        work()
+    work()
+
+    assert [entry["stage"] for entry in breakdown] == ["inner", "thread", "outer"]
+    assert breakdown[0]["detail"] == "USD"
+    assert metrics.snapshot()["histograms"]['stage_seconds{stage="outer"}']["count"] == 2
+    assert server_timing(breakdown).startswith("inner;dur=")
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    with metrics.collect() as breakdown:
+        with metrics.span("stage") as span:
+            pass
+        metrics.inc("rows", 10)
+    assert span.seconds == 0.0
+    assert breakdown == []
+    assert metrics.snapshot() == {"counters": {}, "histograms": {}}
+
+    metrics.enable()
+    metrics.inc("rows")
+    assert metrics.snapshot()["counters"] == {"rows": 1}
+    metrics.reset()
+    assert metrics.snapshot()["counters"] == {}
+
+
+def test_registered_stats_and_file(tmp_path):
+    metrics = Metrics()
+    stats = {"hits": 2, "misses": 1}
+    metrics.register_stats("quote_cache", lambda: stats)
+    metrics.register_stats("broken", lambda: 1 / 0)
+    path = tmp_path / "metrics.prom"
+
+    metrics.write_prometheus(path)
+
+    text = path.read_text(encoding="utf-8")
+    assert 'transactions_quote_cache_total{kind="hits"} 2' in text
+    assert "broken" not in text
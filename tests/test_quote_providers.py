@@ -0,0 +1,116 @@
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.http_client import HttpClient
+from src.quote_providers import (HttpQuoteProvider, OfflineQuoteProvider,
+                                 QuoteProvider, StubQuoteServer,
+                                 provider_from_env)
+from src.rates import RateTable
+from src.utils import (find_exchange_rate, find_stockmarket_rate,
+                       quote_provider, use_quote_provider)
+from src.views import web_page
+
+FIXTURES = {
+    "base": "RUB",
+    "currency": {"USD": 75.0, "EUR": 80.0},
+    "stock": {"AAPL": 150.5, "TSLA": 1007.08},
+    "history": {"2021-12-30": {"USD": 74.0}},
+}
+
+
+@pytest.fixture
+def provider():
+    """Подменяет источник котировок и возвращает прежний после теста."""
+    previous = quote_provider()
+    yield use_quote_provider
+    use_quote_provider(previous)
+
+
+@pytest.fixture
+def stub():
+    with StubQuoteServer(FIXTURES) as server:
+        yield server
+
+
+def test_offline_provider():
+    offline = OfflineQuoteProvider(FIXTURES)
+    assert offline.exchange_rate("USD", 2, "RUB") == 150.0
+    assert offline.exchange_rate("EUR", 1, "USD") == pytest.approx(80.0 / 75.0)
+    assert offline.exchange_rate("GBP", 1, "RUB") is None
+    assert offline.stock_price("AAPL") == 150.5
+    assert offline.stock_price("AMZN") is None
+    assert offline.rate_table(["USD", "EUR"], "latest", "RUB") == {"USD": 1 / 75.0, "EUR": 1 / 80.0}
+    assert offline.rate_table(["USD"], "2021-12-30", "RUB") == {"USD": 1 / 74.0}
+
+
+def test_stub_server_matches_offline(stub):
+    http = stub.provider()
+    offline = OfflineQuoteProvider(FIXTURES)
+    assert http.exchange_rate("USD", 3, "RUB") == offline.exchange_rate("USD", 3, "RUB")
+    assert http.stock_price("TSLA") == offline.stock_price("TSLA")
+    day = "2021-12-30"
+    assert http.rate_table(["USD", "EUR"], day, "RUB") == offline.rate_table(["USD", "EUR"], day, "RUB")
+    assert http.stock_price("AMZN") is None
+    assert stub.requests == 4
+
+
+def test_stub_server_errors():
+    with StubQuoteServer(FIXTURES, error_rate=1.0) as server:
+        http = server.provider(HttpClient(max_retries=0, rate_limits={}))
+        assert http.stock_price("AAPL") is None
+        assert server.requests == 1
+
+
+def test_stub_server_latency_and_concurrency():
+    with StubQuoteServer(FIXTURES, latency=0.05, max_concurrency=1) as server:
+        http = server.provider()
+        started = time.perf_counter()
+        assert http.stock_price("AAPL") == 150.5
+        assert time.perf_counter() - started >= 0.05
+
+
+def test_find_functions_use_provider(provider):
+    provider(OfflineQuoteProvider(FIXTURES))
+    assert find_exchange_rate("USD") == 75.0
+    assert find_stockmarket_rate("AAPL") == 150.5
+
+
+def test_rate_table_uses_provider(provider):
+    provider(OfflineQuoteProvider(FIXTURES))
+    rates = RateTable()
+    assert rates.convert(10.0, "USD", "2021-12-30") == pytest.approx(740.0)
+    assert rates.convert(10.0, "USD") == pytest.approx(750.0)
+
+
+@patch("src.views.read_json")
+def test_web_page_against_stub(mock_read_json, stub, provider):
+    mock_read_json.return_value = {"user_currencies": ["USD", "EUR"], "user_stocks": ["AAPL", "TSLA"]}
+    provider(stub.provider())
+
+    result = json.loads(web_page("2021-12-31 12:00:00", []))
+
+    assert result["currency_rates"] == [{"currency": "USD", "rate": 75.0}, {"currency": "EUR", "rate": 80.0}]
+    assert result["stocks_prices"] == [{"stock": "AAPL", "price": 150.5}, {"stock": "TSLA", "price": 1007.08}]
+    assert stub.requests == 4
+
+
+def test_provider_from_env(tmp_path, monkeypatch):
+    path = tmp_path / "quotes.json"
+    path.write_text(json.dumps(FIXTURES), encoding="utf-8")
+    monkeypatch.setenv("QUOTE_PROVIDER", "offline")
+    monkeypatch.setenv("QUOTE_FIXTURES", str(path))
+    assert isinstance(provider_from_env(), OfflineQuoteProvider)
+
+    monkeypatch.setenv("QUOTE_FIXTURES", str(tmp_path / "missing.json"))
+    assert isinstance(provider_from_env(), HttpQuoteProvider)
+
+    monkeypatch.delenv("QUOTE_PROVIDER")
+    assert isinstance(provider_from_env(), HttpQuoteProvider)
+
+
+def test_base_provider_is_abstract():
+    with pytest.raises(TypeError):
+        QuoteProvider()
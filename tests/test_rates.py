@@ -0,0 +1,151 @@
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from src.rates import RateTable, convert_amounts, fetch_rate_table
+from src.table import TransactionTable
+
+RATES = {
+    "2021-12-30": {"USD": 0.0135, "EUR": 0.012},
+    "2021-12-31": {"USD": 0.0136, "EUR": 0.0125},
+    "latest": {"USD": 0.0125, "EUR": 0.01},
+}
+
+
+def fake_fetch(symbols, day, base):
+    return {symbol: RATES[day][symbol] for symbol in symbols}
+
+
+@pytest.fixture
+def transactions():
+    return [
+        {"operation_date": "30.12.2021 10:00:00", "currency": "RUB", "amount_transaction": -100.0},
+        {"operation_date": "30.12.2021 12:00:00", "currency": "USD", "amount_transaction": -10.0},
+        {"operation_date": "31.12.2021 09:00:00", "currency": "EUR", "amount_transaction": -5.0},
+        {"operation_date": "31.12.2021 18:00:00", "currency": "USD", "amount_transaction": 2.0},
+        {"operation_date": "30.12.2021 20:00:00", "currency": "EUR", "amount_transaction": -1.0},
+    ]
+
+
+def expected_rub(transactions):
+    result = []
+    for transaction in transactions:
+        if transaction["currency"] == "RUB":
+            result.append(transaction["amount_transaction"])
+            continue
+        day, month, year = transaction["operation_date"][:10].split(".")
+        rate = RATES[f"{year}-{month}-{day}"][transaction["currency"]]
+        result.append(transaction["amount_transaction"] / rate)
+    return result
+
+
+def test_convert_amounts_one_request_per_day(transactions):
+    with patch("src.rates.fetch_rate_table", side_effect=fake_fetch) as mock_fetch:
+        result = convert_amounts(transactions, RateTable())
+
+    assert np.allclose(result, expected_rub(transactions))
+    assert mock_fetch.call_count == 2
+    days = sorted(call.args[1] for call in mock_fetch.call_args_list)
+    assert days == ["2021-12-30", "2021-12-31"]
+    assert all(set(call.args[0]) == {"USD", "EUR"} for call in mock_fetch.call_args_list)
+
+
+def test_convert_amounts_table_and_frame_match(transactions):
+    with patch("src.rates.fetch_rate_table", side_effect=fake_fetch):
+        rates = RateTable()
+        from_list = convert_amounts(transactions, rates)
+        from_table = convert_amounts(TransactionTable.from_records(transactions), rates)
+        from_frame = convert_amounts(pd.DataFrame(transactions), rates)
+
+    assert np.allclose(from_table, from_list)
+    assert np.allclose(from_frame, from_list)
+
+
+def test_convert_amounts_mixed_date_formats(transactions):
+    # Даты в разных форматах разбираются так же, как в остальных модулях (parse_operation_dates)
+    transactions[3]["operation_date"] = "2021-12-31"
+    transactions[4]["operation_date"] = "30.12.2021"
+    with patch("src.rates.fetch_rate_table", side_effect=fake_fetch):
+        rates = RateTable()
+        result = convert_amounts(transactions, rates)
+        from_table = convert_amounts(TransactionTable.from_records(transactions), rates)
+
+    assert not np.isnan(result).any()
+    assert np.allclose(result, from_table)
+
+
+def test_known_rates_are_not_requested_again(transactions):
+    with patch("src.rates.fetch_rate_table", side_effect=fake_fetch) as mock_fetch:
+        rates = RateTable()
+        convert_amounts(transactions, rates)
+        convert_amounts(transactions, rates)
+    assert mock_fetch.call_count == 2
+    assert rates.requests == 2
+
+
+def test_latest_rates(transactions):
+    with patch("src.rates.fetch_rate_table", side_effect=fake_fetch) as mock_fetch:
+        result = convert_amounts(transactions, RateTable(), historical=False)
+
+    mock_fetch.assert_called_once()
+    assert mock_fetch.call_args.args[1] == "latest"
+    assert result[1] == pytest.approx(-10.0 / 0.0125)
+    assert result[0] == -100.0
+
+
+def test_missing_rate_is_nan(transactions):
+    with patch("src.rates.fetch_rate_table", return_value=None):
+        result = convert_amounts(transactions, RateTable())
+    assert result[0] == -100.0
+    assert np.isnan(result[1:]).all()
+
+
+def test_convert_single_amount():
+    with patch("src.rates.fetch_rate_table", side_effect=fake_fetch):
+        rates = RateTable()
+        assert rates.convert(10.0, "USD", "2021-12-30") == pytest.approx(10.0 / 0.0135)
+        assert rates.convert(10.0, "RUB", "2021-12-30") == 10.0
+
+
+def test_save_and_load(transactions, tmp_path):
+    path = tmp_path / "rates.json"
+    with patch("src.rates.fetch_rate_table", side_effect=fake_fetch):
+        rates = RateTable(path=path)
+        convert_amounts(transactions, rates)
+        rates.ensure(["USD"])
+    rates.save()
+
+    loaded = RateTable.load(path)
+    assert loaded.rate("USD", "2021-12-31") == 0.0136
+    # Текущие курсы не сохраняются
+    assert loaded.rate("USD") is None
+    with patch("src.rates.fetch_rate_table") as mock_fetch:
+        convert_amounts(transactions, loaded)
+    mock_fetch.assert_not_called()
+
+
+def test_load_corrupt_file(tmp_path):
+    path = tmp_path / "rates.json"
+    path.write_text("{", encoding="utf-8")
+    assert RateTable.load(path).rates == {}
+
+
+@patch("src.quote_providers.HTTP.get")
+def test_fetch_rate_table(mock_get):
+    mock_get.return_value = Mock(json=Mock(return_value={"base": "RUB", "rates": {"USD": 0.0135, "EUR": 0.012}}))
+    assert fetch_rate_table(["USD", "EUR"], "2021-12-30") == {"USD": 0.0135, "EUR": 0.012}
+    url = mock_get.call_args.args[0]
+    assert "/2021-12-30?base=RUB&symbols=EUR,USD" in url
+
+
+@patch("src.quote_providers.HTTP.get")
+def test_fetch_rate_table_errors(mock_get):
+    mock_get.side_effect = requests.exceptions.ConnectionError("нет сети")
+    assert fetch_rate_table(["USD"]) is None
+
+    mock_get.side_effect = None
+    mock_get.return_value = Mock(json=Mock(return_value={"error": "bad key"}))
+    assert fetch_rate_table(["USD"]) is None
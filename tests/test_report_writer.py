@@ -0,0 +1,126 @@
+import csv
+import json
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from src.report_writer import (BackgroundWriter, background_writer,
+                               content_hash, register_report_format,
+                               write_report)
+from src.reports import save_report
+
+
+@pytest.fixture
+def report():
+    return pd.DataFrame(
+        {
+            "operation_date": ["2021-12-30", "2021-12-31"],
+            "category": ["Супермаркеты", "Каршеринг"],
+            "amount_transaction_rub": [-100.5, float("nan")],
+            "bonuses": [1, 2],
+        }
+    )
+
+
+def test_json_matches_records_dump(report, tmp_path):
+    path = tmp_path / "report.json"
+    assert write_report(report, path)
+    expected = json.dumps(report.to_dict(orient="records"), ensure_ascii=False, indent=4)
+    assert path.read_text(encoding="utf-8") == expected
+
+
+def test_text_formats(report, tmp_path):
+    write_report(report, tmp_path / "compact.json", "json_compact")
+    assert "\n" not in (tmp_path / "compact.json").read_text(encoding="utf-8")
+
+    write_report(report, tmp_path / "report.jsonl", "jsonl")
+    lines = (tmp_path / "report.jsonl").read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[0])["category"] == "Супермаркеты"
+    assert len(lines) == 2
+
+    write_report(report, tmp_path / "report.csv", "csv")
+    with open(tmp_path / "report.csv", encoding="utf-8") as file:
+        rows = list(csv.DictReader(file))
+    assert rows[1]["category"] == "Каршеринг"
+
+
+def test_parquet(report, tmp_path):
+    pytest.importorskip("pyarrow")
+    write_report(report, tmp_path / "report.parquet", "parquet")
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "report.parquet"), report)
+
+
+def test_custom_format(report, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    register_report_format("tsv", lambda df, path: df.to_csv(path, sep="\t", index=False), ".tsv")
+
+    @save_report(fmt="tsv")
+    def make_report():
+        return report
+
+    with patch("src.reports.write_report", wraps=write_report) as mock_write:
+        make_report()
+    assert str(mock_write.call_args.args[1]) == "report_make_report.tsv"
+    assert mock_write.call_args.args[2] == "tsv"
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        save_report(fmt="xml")
+
+
+def test_skip_unchanged(report, tmp_path):
+    path = tmp_path / "report.json"
+
+    @save_report(str(path))
+    def make_report(df):
+        return df
+
+    with patch("src.reports.write_report", wraps=write_report) as mock_write:
+        make_report(report)
+        make_report(report.copy())
+        assert mock_write.call_count == 1
+
+        changed = report.copy()
+        changed.loc[0, "amount_transaction_rub"] = -1
+        make_report(changed)
+        assert mock_write.call_count == 2
+
+        path.unlink()
+        make_report(changed)
+        assert mock_write.call_count == 3
+
+
+def test_content_hash(report):
+    assert content_hash(report, "json") == content_hash(report.copy(), "json")
+    assert content_hash(report, "json") != content_hash(report, "csv")
+    assert content_hash(pd.DataFrame({"a": [[1], [2]]}), "json") is None
+
+
+def test_background_writer(report, tmp_path):
+    writer = BackgroundWriter(max_pending=1)
+    for i in range(3):
+        writer.submit(report, tmp_path / f"report_{i}.json", "json")
+    writer.flush()
+    assert all((tmp_path / f"report_{i}.json").exists() for i in range(3))
+    writer.close()
+    with pytest.raises(RuntimeError):
+        writer.submit(report, tmp_path / "late.json")
+
+
+def test_save_report_background(report, tmp_path):
+    path = tmp_path / "report.jsonl"
+
+    @save_report(str(path), fmt="jsonl", background=True)
+    def make_report():
+        return report.copy()
+
+    result = make_report()
+    result.loc[0, "category"] = "Изменено после возврата"
+    background_writer().flush()
+    assert "Супермаркеты" in path.read_text(encoding="utf-8")
+
+    with patch("src.reports.background_writer") as mock_writer:
+        make_report()
+    mock_writer.assert_not_called()
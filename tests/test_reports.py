@@ -1,9 +1,18 @@
 from datetime import datetime
 
+import pandas as pd
 import pytest
 
-from src.reports import \
-    spending_by_category  # Убедись, что импортируешь из правильного модуля
+from src.reports import (  # Убедись, что импортируешь из правильного модуля
+    rolling_spending, spending_by_category, spending_report)
+from src.table import FIELDS, TransactionTable
+
+
+@pytest.fixture(autouse=True)
+def report_dir(tmp_path, monkeypatch):
+    # save_report пишет отчет в текущий каталог
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
 
 
 @pytest.fixture
@@ -29,6 +38,25 @@ def test_spending_by_category(mock_transactions):
     assert result["amount"].sum() == 80  # 50 + 30
 
 
+# Тест: Проверка работы с генератором транзакций
+def test_spending_by_category_from_generator(mock_transactions):
+    result = spending_by_category(
+        (transaction for transaction in mock_transactions), "Food", "2025-03-20"
+    )
+
+    assert len(result) == 2
+
+
+# Тест: Проверка работы с типизированной таблицей из read_xlsx_frame
+def test_spending_by_category_from_typed_frame(mock_transactions):
+    df = pd.DataFrame(mock_transactions)
+    df["operation_dt"] = pd.to_datetime(df["operation_date"])
+    result = spending_by_category(df, "Food", "2025-03-20")
+
+    assert len(result) == 2
+    assert "operation_dt" not in result.columns
+
+
 # Тест: Проверка фильтрации с использованием даты по умолчанию
 def test_spending_by_category_default_date(mock_transactions):
     today = datetime.today().strftime("%Y-%m-%d")
@@ -56,3 +84,111 @@ def test_spending_by_category_date_filter(mock_transactions):
     assert (
         len(result) == 2
     )  # 2 транзакции с категорией "Food", которые в пределах 3 месяцев
+
+
+# Тест: Отчет сразу по всем категориям
+def test_spending_report_all_categories(mock_transactions):
+    report = spending_report(mock_transactions, "2025-03-20", amount_field="amount")
+
+    assert report.categories() == ["Food", "Transport", "Entertainment"]
+    assert report.summary.loc["Food", "count"] == 2
+    assert report.summary.loc["Food", "total"] == 80
+    assert len(report.rows) == 4
+    assert list(report.category("Transport")["amount"]) == [20]
+    assert report.category("NonExistentCategory").empty
+
+
+# Тест: Период задается длиной и последней датой
+def test_spending_report_window(mock_transactions):
+    report = spending_report(mock_transactions, "2025-03-20", days=30, end="2025-03-15", amount_field="amount")
+
+    assert list(report.rows["operation_date"]) == ["2025-03-10"]
+    assert report.categories() == ["Food"]
+
+
+# Тест: Граница периода сравнивается по датам, строки без даты отбрасываются
+def test_spending_report_window_bounds():
+    transactions = [
+        {"operation_date": "19.12.2021 00:00:00", "category": "Food", "amount": 1},
+        {"operation_date": "18.12.2021 23:59:59", "category": "Food", "amount": 2},
+        {"operation_date": "", "category": "Food", "amount": 3},
+        {"operation_date": "20.12.2021 23:59:59", "category": "Food", "amount": 4},
+        {"operation_date": "21.12.2021 00:00:00", "category": "Food", "amount": 5},
+    ]
+    for data in (transactions, TransactionTable.from_records(transactions)):
+        report = spending_report(data, "2021-12-20", days=1, end="2021-12-20", amount_field="amount")
+        assert list(report.rows["operation_date"]) == ["2021-12-19", "2021-12-20"]
+
+
+# Тест: Срез отчета совпадает с отчетом по одной категории для всех видов входных данных
+def test_spending_by_category_is_report_view(mock_transactions):
+    transactions = [
+        {"operation_date": "10.03.2025 12:00:00", "category": "Food", "amount_transaction_rub": -30.0},
+        {"operation_date": "20.03.2025 12:00:00", "category": "Entertainment", "amount_transaction_rub": -100.0},
+        {"operation_date": "15.01.2025 12:00:00", "category": "Food", "amount_transaction_rub": -50.0},
+        {"operation_date": "10.10.2024 12:00:00", "category": "Food", "amount_transaction_rub": -5.0},
+    ]
+    table = TransactionTable.from_records(transactions)
+    for data in (transactions, table, table.to_frame()):
+        report = spending_report(data, "2025-03-20")
+        assert report.summary.loc["Food", "total"] == -80
+        single = spending_by_category(data, "Food", "2025-03-20")
+        pd.testing.assert_frame_equal(single, report.category("Food"))
+        # Индекс — номера строк во входных данных, как у pd.DataFrame(transactions)
+        assert list(single.index) == [0, 2]
+
+
+# Тест: Пустой период сохраняет колонки входных данных без служебных
+def test_spending_by_category_empty_window_keeps_schema():
+    transactions = [
+        {"operation_date": "10.03.2025 12:00:00", "category": "Food", "amount_transaction_rub": -30.0},
+        {"operation_date": "15.01.2025 12:00:00", "category": "Food", "amount_transaction_rub": -50.0},
+    ]
+    table = TransactionTable.from_records(transactions)
+    for data, columns in ((transactions, list(transactions[0])), (table, list(FIELDS))):
+        for category, date in (("Нет такой", "2025-03-20"), ("Food", "2030-01-01")):
+            result = spending_by_category(data, category, date)
+            assert result.empty
+            assert list(result.columns) == columns
+
+
+# Тест: Скользящие суммы по категориям за каждый день
+def test_rolling_spending(mock_transactions):
+    result = rolling_spending(mock_transactions, days=30, amount_field="amount")
+
+    assert list(result.columns) == ["Food", "Transport", "Entertainment"]
+    assert result.index[0] == pd.Timestamp("2025-01-15")
+    assert result.index[-1] == pd.Timestamp("2025-03-20")
+    assert len(result) == 65
+    assert result.loc["2025-01-15", "Food"] == 50
+    assert result.loc["2025-02-14", "Food"] == 50
+    assert result.loc["2025-02-15", "Food"] == 0
+    assert result.loc["2025-03-12", "Transport"] == 20
+    assert result.loc["2025-03-20", "Food"] == 30
+    assert result.loc["2025-03-20", "Entertainment"] == 100
+
+
+# Тест: Скользящие суммы совпадают с отчетом за окно, заканчивающееся этим днем
+def test_rolling_spending_matches_report():
+    transactions = [
+        {"operation_date": f"{day:02d}.0{month}.2025 12:00:00", "category": category,
+         "amount_transaction_rub": -float(day * month)}
+        for month in (1, 2, 3)
+        for day in (1, 9, 17, 25)
+        for category in (["Food", "Cafe"] if day % 2 else ["Food"])
+    ]
+    table = TransactionTable.from_records(transactions)
+    window = {"days": 20, "start": "2025-02-01", "end": "2025-03-31"}
+    result = rolling_spending(table, **window)
+    pd.testing.assert_frame_equal(result, rolling_spending(transactions, **window))
+
+    for day in ["2025-02-01", "2025-02-20", "2025-03-17", "2025-03-31"]:
+        report = spending_report(table, day, days=20, end=day)
+        for category in result.columns:
+            expected = report.summary["total"].get(category, 0)
+            assert result.loc[day, category] == pytest.approx(expected)
+
+
+# Тест: Пустые данные
+def test_rolling_spending_empty():
+    assert rolling_spending([]).empty
@@ -0,0 +1,154 @@
+import pandas as pd
+import pytest
+
+from src import result_cache
+from src.reports import spending_by_category
+from src.result_cache import (ResultCache, dataset_version, search_key,
+                              spending_key)
+from src.services import search_transactions_by_keyword
+from src.table import TransactionTable
+
+
+@pytest.fixture
+def transactions():
+    return [
+        {"operation_date": "01.12.2021 10:00:00", "description": "Магнит", "category": "Супермаркеты",
+         "amount_transaction_rub": -100.0},
+        {"operation_date": "15.12.2021 12:00:00", "description": "Кафе у дома", "category": "Кафе",
+         "amount_transaction_rub": -50.0},
+        {"operation_date": "20.12.2021 18:30:00", "description": "Пятёрочка", "category": "Супермаркеты",
+         "amount_transaction_rub": -75.5},
+    ]
+
+
+def test_dataset_version(transactions):
+    table = TransactionTable.from_records(transactions)
+    assert table.fingerprint() == TransactionTable.from_records(transactions).fingerprint()
+    assert table.fingerprint() != TransactionTable.from_records(transactions[:2]).fingerprint()
+    assert dataset_version(transactions) != dataset_version(transactions[:2])
+    assert dataset_version(iter(transactions)) is None
+
+
+def test_list_version_computed_once(transactions, monkeypatch):
+    calls = []
+    dumps = result_cache.pickle.dumps
+
+    def counting_dumps(*args, **kwargs):
+        calls.append(1)
+        return dumps(*args, **kwargs)
+
+    monkeypatch.setattr(result_cache.pickle, "dumps", counting_dumps)
+
+    version = dataset_version(transactions)
+    assert dataset_version(transactions) == version
+    assert len(calls) == 1
+    # Добавленная строка меняет версию
+    transactions.append({"description": "Кафе на берегу"})
+    assert dataset_version(transactions) != version
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("as_table", [False, True])
+def test_search_cached(transactions, as_table):
+    data = TransactionTable.from_records(transactions) if as_table else transactions
+    cache = ResultCache()
+    search = cache.wrap(search_transactions_by_keyword, search_key)
+
+    expected = search_transactions_by_keyword(data, "магнит")
+    assert search(data, "магнит") == expected
+    assert search(data, "МАГНИТ") == expected
+    assert cache.stats == {"hits": 1, "misses": 1, "evictions": 0, "invalidations": 0}
+
+
+def test_search_key_follows_search_case_rules(transactions):
+    assert search_key({"key_word": "МАГНИТ"}) == search_key({"key_word": "магнит"})
+    assert search_key({"key_word": "Straße"}) != search_key({"key_word": "STRASSE"})
+
+    cache = ResultCache()
+    search = cache.wrap(search_transactions_by_keyword, search_key)
+    data = transactions + [{"description": "Straße"}]
+    assert "Straße" in search(data, "straße")
+    assert search(data, "strasse") == search_transactions_by_keyword(data, "strasse") == "[]"
+
+
+def test_spending_cached_returns_copy(transactions, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = ResultCache()
+    report = cache.wrap(spending_by_category, spending_key)
+
+    first = report(transactions, "супермаркеты", "2021-12-31")
+    first["amount_transaction_rub"] = 0
+    second = report(transactions, "Супермаркеты", date="2021-12-31")
+    pd.testing.assert_frame_equal(second, spending_by_category(transactions, "Супермаркеты", "2021-12-31"))
+    assert cache.stats["hits"] == 1
+
+
+def test_invalidated_when_dataset_changes(transactions):
+    cache = ResultCache()
+    search = cache.wrap(search_transactions_by_keyword, search_key)
+    search(transactions, "кафе")
+    changed = transactions + [{"description": "Кафе на берегу"}]
+    assert "Кафе на берегу" in search(changed, "кафе")
+    assert cache.stats["invalidations"] == 1
+    assert cache.stats["hits"] == 0
+
+
+def test_generators_are_not_cached(transactions):
+    cache = ResultCache()
+    search = cache.wrap(search_transactions_by_keyword, search_key)
+    assert search(iter(transactions), "кафе") == search(iter(transactions), "кафе")
+    assert cache.stats["misses"] == 0 and not cache.entries
+
+
+def test_lru_eviction(transactions):
+    cache = ResultCache(max_size=2)
+    search = cache.wrap(search_transactions_by_keyword, search_key)
+    search(transactions, "магнит")
+    search(transactions, "кафе")
+    search(transactions, "магнит")
+    search(transactions, "пят")
+    assert cache.stats["evictions"] == 1
+    search(transactions, "магнит")
+    search(transactions, "кафе")
+    assert cache.stats["hits"] == 2
+
+
+def test_frame_version_computed_once(transactions, monkeypatch):
+    calls = []
+    frame_version = result_cache._frame_version
+
+    def counting_version(data):
+        calls.append(1)
+        return frame_version(data)
+
+    monkeypatch.setattr(result_cache, "_frame_version", counting_version)
+
+    df = pd.DataFrame(transactions)
+    version = dataset_version(df)
+    assert dataset_version(df) == version
+    assert len(calls) == 1
+    assert dataset_version(df.iloc[:2]) != version
+
+
+def test_save_and_load(transactions, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Суммы с большим числом знаков восстанавливаются без потерь
+    transactions[0]["amount_transaction_rub"] = -100.12345678901
+    path = tmp_path / "results.json"
+    cache = ResultCache(path=path)
+    report = cache.wrap(spending_by_category, spending_key)
+    expected = report(transactions, "Супермаркеты", "2021-12-31")
+    cache.wrap(search_transactions_by_keyword, search_key)(transactions, "кафе")
+    cache.save()
+
+    loaded = ResultCache.load(path)
+    assert len(loaded.entries) == 2
+    pd.testing.assert_frame_equal(loaded.wrap(spending_by_category, spending_key)(
+        transactions, "Супермаркеты", "2021-12-31"), expected, check_exact=True)
+    assert loaded.stats["hits"] == 1
+
+
+def test_load_corrupted(tmp_path):
+    path = tmp_path / "results.json"
+    path.write_text("{", encoding="utf-8")
+    assert not ResultCache.load(path).entries
@@ -0,0 +1,129 @@
+import re
+
+import pytest
+
+from src import search_index
+from src.search_index import SearchIndex, index_path
+from src.table import TransactionTable
+
+
+@pytest.fixture
+def transactions():
+    return [
+        {"description": "Магнит", "category": "Супермаркеты"},
+        {"description": "Перевод Ёлкину", "category": "Переводы"},
+        {"description": "Кафе «МАГНИТ»", "category": "Кафе"},
+        {"description": "Колхоз", "category": "Супермаркеты"},
+        {"amount": 100},
+    ]
+
+
+def test_substring_search_is_case_insensitive(transactions):
+    index = SearchIndex.build(transactions)
+    assert index.search(transactions, "магнит") == [0, 2]
+    assert index.search(transactions, "ЁЛК") == [1]
+    assert index.search(transactions, "ко") == [3]
+
+
+def test_candidates_come_from_posting_lists(transactions):
+    index = SearchIndex.build(transactions)
+    assert index.candidates("магн") == [0, 2]
+    assert index.candidates("ко") is None
+
+
+def test_search_by_category(transactions):
+    index = SearchIndex.build(transactions)
+    assert index.search(transactions, "кафе", fields=("description", "category")) == [2]
+    assert index.search(transactions, "супер", fields=("category",)) == [0, 3]
+
+
+def test_search_words(transactions):
+    index = SearchIndex.build(transactions)
+    assert index.search_words("Кафе магнит") == [2]
+    assert index.search_words("магн") == []
+    assert index.search_words("СУПЕРМАРКЕТЫ", fields=("category",)) == [0, 3]
+
+
+def test_special_characters_are_literal(transactions):
+    index = SearchIndex.build(transactions)
+    assert index.search(transactions, "«магнит»") == [2]
+    assert index.search(transactions, "маг.ит") == []
+
+
+def test_refresh_adds_only_appended_rows(transactions):
+    index = SearchIndex.build(transactions[:3])
+    assert index.refresh(transactions) == 2
+    assert index.search(transactions, "колхоз") == [3]
+
+    changed = [{"description": "Колхоз"}] + transactions
+    index.refresh(changed)
+    assert index.rows == len(changed)
+    assert index.search(changed, "колхоз") == [0, 4]
+
+
+def test_refresh_detects_changes_before_last_row(transactions):
+    index = SearchIndex.build(transactions[:3])
+    # Последняя проиндексированная строка та же, изменилась первая
+    changed = [{"description": "Колхоз", "category": "Супермаркеты"}] + transactions[1:]
+    assert index.refresh(changed) == len(changed)
+    assert index.search(changed, "магнит") == [2]
+    assert index.search(changed, "колхоз") == [0, 3]
+
+
+def test_refresh_appended_table_rows(transactions):
+    index = SearchIndex.build(TransactionTable.from_records(transactions[:3]))
+    # Дописанные строки меняют словари значений таблицы, но не проиндексированные строки
+    table = TransactionTable.from_records(transactions)
+    assert index.refresh(table) == 2
+    assert index.search(table, "колхоз") == [3]
+
+
+def test_search_matches_ignorecase_scan():
+    transactions = [{"description": text} for text in ("Straße", "STRASSE", "İstanbul", "istanbul", "ıspanak")]
+    index = SearchIndex.build(transactions)
+    for query in ("straße", "strasse", "ss", "İst", "ist", "ISPANAK", "ı"):
+        expected = [i for i, t in enumerate(transactions) if re.search(re.escape(query), t["description"], re.I)]
+        assert index.search(transactions, query) == expected, query
+
+
+def test_covers(transactions):
+    index = SearchIndex.build(transactions)
+    assert index.covers(transactions)
+    assert not index.covers(transactions[:-1])
+    # Та же длина, другие данные
+    assert not index.covers([{"description": "Колхоз"}] + transactions[1:])
+
+
+def test_refresh_skips_check_for_unchanged_source(transactions, tmp_path, monkeypatch):
+    source = tmp_path / "operations.xlsx"
+    source.write_bytes(b"1234")
+    index = SearchIndex.build(transactions)
+    index.refresh(transactions, source=source)
+    index.save(tmp_path / "index.json")
+
+    monkeypatch.setattr(search_index, "prefix_digest", lambda *args: pytest.fail("данные сверяются повторно"))
+    assert SearchIndex.load(tmp_path / "index.json").refresh(transactions, source=source) == 0
+
+
+def test_save_and_load(transactions, tmp_path):
+    path = index_path(tmp_path / "operations.xlsx")
+    assert path.name == "operations.xlsx.search.json"
+    SearchIndex.build(transactions).save(path)
+
+    loaded = SearchIndex.load(path)
+    assert loaded.rows == len(transactions)
+    assert loaded.search(transactions, "магнит") == [0, 2]
+    assert loaded.refresh(transactions) == 0
+
+
+def test_load_missing_or_incompatible(transactions, tmp_path):
+    assert SearchIndex.load(tmp_path / "missing.json").rows == 0
+    path = tmp_path / "index.json"
+    SearchIndex.build(transactions, fields=("description",)).save(path)
+    assert SearchIndex.load(path).rows == 0
+
+
+def test_table_matches_records(transactions):
+    table = TransactionTable.from_records(transactions[:4])
+    index = SearchIndex.build(table)
+    assert index.search(table, "магнит") == SearchIndex.build(transactions[:4]).search(transactions[:4], "магнит")
@@ -0,0 +1,86 @@
+import io
+import json
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.serialize import dumps, iter_json, write_json
+from src.table import TransactionTable
+
+RECORDS = [
+    {"operation_date": "01.02.2021 10:00:00", "description": "Магнит \"у дома\"", "amount_transaction_rub": -10.5,
+     "bonuses": 0, "mcc": None},
+    {"description": "Перевод", "extra": [1, {"nested": True}]},
+    {},
+    "строка\nс переводом",
+    {"amount_transaction_rub": float("nan")},
+]
+
+
+@pytest.mark.parametrize("indent", [4, 2])
+@pytest.mark.parametrize("batch_size", [1, 2, 256])
+def test_iter_json_matches_json_dumps(indent, batch_size):
+    expected = json.dumps(RECORDS, ensure_ascii=False, indent=indent)
+    assert "".join(iter_json(RECORDS, indent=indent, batch_size=batch_size)) == expected
+
+
+def test_iter_json_compact():
+    expected = json.dumps(RECORDS, ensure_ascii=False, separators=(",", ":"))
+    assert "".join(iter_json(RECORDS, indent=None)) == expected
+
+
+def test_iter_json_empty():
+    assert "".join(iter_json([])) == "[]"
+    assert "".join(iter_json([], indent=None)) == "[]"
+    assert "".join(iter_json([], fmt="jsonl")) == ""
+
+
+def test_iter_json_lines():
+    lines = "".join(iter_json(iter(RECORDS[:3]), fmt="jsonl")).splitlines()
+    assert [json.loads(line) for line in lines] == RECORDS[:3]
+
+
+def test_iter_json_is_lazy():
+    def records():
+        yield {"description": "первая"}
+        raise RuntimeError("дальше не читать")
+
+    chunks = iter_json(records(), fmt="jsonl", batch_size=1)
+    assert json.loads(next(chunks)) == {"description": "первая"}
+
+
+def test_iter_json_unknown_format():
+    with pytest.raises(ValueError):
+        list(iter_json(RECORDS, fmt="xml"))
+
+
+def test_write_json():
+    file = io.StringIO()
+    assert write_json(iter(RECORDS), file, fmt="jsonl") == len(RECORDS)
+    assert len(file.getvalue().splitlines()) == len(RECORDS)
+
+
+def test_encoder_non_native_values():
+    table = TransactionTable.from_records([{"operation_date": "01.02.2021 10:00:00", "description": "Магнит"}])
+    value = {
+        "int": np.int64(3),
+        "float": np.float32(1.5),
+        "bool": np.bool_(True),
+        "array": np.arange(2),
+        "timestamp": pd.Timestamp("2021-01-02 03:04:05"),
+        "datetime": datetime(2021, 1, 2, 3, 4, 5),
+        "date": date(2021, 1, 2),
+        "nat": pd.NaT,
+        "datetime64": np.datetime64("2021-01-02T03:04:05"),
+        "row": table[0],
+    }
+    result = json.loads(dumps(value, indent=None))
+    assert result["int"] == 3 and result["float"] == 1.5 and result["bool"] is True
+    assert result["array"] == [0, 1]
+    assert result["timestamp"] == result["datetime"] == result["datetime64"] == "2021-01-02T03:04:05"
+    assert result["date"] == "2021-01-02"
+    assert result["nat"] is None
+    assert result["row"]["description"] == "Магнит"
+    assert "".join(iter_json([value], indent=None)) == "[" + dumps(value, indent=None) + "]"
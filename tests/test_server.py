@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.parse import quote
+from urllib.request import urlopen
+
+import pandas as pd
+import pytest
+
+from src.server import Dataset, create_server
+from src.utils import count_stat_by_card, read_xlsx
+
+
+def write_workbook(path, descriptions):
+    pd.DataFrame(
+        {
+            "Дата операции": [f"{day:02d}.12.2021 12:00:00" for day in range(1, len(descriptions) + 1)],
+            "Номер карты": ["*7197"] * len(descriptions),
+            "Сумма платежа": [-100.0] * len(descriptions),
+            "Сумма операции": [-100.0] * len(descriptions),
+            "Категория": ["Супермаркеты"] * len(descriptions),
+            "Описание": descriptions,
+            "Бонусы (включая кэшбэк)": [1] * len(descriptions),
+        }
+    ).to_excel(path, index=False)
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "operations.xlsx"
+    write_workbook(path, ["Магнит", "Пятерочка", "Магнит у дома"])
+    return path
+
+
+@pytest.fixture
+def server(workbook):
+    server = create_server(workbook, port=0)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path):
+    with urlopen(f"http://127.0.0.1:{server.server_port}{path}", timeout=10) as response:
+        return response.status, json.loads(response.read().decode("utf-8"))
+
+
+def test_search_endpoint(server):
+    status, body = get(server, "/search?q=" + quote("магнит"))
+    assert status == 200
+    assert [transaction["description"] for transaction in body] == ["Магнит", "Магнит у дома"]
+
+
+def test_spending_endpoint(server):
+    status, body = get(server, "/spending?category=" + quote("Супермаркеты") + "&date=2021-12-31")
+    assert status == 200
+    assert [row["description"] for row in body] == ["Магнит", "Пятерочка", "Магнит у дома"]
+
+
+@patch("src.views.read_json")
+def test_web_page_endpoint(mock_read_json, server, workbook):
+    mock_read_json.return_value = {"user_currencies": [], "user_stocks": []}
+    status, body = get(server, "/web_page?time=" + quote("2021-12-03 20:00:00"))
+    assert status == 200
+    assert body["cards"] == count_stat_by_card(read_xlsx(workbook))
+    assert body["cards"][0]["total_spent"] == 300.0
+
+
+@patch("src.views.read_json", return_value={"user_currencies": [], "user_stocks": []})
+def test_web_page_timings(mock_read_json, server):
+    url = f"http://127.0.0.1:{server.server_port}/web_page?time=" + quote("2021-12-03 20:00:00")
+    with urlopen(url + "&timings=1", timeout=10) as response:
+        header = response.headers["Server-Timing"]
+        body = json.loads(response.read().decode("utf-8"))
+
+    stages = [entry["stage"] for entry in body["timings"]]
+    assert {"web_page.settings", "web_page.quotes", "web_page.cards", "web_page.top", "web_page.json"} <= set(stages)
+    assert stages[-1] == "web_page"
+    assert "web_page-cards;dur=" in header
+    assert body["result"]["cards"][0]["total_spent"] == 300.0
+    # Без timings=1 тело ответа не меняется
+    assert "cards" in get(server, "/web_page?time=" + quote("2021-12-03 20:00:00"))[1]
+
+
+def test_metrics_endpoint(server):
+    get(server, "/search?q=" + quote("магнит"))
+    with urlopen(f"http://127.0.0.1:{server.server_port}/metrics", timeout=10) as response:
+        content_type = response.headers["Content-Type"]
+        text = response.read().decode("utf-8")
+
+    assert content_type.startswith("text/plain")
+    assert 'transactions_requests_total{route="/search",status="200"}' in text
+    assert 'transactions_stage_seconds_count{stage="search"}' in text
+    assert 'transactions_result_cache_total{kind="misses"}' in text
+
+
+def test_errors(server):
+    with pytest.raises(HTTPError) as error:
+        get(server, "/search")
+    assert error.value.code == 400
+    with pytest.raises(HTTPError) as error:
+        get(server, "/unknown")
+    assert error.value.code == 404
+
+
+def test_concurrent_requests_reuse_loaded_data(server):
+    with patch("src.server.read_xlsx_table") as mock_read:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: get(server, "/search?q=" + quote("пятерочка")), range(16)))
+    mock_read.assert_not_called()
+    assert all(status == 200 and len(body) == 1 for status, body in results)
+    assert get(server, "/health")[1]["rows"] == 3
+
+
+def test_hot_reload(workbook):
+    dataset = Dataset(workbook, check_interval=0)
+    assert len(dataset.current().table) == 3
+
+    write_workbook(workbook, ["Магнит", "Пятерочка", "Магнит у дома", "Перекресток"])
+    stat = os.stat(workbook)
+    os.utime(workbook, (stat.st_atime, stat.st_mtime + 10))
+
+    assert len(dataset.current().table) == 4
+    assert dataset.reloads == 1
+    # Без изменений файла повторной загрузки нет
+    dataset.current()
+    assert dataset.reloads == 1
@@ -1,8 +1,16 @@
 import json
+import logging
 import unittest
 from unittest.mock import patch
 
-from src.services import search_transactions_by_keyword
+from src.logs import REPEATED_LIMIT
+from src.search_index import SearchIndex
+from src.services import (find_transactions_by_keyword,
+                          find_transactions_by_terms,
+                          search_transactions_by_keyword,
+                          search_transactions_by_terms,
+                          stream_transactions_by_keyword)
+from src.table import TransactionTable
 
 
 class TestSortTransactionsKey(unittest.TestCase):
@@ -25,6 +33,69 @@ class TestSortTransactionsKey(unittest.TestCase):
         ]
         self.assertEqual(result, expected)
 
+    def test_found_transactions_from_generator(self):
+        """Проверяем, что поиск принимает генератор транзакций"""
+        result_json = search_transactions_by_keyword(iter(self.transactions), "кафе")
+        self.assertEqual(len(json.loads(result_json)), 2)
+
+    def test_found_transactions_in_table(self):
+        """Проверяем поиск по TransactionTable"""
+        table = TransactionTable.from_records(self.transactions)
+        result = json.loads(search_transactions_by_keyword(table, "кафе"))
+        self.assertEqual(
+            [transaction["description"] for transaction in result],
+            ["Оплата в кафе", "Кафе на берегу"],
+        )
+
+    def test_found_transactions_with_index(self):
+        """Проверяем, что поиск по индексу дает тот же результат, что и полный просмотр"""
+        index = SearchIndex.build(self.transactions)
+        for key_word in ["кафе", "КАФ", "в", "бензин"]:
+            self.assertEqual(
+                search_transactions_by_keyword(self.transactions, key_word, index=index),
+                search_transactions_by_keyword(self.transactions, key_word),
+            )
+
+    def test_search_does_not_change_index(self):
+        """Проверяем, что поиск не догоняет индекс, а просматривает данные, которые индекс не покрывает"""
+        index = SearchIndex.build(self.transactions[:2])
+        for data in (self.transactions, TransactionTable.from_records(self.transactions)):
+            self.assertEqual(
+                search_transactions_by_keyword(data, "кафе", index=index),
+                search_transactions_by_keyword(data, "кафе"),
+            )
+        self.assertEqual(index.rows, 2)
+
+    def test_index_of_other_data_is_ignored(self):
+        """Проверяем, что индекс другого набора той же длины не используется"""
+        index = SearchIndex.build([{"description": "Прочее"}] * len(self.transactions))
+        self.assertEqual(
+            search_transactions_by_keyword(self.transactions, "кафе", index=index),
+            search_transactions_by_keyword(self.transactions, "кафе"),
+        )
+
+    def test_keyword_is_literal(self):
+        """Проверяем, что спецсимволы в ключевом слове не работают как регулярное выражение"""
+        transactions = self.transactions + [{"description": "Оплата (кафе)", "amount": 50}]
+        self.assertEqual(json.loads(search_transactions_by_keyword(transactions, "кафе|перевод")), [])
+        result = json.loads(search_transactions_by_keyword(transactions, "(кафе)"))
+        self.assertEqual(result, [{"description": "Оплата (кафе)", "amount": 50}])
+
+    def test_stream_transactions(self):
+        """Проверяем потоковую выдачу в JSON Lines и компактный JSON"""
+        table = TransactionTable.from_records(self.transactions)
+        for data in (self.transactions, table):
+            lines = "".join(stream_transactions_by_keyword(data, "кафе")).splitlines()
+            self.assertEqual([json.loads(line)["description"] for line in lines], ["Оплата в кафе", "Кафе на берегу"])
+            compact = "".join(stream_transactions_by_keyword(data, "кафе", fmt="json"))
+            self.assertEqual(json.loads(compact), json.loads(search_transactions_by_keyword(data, "кафе")))
+            self.assertNotIn("\n", compact)
+
+    def test_find_transactions_is_lazy(self):
+        """Проверяем, что транзакции отдаются по мере нахождения"""
+        matches = find_transactions_by_keyword(iter(self.transactions), "кафе")
+        self.assertEqual(next(matches), {"description": "Оплата в кафе", "amount": 100})
+
     def test_no_matching_transactions(self):
         """Проверяем случай, когда ничего не найдено"""
         result_json = search_transactions_by_keyword(self.transactions, "бензин")
@@ -68,12 +139,9 @@ class TestSortTransactionsKey(unittest.TestCase):
     def test_logging(self, mock_logger):
         """Проверяем, что вызываются нужные сообщения логирования"""
         search_transactions_by_keyword(self.transactions, "кафе")
-        mock_logger.info.assert_any_call(
-            "Начат поиск транзакций по ключевому слову: 'кафе'"
-        )
-        mock_logger.info.assert_any_call(
-            "Найдено 2 транзакций по ключевому слову 'кафе'"
-        )
+        messages = [call.args[0] % call.args[1:] for call in mock_logger.info.call_args_list]
+        self.assertIn("Начат поиск транзакций по ключевому слову: 'кафе'", messages)
+        self.assertIn("Найдено 2 транзакций по ключевому слову 'кафе'", messages)
 
     @patch("src.services.logger")
     def test_logging_for_invalid_data(self, mock_logger):
@@ -87,10 +155,96 @@ class TestSortTransactionsKey(unittest.TestCase):
         )
 
         search_transactions_by_keyword([{"amount": 200}], "кафе")
-        mock_logger.warning.assert_called_with(
-            "Пропущена транзакция без описания: {'amount': 200}"
+        mock_logger.log.assert_called_with(
+            logging.WARNING, "Пропущена транзакция без описания: %s", {"amount": 200}
+        )
+
+    @patch("src.services.logger")
+    def test_repeated_warnings_are_summarized(self, mock_logger):
+        """Построчные предупреждения пишутся первые несколько раз, остальные — одной итоговой записью"""
+        search_transactions_by_keyword([{"amount": amount} for amount in range(100)], "кафе")
+        self.assertEqual(mock_logger.log.call_count, REPEATED_LIMIT + 1)
+        self.assertEqual(
+            mock_logger.log.call_args.args[2:], (100 - REPEATED_LIMIT, "Пропущена транзакция без описания: %s", 100)
+        )
+
+
+class TestSearchByTerms(unittest.TestCase):
+
+    def setUp(self):
+        self.transactions = [
+            {"description": "Оплата в кафе", "category": "Кафе", "amount": 100},
+            {"description": "Перевод другу", "category": "Переводы", "amount": 200},
+            {"description": "Кафе на берегу", "category": "Рестораны", "amount": 150},
+            {"description": "Магнит у кафе", "category": "Супермаркеты", "amount": 300},
+        ]
+
+    def descriptions(self, data, **query):
+        return [transaction["description"] for transaction, _ in find_transactions_by_terms(data, **query)]
+
+    def test_any_of_reports_matched_terms(self):
+        """Проверяем, что для каждой транзакции сообщаются сработавшие слова"""
+        result = list(find_transactions_by_terms(self.transactions, any_of=["кафе", "магнит", "бензин"]))
+        self.assertEqual(
+            [matched for _, matched in result],
+            [["кафе"], ["кафе"], ["кафе", "магнит"]],
+        )
+
+    def test_any_of_matches_single_keyword_searches(self):
+        """Проверяем, что один проход дает те же результаты, что и отдельные поиски"""
+        keywords = ["кафе", "перевод", "у"]
+        result = list(find_transactions_by_terms(self.transactions, any_of=keywords))
+        for keyword in keywords:
+            expected = json.loads(search_transactions_by_keyword(self.transactions, keyword))
+            self.assertEqual([transaction for transaction, matched in result if keyword in matched], expected)
+
+    def test_all_of_and_none_of(self):
+        """Проверяем семантику И и НЕ"""
+        self.assertEqual(self.descriptions(self.transactions, all_of=["кафе", "магнит"]), ["Магнит у кафе"])
+        self.assertEqual(
+            self.descriptions(self.transactions, any_of=["кафе"], none_of=["магнит", "берег"]),
+            ["Оплата в кафе"],
+        )
+        self.assertEqual(
+            self.descriptions(self.transactions, none_of=["кафе"]),
+            ["Перевод другу"],
+        )
+
+    def test_fields(self):
+        """Проверяем поиск по выбранным полям и по паре (поле, слово)"""
+        self.assertEqual(
+            self.descriptions(self.transactions, any_of=["кафе"], fields=("category",)),
+            ["Оплата в кафе"],
+        )
+        self.assertEqual(
+            self.descriptions(self.transactions, all_of=[("category", "супер"), "кафе"]),
+            ["Магнит у кафе"],
+        )
+
+    def test_table_matches_records(self):
+        """Проверяем, что поиск по TransactionTable совпадает с поиском по списку"""
+        table = TransactionTable.from_records(self.transactions)
+        query = {"all_of": ["а"], "any_of": [("category", "кафе"), "перевод"], "none_of": ["берег"],
+                 "fields": ("description", "category")}
+        self.assertEqual(
+            [(transaction["description"], terms) for transaction, terms in find_transactions_by_terms(table, **query)],
+            [(row["description"], terms) for row, terms in find_transactions_by_terms(self.transactions, **query)],
         )
 
+    def test_search_transactions_by_terms_json(self):
+        """Проверяем формат JSON-ответа"""
+        result = json.loads(search_transactions_by_terms(self.transactions, any_of=["магнит"]))
+        self.assertEqual(result, [{"transaction": self.transactions[3], "matched_terms": ["магнит"]}])
+
+    @patch("src.services.logger")
+    def test_invalid_terms(self, mock_logger):
+        """Проверяем, что без ключевых слов ничего не ищется"""
+        self.assertEqual(search_transactions_by_terms(self.transactions), "[]")
+        self.assertEqual(search_transactions_by_terms(self.transactions, any_of=["кафе", ""]), "[]")
+        mock_logger.warning.assert_called_with("Ключевые слова отсутствуют или не являются строками.")
+        self.assertEqual(search_transactions_by_terms("invalid_data", any_of=["кафе"]), "[]")
+        mock_logger.error.assert_called_with("Переданные данные не являются списком.")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,51 @@
+import pandas as pd
+import pytest
+
+from src import synthetic
+from src.cache import cache_status
+from src.synthetic import generate_frame, write_export
+from src.utils import XLSX_COLUMNS, read_xlsx, read_xlsx_table
+
+
+def test_generate_frame_is_seeded():
+    pd.testing.assert_frame_equal(generate_frame(500, seed=1), generate_frame(500, seed=1))
+    assert not generate_frame(500, seed=1).equals(generate_frame(500, seed=2))
+
+
+def test_generate_frame_schema():
+    df = generate_frame(2000)
+
+    assert set(df.columns) == set(XLSX_COLUMNS)
+    assert len(df) == 2000
+    dates = pd.to_datetime(df["Дата операции"], format="%d.%m.%Y %H:%M:%S")
+    assert dates.is_monotonic_decreasing
+    assert df["Номер карты"].dropna().str.match(r"^\*\d{4}$").all()
+    assert df["Категория"].nunique() > 10
+    assert set(df["Валюта операции"]) <= set(synthetic.CURRENCIES)
+    assert df["Описание"].str.contains("[а-яА-Я]").any()
+    assert (df.loc[df["Категория"] == "Пополнения", "Сумма платежа"] > 0).all()
+
+
+def test_write_export_round_trip(tmp_path):
+    files = write_export(300, tmp_path)
+
+    assert cache_status(files["xlsx"]) == "hit"
+    from_xlsx = read_xlsx(files["xlsx"])
+    assert len(from_xlsx) == 300
+    assert read_xlsx(files["cache"], use_cache=True) == from_xlsx
+    assert pd.read_csv(files["csv"]).shape == (300, len(XLSX_COLUMNS))
+
+
+def test_write_export_without_xlsx(tmp_path, monkeypatch):
+    # Выгрузка больше листа Excel: снимок строится рядом с csv
+    monkeypatch.setattr(synthetic, "XLSX_MAX_ROWS", 100)
+    files = write_export(200, tmp_path, formats=["xlsx", "cache"])
+
+    assert "xlsx" not in files
+    assert files["cache"] == files["csv"]
+    assert len(read_xlsx_table(files["cache"], use_cache=True)) == 200
+
+
+def test_write_export_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        write_export(10, tmp_path, formats=["parquet"])
@@ -0,0 +1,152 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.reports import spending_by_category
+from src.table import (DateIndex, TransactionRow, TransactionTable,
+                       records_memory_usage)
+from src.utils import count_stat_by_card, find_top_5_transactions
+
+
+@pytest.fixture
+def records():
+    return [
+        {
+            "operation_date": "31.12.2021 16:44:00",
+            "payment_date": "31.12.2021",
+            "state": "OK",
+            "last_digits": "7197",
+            "amount_transaction": -160.89,
+            "currency": "RUB",
+            "amount_transaction_rub": -160.89,
+            "account_currency": "RUB",
+            "cashback": 0.0,
+            "category": "Супермаркеты",
+            "transaction_code": 5411.0,
+            "benefit": 3,
+            "amount_to_piggy": 0,
+            "description": "Колхоз",
+            "amount_rounded": 160.89,
+        },
+        {
+            "operation_date": "30.12.2021 10:00:00",
+            "payment_date": "30.12.2021",
+            "state": "OK",
+            "last_digits": "",
+            "amount_transaction": 5000.0,
+            "currency": "RUB",
+            "amount_transaction_rub": 5000.0,
+            "account_currency": "RUB",
+            "cashback": 0.0,
+            "category": "Пополнения",
+            "transaction_code": 0.0,
+            "benefit": 0,
+            "amount_to_piggy": 0,
+            "description": "Пополнение",
+            "amount_rounded": 5000.0,
+        },
+        {
+            "operation_date": "29.12.2021 12:00:00",
+            "payment_date": "29.12.2021",
+            "state": "OK",
+            "last_digits": "7197",
+            "amount_transaction": -64.0,
+            "currency": "RUB",
+            "amount_transaction_rub": -64.0,
+            "account_currency": "RUB",
+            "cashback": 1.5,
+            "category": "Супермаркеты",
+            "transaction_code": 5411.0,
+            "benefit": 1,
+            "amount_to_piggy": 0,
+            "description": "Колхоз",
+            "amount_rounded": 64.0,
+        },
+    ]
+
+
+def test_round_trip(records):
+    table = TransactionTable.from_records(records)
+
+    assert len(table) == 3
+    assert table.to_records() == records
+    assert [row.to_dict() for row in table] == records
+
+
+def test_columns_are_compact(records):
+    table = TransactionTable.from_records(records)
+
+    assert table.kinds["category"] == "category"
+    assert list(table.categories("category")) == ["Супермаркеты", "Пополнения"]
+    assert table.codes("category").dtype == np.int32
+    assert table.amounts("amount_transaction_rub").tolist() == [-16089, 500000, -6400]
+    assert table.operation_dt[2] == np.datetime64("2021-12-29T12:00:00")
+
+
+def test_row_view(records):
+    table = TransactionTable.from_records(records)
+    row = table[-1]
+
+    assert isinstance(row, TransactionRow)
+    assert not hasattr(row, "__dict__")
+    assert row["operation_date"] == "29.12.2021 12:00:00"
+    assert row.get("missing", "default") == "default"
+    with pytest.raises(IndexError):
+        table[3]
+
+
+def test_nonstandard_dates_are_preserved(records):
+    records[2]["operation_date"] = "2021-12-29"
+    table = TransactionTable.from_records(records)
+
+    assert table[2]["operation_date"] == "2021-12-29"
+    assert table.operation_dt[2] == np.datetime64("2021-12-29")
+    assert table.take(np.array([2])).to_records() == [records[2]]
+
+
+def test_take_keeps_values(records):
+    table = TransactionTable.from_records(records).take(np.array([2, 0]))
+
+    assert table.to_records() == [records[2], records[0]]
+
+
+def test_memory_usage(records):
+    many = [dict(record) for record in records * 1000]
+    table = TransactionTable.from_records(many)
+    usage = table.memory_usage()
+
+    assert usage["total"] == sum(value for key, value in usage.items() if key != "total")
+    assert usage["total"] * 5 < records_memory_usage(many)
+
+
+def test_functions_accept_table(records, tmp_path, monkeypatch):
+    # Отчет spending_by_category пишется в текущий каталог
+    monkeypatch.chdir(tmp_path)
+    table = TransactionTable.from_records(records)
+
+    assert count_stat_by_card(table) == count_stat_by_card(records)
+    assert find_top_5_transactions(table) == find_top_5_transactions(records)
+
+    result = spending_by_category(table, "супермаркеты", "2021-12-31")
+    expected = spending_by_category(records, "супермаркеты", "2021-12-31")
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_date_index_windows(records):
+    table = TransactionTable.from_records(records)
+    index = table.date_index
+
+    assert list(index.between(datetime(2021, 12, 30), None)) == [0, 1]
+    assert list(index.between(None, datetime(2021, 12, 30, 10))) == [1, 2]
+    assert list(index.month_to_date(datetime(2021, 12, 30, 9))) == [2]
+    assert list(index.last_days(1, datetime(2021, 12, 31, 23))) == [0, 1]
+
+
+def test_date_index_skips_missing_dates(records):
+    records[1]["operation_date"] = 0
+    index = DateIndex.from_records(records)
+
+    assert len(index) == 2
+    assert list(index.between()) == [0, 2]
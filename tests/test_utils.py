@@ -1,13 +1,32 @@
+import os
+import tempfile
+import threading
+import time
 import unittest
-from unittest.mock import MagicMock, mock_open, patch
+from unittest.mock import mock_open, patch
 
-from src.utils import (count_stat_by_card, find_all_cards, find_exchange_rate,
+import numpy as np
+import pandas as pd
+
+from src.utils import (QUOTES, QuoteCache, count_stat_by_card, find_all_cards, find_exchange_rate,
                        find_stockmarket_rate, find_top_5_transactions,
-                       good_something, read_json, read_xlsx)
+                       find_top_transactions,
+                       find_top_transactions_with_groups, frame_to_records, good_something, iter_xlsx,
+                       iter_xlsx_batches, read_json, read_xlsx,
+                       read_xlsx_frame)
+
+
+def logged(log_method):
+    """Сообщение последнего вызова метода логгера с подставленными аргументами."""
+    msg, *args = log_method.call_args.args
+    return msg % tuple(args)
 
 
 class TestUtils(unittest.TestCase):
 
+    def setUp(self):
+        QUOTES.clear()
+
     def test_good_something(self):
         self.assertEqual(good_something("2025-03-19 06:30:00"), "Доброе утро!")
         self.assertEqual(good_something("2025-03-19 13:30:00"), "Добрый день!")
@@ -40,6 +59,20 @@ class TestUtils(unittest.TestCase):
             sorted(expected, key=lambda x: x["last_digits"]),
         )
 
+    def test_count_stat_by_card_from_generator(self):
+        transactions = (
+            {"last_digits": card, "cashback": 1, "amount_transaction_rub": amount}
+            for card, amount in [("1234", -100), ("1234", 50), ("", -10)]
+        )
+        result = count_stat_by_card(transactions)
+        self.assertEqual(
+            result,
+            [
+                {"last_digits": "1234", "total_spent": 100, "cashback": 2},
+                {"last_digits": "Другие карты", "total_spent": 10, "cashback": 1},
+            ],
+        )
+
     def test_find_top_5_transactions(self):
         transactions = [
             {"amount_transaction_rub": "-200"},
@@ -53,13 +86,38 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(len(top_5), 5)
         self.assertEqual(top_5[0]["amount_transaction_rub"], "500")
 
-    @patch("src.utils.requests.get")
+    def test_find_top_transactions_grouped(self):
+        transactions = [
+            {"last_digits": "1234", "amount_transaction_rub": -200, "category": "Food"},
+            {"last_digits": "5678", "amount_transaction_rub": -100, "category": "Food"},
+            {"last_digits": "1234", "amount_transaction_rub": -300, "category": "Taxi"},
+            {"last_digits": "5678", "amount_transaction_rub": -50, "category": "Taxi"},
+        ]
+        by_card = find_top_transactions(transactions, 1, group_by="card")
+        self.assertEqual(
+            by_card,
+            {
+                "1234": [{"amount_transaction_rub": "300", "category": "Taxi"}],
+                "5678": [{"amount_transaction_rub": "100", "category": "Food"}],
+            },
+        )
+        top = find_top_transactions(transactions, 3, fields=["amount_transaction_rub"])
+        self.assertEqual(top, [{"amount_transaction_rub": amount} for amount in ("300", "200", "100")])
+
+        overall, groups = find_top_transactions_with_groups(transactions, 2, group_by="card", group_k=1)
+        self.assertEqual([t["amount_transaction_rub"] for t in overall], ["300", "200"])
+        self.assertEqual(groups, by_card)
+
+    def test_find_top_5_transactions_invalid_amount(self):
+        self.assertEqual(find_top_5_transactions([{"amount_transaction_rub": "abc"}]), [])
+
+    @patch("src.quote_providers.HTTP.get")
     def test_find_exchange_rate(self, mock_get):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {"result": 75.0}
         self.assertEqual(find_exchange_rate("USD"), 75.0)
 
-    @patch("src.utils.requests.get")
+    @patch("src.quote_providers.HTTP.get")
     def test_find_stockmarket_rate(self, mock_get):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {
@@ -77,35 +135,105 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(data, {"user_currencies": ["USD"], "user_stocks": ["AAPL"]})
 
 
+class TestQuoteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        self.cache = QuoteCache(ttls={"stock": 60}, max_stale=600, clock=lambda: self.now)
+        self.calls = []
+
+    def fetch(self, value):
+        def call():
+            self.calls.append(value)
+            return value
+        return call
+
+    def test_fresh_value_is_served_from_cache(self):
+        self.assertEqual(self.cache.get("stock", "AAPL", self.fetch(150.0)), 150.0)
+        self.now += 30
+        self.assertEqual(self.cache.get("stock", "AAPL", self.fetch(151.0)), 150.0)
+        self.assertEqual(self.calls, [150.0])
+        metrics = self.cache.metrics()
+        self.assertEqual((metrics["hits"], metrics["misses"]), (1, 1))
+        self.assertEqual(metrics["ages"], {"stock:AAPL": 30.0})
+
+    def test_stale_value_is_served_and_refreshed_in_background(self):
+        self.cache.get("stock", "AAPL", self.fetch(150.0))
+        self.now += 120
+        release = threading.Event()
+
+        def slow_fetch():
+            release.wait(5)
+            return 155.0
+
+        self.assertEqual(self.cache.get("stock", "AAPL", slow_fetch), 150.0)
+        self.assertEqual(self.cache.get("stock", "AAPL", slow_fetch), 150.0)
+        release.set()
+        for _ in range(500):
+            if self.cache.entries["stock:AAPL"]["value"] == 155.0:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.cache.get("stock", "AAPL", self.fetch(0.0)), 155.0)
+        metrics = self.cache.metrics()
+        self.assertEqual((metrics["stale_hits"], metrics["refreshes"]), (2, 1))
+
+    def test_last_known_value_on_api_error(self):
+        self.cache.get("stock", "AAPL", self.fetch(150.0))
+        self.now += 3600
+        self.assertEqual(self.cache.get("stock", "AAPL", self.fetch(None)), 150.0)
+        self.assertEqual(self.cache.get("stock", "MSFT", self.fetch(None)), None)
+        metrics = self.cache.metrics()
+        self.assertEqual((metrics["fallbacks"], metrics["errors"]), (1, 2))
+
+    def test_persistence(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "quotes.json")
+            self.cache.use_file(path)
+            self.cache.get("stock", "AAPL", self.fetch(150.0))
+
+            restored = QuoteCache(ttls={"stock": 60}, clock=lambda: self.now)
+            restored.use_file(path)
+            self.assertEqual(restored.get("stock", "AAPL", self.fetch(0.0)), 150.0)
+            self.assertEqual(self.calls, [150.0])
+
+    @patch("src.quote_providers.HTTP.get")
+    def test_find_stockmarket_rate_uses_cache(self, mock_get):
+        QUOTES.clear()
+        mock_get.return_value.json.return_value = {"Global Quote": {"05. price": "150.5"}}
+        self.assertEqual(find_stockmarket_rate("AAPL"), 150.5)
+        self.assertEqual(find_stockmarket_rate("AAPL"), 150.5)
+        self.assertEqual(mock_get.call_count, 1)
+        QUOTES.clear()
+
+
 class TestReadXlsx(unittest.TestCase):
 
+    def setUp(self):
+        self.row = {
+            "Дата операции": "2025-03-19",
+            "Дата платежа": "2025-03-19",
+            "Статус": "Completed",
+            "Номер карты": "*1234",
+            "Сумма операции": 1000,
+            "Валюта операции": "USD",
+            "Сумма платежа": 1000,
+            "Валюта платежа": "USD",
+            "Кэшбэк": 10,
+            "Категория": "Food",
+            "MCC": "1234",
+            "Бонусы (включая кэшбэк)": 50,
+            "Округление на инвесткопилку": 0,
+            "Описание": "Purchase",
+            "Сумма операции с округлением": 1000,
+        }
+
     @patch("os.path.exists")
     @patch("pandas.read_excel")
     @patch("src.utils.logger")
     def test_read_xlsx_success(self, mock_logger, mock_read_excel, mock_exists):
         # Настроим моки
         mock_exists.return_value = True
-        mock_df = MagicMock()
-        mock_df.to_dict.return_value = [
-            {
-                "Дата операции": "2025-03-19",
-                "Дата платежа": "2025-03-19",
-                "Статус": "Completed",
-                "Номер карты": "1234",
-                "Сумма операции": 1000,
-                "Валюта операции": "USD",
-                "Сумма платежа": 1000,
-                "Валюта платежа": "USD",
-                "Кэшбэк": 10,
-                "Категория": "Food",
-                "MCC": "1234",
-                "Бонусы (включая кэшбэк)": 50,
-                "Округление на инвесткопилку": 0,
-                "Описание": "Purchase",
-                "Сумма операции с округлением": 1000,
-            }
-        ]
-        mock_read_excel.return_value = mock_df
+        mock_read_excel.return_value = pd.DataFrame([self.row])
 
         # Вызовем функцию
         result = read_xlsx("test.xlsx")
@@ -114,8 +242,10 @@ class TestReadXlsx(unittest.TestCase):
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0]["operation_date"], "2025-03-19")
         self.assertEqual(result[0]["amount_transaction"], 1000)
-        mock_logger.info.assert_called_with(
-            "Файл test.xlsx успешно загружен. Найдено 1 записей."
+        self.assertEqual(result[0]["last_digits"], "1234")
+        self.assertNotIn("operation_dt", result[0])
+        self.assertEqual(
+            logged(mock_logger.info), "Файл test.xlsx успешно загружен. Найдено 1 записей."
         )
 
     @patch("os.path.exists")
@@ -129,8 +259,8 @@ class TestReadXlsx(unittest.TestCase):
 
         # Проверим, что результат пустой список
         self.assertEqual(result, [])
-        mock_logger.warning.assert_called_with(
-            "Файл non_existent_file.xlsx не найден. Возвращаем пустой список."
+        self.assertEqual(
+            logged(mock_logger.warning), "Файл non_existent_file.xlsx не найден. Возвращаем пустой список."
         )
 
     @patch("os.path.exists")
@@ -139,17 +269,16 @@ class TestReadXlsx(unittest.TestCase):
     def test_invalid_data_structure(self, mock_logger, mock_read_excel, mock_exists):
         # Настроим моки
         mock_exists.return_value = True
-        mock_df = MagicMock()
-        mock_df.to_dict.return_value = {}  # Возвращаем некорректные данные (не список)
-        mock_read_excel.return_value = mock_df
+        # Ни одной из колонок выгрузки в файле нет
+        mock_read_excel.return_value = pd.DataFrame({"foo": [1], "bar": [2]})
 
         # Вызовем функцию
         result = read_xlsx("test_invalid.xlsx")
 
         # Проверим, что результат пустой список
         self.assertEqual(result, [])
-        mock_logger.warning.assert_called_with(
-            "Файл test_invalid.xlsx не содержит списка транзакций."
+        self.assertEqual(
+            logged(mock_logger.warning), "Файл test_invalid.xlsx не содержит списка транзакций."
         )
 
     @patch("os.path.exists")
@@ -160,41 +289,37 @@ class TestReadXlsx(unittest.TestCase):
     ):
         # Настроим моки
         mock_exists.return_value = True
-        mock_df = MagicMock()
-        mock_df.to_dict.return_value = [
-            {
-                "Дата операции": "2025-03-19",
-                "Дата платежа": "2025-03-19",
-                "Статус": "Completed",
-                "Номер карты": "1234",
-                "Сумма операции": "1000",
-                "Валюта операции": "USD",
-                "Сумма платежа": "1000",
-                "Валюта платежа": "USD",
-                "Кэшбэк": "10",
-                "Категория": "Food",
-                "MCC": "1234",
-                "Бонусы (включая кэшбэк)": "invalid",  # Ошибка в данных
-                "Округление на инвесткопилку": 0,
-                "Описание": "Purchase",
-                "Сумма операции с округлением": 1000,
-            }
-        ]
-        mock_read_excel.return_value = mock_df
+        bad_row = dict(self.row, **{"Бонусы (включая кэшбэк)": "invalid"})  # Ошибка в данных
+        mock_read_excel.return_value = pd.DataFrame([self.row, bad_row])
 
         # Вызовем функцию
-        result = read_xlsx("test_error.xlsx")
+        table, rejected = read_xlsx_frame("test_error.xlsx")
 
-        # Проверим, что результат пустой список
-        self.assertEqual(result, [])
-        mock_logger.error.assert_called_with(
-            "Ошибка обработки транзакции: {'Дата операции': '2025-03-19', 'Дата платежа': '2025-03-19', 'Статус': "
-            "'Completed', 'Номер карты': '1234', 'Сумма операции': '1000', 'Валюта операции': 'USD', 'Сумма платежа': "
-            "'1000', 'Валюта платежа': 'USD', 'Кэшбэк': '10', 'Категория': 'Food', 'MCC': '1234', 'Бонусы (включая "
-            "кэшбэк)': 'invalid', 'Округление на инвесткопилку': 0, 'Описание': 'Purchase', 'Сумма операции с "
-            "округлением': 1000}. Ошибка: invalid literal for int() with base 10: 'invalid'"
+        # Некорректная строка попадает в отчет об отклоненных строках
+        self.assertEqual(len(table), 1)
+        self.assertEqual(len(rejected), 1)
+        self.assertEqual(
+            rejected.iloc[0]["reason"], "некорректное значение в колонке benefit"
+        )
+        self.assertEqual(
+            logged(mock_logger.error), "Ошибка обработки транзакций в файле test_error.xlsx: отклонено 1 записей."
         )
 
+    @patch("os.path.exists")
+    @patch("pandas.read_excel")
+    def test_read_xlsx_frame_types(self, mock_read_excel, mock_exists):
+        mock_exists.return_value = True
+        row = dict(self.row, **{"Дата операции": "31.12.2021 16:44:00", "Кэшбэк": np.nan})
+        mock_read_excel.return_value = pd.DataFrame([row])
+
+        table, rejected = read_xlsx_frame("test.xlsx")
+
+        self.assertTrue(rejected.empty)
+        self.assertEqual(table["benefit"].dtype, np.int64)
+        self.assertEqual(table["cashback"].iloc[0], 0)
+        self.assertEqual(table["operation_dt"].iloc[0], pd.Timestamp(2021, 12, 31, 16, 44))
+        self.assertEqual(frame_to_records(table)[0]["operation_date"], "31.12.2021 16:44:00")
+
     @patch("os.path.exists")
     @patch("pandas.read_excel")
     @patch("src.utils.logger")
@@ -208,10 +333,42 @@ class TestReadXlsx(unittest.TestCase):
 
         # Проверим, что результат пустой список
         self.assertEqual(result, [])
-        mock_logger.error.assert_called_with(
-            "Ошибка чтения файла test_error_file.xlsx: Ошибка чтения файла"
+        self.assertEqual(
+            logged(mock_logger.error), "Ошибка чтения файла test_error_file.xlsx: Ошибка чтения файла"
         )
 
 
+class TestIterXlsx(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "operations.xlsx")
+        pd.DataFrame(
+            {
+                "Дата операции": ["31.12.2021 16:44:00", "31.12.2021 16:42:04", "30.12.2021 10:00:00"],
+                "Номер карты": ["*7197", "*5091", np.nan],
+                "Сумма платежа": [-160.89, -64.0, 5000.0],
+                "Кэшбэк": [np.nan, 1.0, np.nan],
+                "Категория": ["Супермаркеты", "Супермаркеты", "Пополнения"],
+                "Описание": ["Колхоз", "Магнит", "Пополнение"],
+                "Бонусы (включая кэшбэк)": [3, 1, 0],
+            }
+        ).to_excel(self.path, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_iter_xlsx_matches_read_xlsx(self):
+        self.assertEqual(list(iter_xlsx(self.path)), read_xlsx(self.path))
+
+    def test_iter_xlsx_batches(self):
+        batches = list(iter_xlsx_batches(self.path, batch_size=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual(batches[1][0]["last_digits"], "")
+
+    def test_iter_xlsx_missing_file(self):
+        self.assertEqual(list(iter_xlsx("non_existent_file.xlsx")), [])
+
+
 if __name__ == "__main__":
     unittest.main()
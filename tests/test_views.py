@@ -1,8 +1,13 @@
 import json
+import threading
+import time
 import unittest
 from unittest.mock import patch
 
-from src.views import web_page
+from src.incremental import AggregateStore
+from src.table import DateIndex, TransactionTable
+from src.utils import count_stat_by_card, find_top_5_transactions
+from src.views import list_date_index, web_page
 
 
 class TestWebPage(unittest.TestCase):
@@ -78,6 +83,147 @@ class TestWebPage(unittest.TestCase):
         # Выводим результат для диагностики ошибки
         print(result)
 
+    @patch("src.views.read_json")
+    @patch("src.views.find_exchange_rate")
+    def test_web_page_with_store(self, mock_find_exchange_rate, mock_read_json):
+        mock_read_json.return_value = {"user_currencies": ["USD"], "user_stocks": []}
+        mock_find_exchange_rate.return_value = 90.0
+        data = [
+            {"operation_date": "01.12.2021 12:00:00", "last_digits": "7197",
+             "amount_transaction_rub": -100.0, "cashback": 1.0},
+            {"operation_date": "02.12.2021 12:00:00", "last_digits": "5091",
+             "amount_transaction_rub": -50.0, "cashback": 0.0},
+        ]
+        store = AggregateStore()
+
+        result_dict = json.loads(web_page("2021-12-02 19:00:00", data, store=store))
+
+        self.assertEqual(store.rows, 2)
+        self.assertEqual(result_dict["cards"], count_stat_by_card(data))
+        self.assertEqual(result_dict["top_transactions"], find_top_5_transactions(data))
+
+    @patch("src.views.read_json")
+    @patch("src.views.find_exchange_rate")
+    def test_web_page_top_per_card(self, mock_find_exchange_rate, mock_read_json):
+        mock_read_json.return_value = {"user_currencies": [], "user_stocks": [], "top_per_card": 1}
+        data = [
+            {"operation_date": "01.12.2021 10:00:00", "last_digits": "7197",
+             "amount_transaction_rub": -100.0, "cashback": 0.0},
+            {"operation_date": "01.12.2021 11:00:00", "last_digits": "",
+             "amount_transaction_rub": -300.0, "cashback": 0.0},
+            {"operation_date": "02.12.2021 12:00:00", "last_digits": "7197",
+             "amount_transaction_rub": -200.0, "cashback": 0.0},
+        ]
+
+        result_dict = json.loads(web_page("2021-12-02 19:00:00", data))
+
+        self.assertEqual(result_dict["top_transactions"], find_top_5_transactions(data))
+        self.assertEqual(
+            result_dict["top_transactions_by_card"],
+            [
+                {"last_digits": "7197", "top_transactions": [
+                    {"operation_date": "02.12.2021 12:00:00", "amount_transaction_rub": "200"}]},
+                {"last_digits": "Другие карты", "top_transactions": [
+                    {"operation_date": "01.12.2021 11:00:00", "amount_transaction_rub": "300"}]},
+            ],
+        )
+
+    @patch("src.views.read_json")
+    def test_web_page_month_to_date(self, mock_read_json):
+        mock_read_json.return_value = {"user_currencies": [], "user_stocks": []}
+        data = [
+            {"operation_date": "30.11.2021 10:00:00", "last_digits": "7197",
+             "amount_transaction_rub": -1000.0, "cashback": 0.0},
+            {"operation_date": "01.12.2021 10:00:00", "last_digits": "7197",
+             "amount_transaction_rub": -100.0, "cashback": 0.0},
+            {"operation_date": "05.12.2021 10:00:00", "last_digits": "5091",
+             "amount_transaction_rub": -50.0, "cashback": 0.0},
+        ]
+        table = TransactionTable.from_records(data)
+
+        for source in (data, table):
+            result_dict = json.loads(web_page("2021-12-03 19:00:00", source))
+            self.assertEqual(
+                result_dict["cards"],
+                [{"last_digits": "7197", "total_spent": 100.0, "cashback": 0.0}],
+            )
+            self.assertEqual(len(result_dict["top_transactions"]), 1)
+
+        # Месяц в хранилище содержит операцию позже current_time, поэтому считается по данным
+        store = AggregateStore()
+        result_dict = json.loads(web_page("2021-12-03 19:00:00", data, store=store))
+        self.assertEqual(result_dict["cards"][0]["total_spent"], 100.0)
+        result_dict = json.loads(web_page("2021-12-31 23:00:00", data, store=store))
+        self.assertEqual(len(result_dict["cards"]), 2)
+
+    @patch("src.views.read_json")
+    @patch("src.views.find_exchange_rate")
+    @patch("src.views.find_stockmarket_rate")
+    def test_web_page_fetches_quotes_concurrently(self, mock_find_stockmarket_rate, mock_find_exchange_rate,
+                                                  mock_read_json):
+        mock_read_json.return_value = {
+            "user_currencies": ["USD", "EUR"],
+            "user_stocks": ["AAPL", "AMZN", "GOOGL", "MSFT", "TSLA"],
+        }
+
+        def slow(value):
+            def fetch(name):
+                time.sleep(0.2)
+                return value(name)
+            return fetch
+
+        mock_find_exchange_rate.side_effect = slow(lambda currency: {"USD": 90.0, "EUR": 100.0}[currency])
+        mock_find_stockmarket_rate.side_effect = slow(lambda stock: float(len(stock)))
+
+        started = time.perf_counter()
+        result_dict = json.loads(web_page("2021-12-03 19:00:00", []))
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+        self.assertEqual(
+            result_dict["currency_rates"],
+            [{"currency": "USD", "rate": 90.0}, {"currency": "EUR", "rate": 100.0}],
+        )
+        self.assertEqual(
+            [price["stock"] for price in result_dict["stocks_prices"]],
+            ["AAPL", "AMZN", "GOOGL", "MSFT", "TSLA"],
+        )
+        self.assertEqual(result_dict["stocks_prices"][2], {"stock": "GOOGL", "price": 5.0})
+
+    @patch("src.views.read_json")
+    @patch("src.views.find_exchange_rate")
+    @patch("src.views.find_stockmarket_rate")
+    def test_web_page_quotes_deadline(self, mock_find_stockmarket_rate, mock_find_exchange_rate, mock_read_json):
+        mock_read_json.return_value = {
+            "user_currencies": ["USD", "EUR"],
+            "user_stocks": ["AAPL", "GOOGL"],
+            "quotes_deadline": 0.2,
+        }
+        release = threading.Event()
+
+        def exchange_rate(currency):
+            if currency == "EUR":
+                release.wait(5)
+            return 90.0
+
+        def stock_price(stock):
+            if stock == "GOOGL":
+                raise RuntimeError("нет ответа")
+            return 150.0
+
+        mock_find_exchange_rate.side_effect = exchange_rate
+        mock_find_stockmarket_rate.side_effect = stock_price
+
+        started = time.perf_counter()
+        result_dict = json.loads(web_page("2021-12-03 19:00:00", []))
+        release.set()
+        self.assertLess(time.perf_counter() - started, 2.0)
+
+        self.assertEqual(
+            result_dict["currency_rates"],
+            [{"currency": "USD", "rate": 90.0}, {"currency": "EUR", "rate": None}],
+        )
+        self.assertEqual(result_dict["stocks_prices"], [{"stock": "AAPL", "price": 150.0}])
+
     @patch("src.views.read_json")
     def test_web_page_with_empty_data(self, mock_read_json):
         # Тест с пустым набором данных
@@ -98,6 +244,24 @@ class TestWebPage(unittest.TestCase):
         self.assertIn("stocks_prices", result_dict)
 
 
+class TestListDateIndex(unittest.TestCase):
+
+    def test_index_is_built_once_per_list(self):
+        data = [{"operation_date": "01.12.2021 12:00:00"}, {"operation_date": "02.12.2021 12:00:00"}]
+        with patch("src.views.DateIndex.from_records", wraps=DateIndex.from_records) as build:
+            first = list_date_index(data)
+            self.assertIs(list_date_index(data), first)
+            self.assertEqual(build.call_count, 1)
+
+            # Новые строки — индекс строится заново
+            data.append({"operation_date": "03.12.2021 12:00:00"})
+            self.assertEqual(len(list_date_index(data)), 3)
+            self.assertEqual(build.call_count, 2)
+            # Другой список с теми же строками — свой индекс
+            list_date_index(list(data))
+            self.assertEqual(build.call_count, 3)
+
+
 # Запуск тестов
 if __name__ == "__main__":
     unittest.main()